@@ -0,0 +1,82 @@
+"""Compare git fork count and wall time of the two git engines.
+
+Builds a throwaway repository with staged, unstaged and untracked changes,
+then for each engine repeats what one gitme run asks of git: the repository
+probes, the staged and full diffs, and the untracked files.
+
+    python benchmarks/bench_git_backend.py --files 200 --runs 20
+"""
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+
+from gitme.git_diff import GitDiffAnalyzer
+
+ENGINES = {
+    "subprocess": False,
+    "in-process": True,
+}
+
+
+def build_repo(path: str, files: int) -> None:
+    def git(*args):
+        subprocess.run(["git"] + list(args), cwd=path, check=True, capture_output=True)
+
+    git("init", "-q")
+    git("config", "user.email", "bench@example.com")
+    git("config", "user.name", "Bench")
+    for j in range(files):
+        with open(os.path.join(path, f"file{j}.txt"), "w") as f:
+            f.write("".join(f"line {i} of file {j}\n" for i in range(50)))
+    git("add", "-A")
+    git("commit", "-q", "-m", "initial")
+    for j in range(0, files, 10):
+        with open(os.path.join(path, f"file{j}.txt"), "a") as f:
+            f.write(f"staged change to file {j}\n")
+    git("add", "-A")
+    for j in range(5, files, 10):
+        with open(os.path.join(path, f"file{j}.txt"), "a") as f:
+            f.write(f"unstaged change to file {j}\n")
+    for j in range(5):
+        with open(os.path.join(path, f"untracked{j}.txt"), "w") as f:
+            f.write("new\n")
+
+
+def run(in_process: bool, runs: int) -> tuple:
+    forks = 0
+    total_files = 0
+    start = time.perf_counter()
+    for _ in range(runs):
+        analyzer = GitDiffAnalyzer(in_process=in_process)
+        assert analyzer.in_git_repo
+        total_files += len(analyzer.get_file_changes(staged_only=True, single_pass=True))
+        total_files += len(analyzer.get_file_changes(staged_only=False, single_pass=True))
+        total_files += len(analyzer.get_untracked_files())
+        forks += analyzer.backend.forks
+    return forks, time.perf_counter() - start, total_files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as repo:
+        print(f"Building repository with {args.files} files...")
+        build_repo(repo, args.files)
+        cwd = os.getcwd()
+        os.chdir(repo)
+        try:
+            print(f"{'git_engine':<12} {'forks':>8} {'seconds':>10} {'files':>8}")
+            for name, in_process in ENGINES.items():
+                forks, elapsed, files = run(in_process, args.runs)
+                print(f"{name:<12} {forks:>8} {elapsed:>10.3f} {files:>8}")
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Time history queries on the JSON Lines and SQLite backends.
+
+Fills a throwaway history directory with synthetic entries spread over a few
+repositories, then times `gitme show`, `show --grep` and `show --file` style
+queries against each backend.
+
+    python benchmarks/bench_history_search.py --entries 200000
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from gitme.sqlite_storage import SQLiteMessageStorage
+from gitme.storage import MessageStorage
+
+WORDS = ["fix", "update", "refactor", "add", "remove", "parser", "cache", "login", "config", "docs"]
+
+
+def make_entries(count: int):
+    for i in range(count):
+        yield {
+            "timestamp": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T{i % 24:02d}:00:{i % 60:02d}.{i:06d}",
+            "repo_path": f"/work/repo{i % 20}",
+            "message": f"{WORDS[i % 10].title()} {WORDS[(i * 7) % 10]} handling #{i}",
+            "file_changes": {f"src/module{i % 500}/file{i % 37}.py": "", "README.md": ""},
+            "provider": "anthropic",
+            "model": "claude-haiku-4-5",
+        }
+
+
+def timed(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--entries", type=int, default=200000)
+    args = parser.parse_args()
+
+    queries = {
+        "show (repo)": dict(repo_path="/work/repo7", limit=10),
+        "show -r": dict(limit=10),
+        "--grep": dict(grep="#123456", limit=10),
+        "--file": dict(file="src/module42/file5.py", limit=10),
+    }
+
+    with tempfile.TemporaryDirectory() as jsonl_dir, tempfile.TemporaryDirectory() as sqlite_dir:
+        log = MessageStorage(Path(jsonl_dir), max_entries=0)
+        shards = {}
+        for entry in make_entries(args.entries):
+            if entry["repo_path"] not in shards:
+                shards[entry["repo_path"]] = open(log.shard(entry["repo_path"]).history_file, "w")
+            shards[entry["repo_path"]].write(json.dumps(entry) + "\n")
+        for f in shards.values():
+            f.close()
+        log.rebuild_index()
+
+        start = time.perf_counter()
+        db = SQLiteMessageStorage(Path(sqlite_dir), max_entries=0)
+        db.import_messages(make_entries(args.entries))
+        print(f"Loaded {args.entries} entries into SQLite in {time.perf_counter() - start:.1f}s")
+
+        print(f"{'query':<14} {'jsonl ms':>10} {'sqlite ms':>10}")
+        for name, kwargs in queries.items():
+            jsonl_ms = timed(lambda: log.get_messages(**kwargs), repeat=1)
+            sqlite_ms = timed(lambda: db.get_messages(**kwargs))
+            print(f"{name:<14} {jsonl_ms:>10.1f} {sqlite_ms:>10.2f}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
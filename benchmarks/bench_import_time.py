@@ -0,0 +1,79 @@
+"""Check the cold-start import cost of `gitme -v` and `gitme show`.
+
+Runs each command in a fresh interpreter under `python -X importtime`, with
+HOME pointed at an empty directory, and reports the median total import time
+and the slowest top-level imports. Exits non-zero if a command goes over the
+threshold or imports a module that only generation should load (the provider
+SDKs, asyncio, the in-process git reader).
+
+    python benchmarks/bench_import_time.py --runs 5 --max-ms 250
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+COMMANDS = {
+    "gitme -v": ["-v"],
+    "gitme show": ["show"],
+}
+
+# Modules that must stay out of the startup path of the commands above
+FORBIDDEN = ("anthropic", "openai", "httpx", "asyncio", "concurrent.futures", "gitme.git_objects")
+
+RUNNER = "import sys; from gitme.cli import main; sys.argv = ['gitme'] + sys.argv[1:]; main()"
+
+
+def measure(args, home: str):
+    """Return (total import microseconds, {top-level module: cumulative us}, imported names)"""
+    env = dict(os.environ, HOME=home)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", RUNNER] + args,
+        capture_output=True, text=True, env=env
+    )
+    top_level = {}
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imported.add(name.strip())
+        # Nested imports are indented below the module that triggered them
+        if not name.startswith("  "):
+            top_level[name.strip()] = int(cumulative)
+    return sum(top_level.values()), top_level, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=250.0,
+                        help="fail if the median import time of a command exceeds this")
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as home:
+        for label, command in COMMANDS.items():
+            runs = [measure(command, home) for _ in range(args.runs)]
+            median_ms = statistics.median(total for total, _, _ in runs) / 1000
+            _, top_level, imported = runs[-1]
+            print(f"{label}: {median_ms:.1f} ms median over {args.runs} runs")
+            for name, us in sorted(top_level.items(), key=lambda item: -item[1])[:args.top]:
+                print(f"    {us / 1000:>7.1f} ms  {name}")
+
+            forbidden = sorted(name for name in imported
+                               if any(name == f or name.startswith(f + ".") for f in FORBIDDEN))
+            if forbidden:
+                failed = True
+                print(f"    FAIL: imports {', '.join(forbidden[:5])}")
+            if median_ms > args.max_ms:
+                failed = True
+                print(f"    FAIL: over the {args.max_ms:.0f} ms threshold")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Measure how often the in-process git engine has to fall back to git.
+
+Replays the non-merge commits of a repository: every modified text file is
+diffed with the in-process hunk builder, and a file falls back when git
+might align its hunks differently. A commit falls back when any of its
+files does, since the whole diff is then taken from git. Files that are
+diffed in-process are also checked against git's own hunks.
+
+    python benchmarks/bench_in_process_fallback.py --repo . --commits 200
+"""
+import argparse
+import subprocess
+
+from gitme.git_objects import UnsupportedRepository, _unified_hunks
+
+
+def git(repo: str, *args) -> bytes:
+    return subprocess.run(["git", "-C", repo] + list(args), capture_output=True, check=True).stdout
+
+
+def git_hunks(repo: str, old: str, new: str):
+    patch = git(repo, "diff", "--no-color", "--no-ext-diff", old, new).decode("utf-8", errors="replace")
+    lines = patch.split("\n")
+    start = next(i for i, line in enumerate(lines) if line.startswith("@@"))
+    return [line for line in lines[start:] if line]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--repo", default=".")
+    parser.add_argument("--commits", type=int, default=200)
+    args = parser.parse_args()
+
+    commits = git(args.repo, "rev-list", "--no-merges", f"--max-count={args.commits}", "HEAD").decode().split()
+    files = file_fallbacks = commit_fallbacks = mismatches = 0
+    for commit in commits:
+        raw = git(args.repo, "diff-tree", "-r", "--no-renames", "--root", commit).decode()
+        fell_back = False
+        for line in raw.splitlines():
+            if not line.startswith(":"):
+                continue
+            _, _, old, new, status = line.split("\t", 1)[0].split()
+            if status != "M":
+                continue
+            old_data = git(args.repo, "cat-file", "blob", old)
+            new_data = git(args.repo, "cat-file", "blob", new)
+            if b"\0" in old_data[:8000] or b"\0" in new_data[:8000]:
+                continue
+            files += 1
+            try:
+                hunks = _unified_hunks(old_data, new_data)
+            except UnsupportedRepository:
+                file_fallbacks += 1
+                fell_back = True
+                continue
+            if hunks != git_hunks(args.repo, old, new):
+                mismatches += 1
+        commit_fallbacks += fell_back
+
+    print(f"{len(commits)} commits, {files} modified text files")
+    print(f"files diffed by git:   {file_fallbacks:>6} ({100 * file_fallbacks / max(files, 1):.0f}%)")
+    print(f"commits diffed by git: {commit_fallbacks:>6} ({100 * commit_fallbacks / max(len(commits), 1):.0f}%)")
+    print(f"in-process hunks that differ from git: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Measure per-request client overhead against a local stub Messages API.
+
+Starts an HTTP/1.1 server on localhost that answers every request with a
+fixed message, then times generations with a new SDK client per request (the
+old behavior), with the shared ClientPool, and with the pooled async client
+running requests concurrently. The server counts the TCP connections it
+accepts, which shows whether keep-alive connections are reused.
+
+    python benchmarks/bench_llm_client.py --requests 200 --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from anthropic import Anthropic
+
+from gitme.llm_client import ClientPool, CommitMessageGenerator
+
+RESPONSE = json.dumps({
+    "id": "msg_bench",
+    "type": "message",
+    "role": "assistant",
+    "model": "stub",
+    "content": [{"type": "text", "text": "Update files\n\n- Modified app.py"}],
+    "stop_reason": "end_turn",
+    "stop_sequence": None,
+    "usage": {"input_tokens": 10, "output_tokens": 10},
+}).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this every
+    # keep-alive response waits for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.connections = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def fresh_clients(base_url: str, file_changes, requests: int) -> None:
+    generator = CommitMessageGenerator(api_key="bench", base_url=base_url, pool=ClientPool())
+    for _ in range(requests):
+        generator.client = Anthropic(api_key="bench", base_url=base_url)
+        generator.generate_commit_message(file_changes)
+        generator.client.close()
+
+
+def pooled_sync(base_url: str, file_changes, requests: int) -> None:
+    pool = ClientPool()
+    for _ in range(requests):
+        CommitMessageGenerator(api_key="bench", base_url=base_url, pool=pool).generate_commit_message(file_changes)
+    pool.close()
+
+
+def pooled_async(base_url: str, file_changes, requests: int, concurrency: int) -> None:
+    async def run():
+        pool = ClientPool()
+        generator = CommitMessageGenerator(api_key="bench", base_url=base_url, pool=pool)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with semaphore:
+                return await generator.agenerate_commit_message(file_changes)
+
+        await asyncio.gather(*(one() for _ in range(requests)))
+        await pool.aclose()
+        pool.close()
+
+    asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    server = start_server()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    file_changes = {"app.py": "+print('hello')\n"}
+    modes = [
+        ("fresh client", lambda: fresh_clients(base_url, file_changes, args.requests)),
+        ("pooled sync", lambda: pooled_sync(base_url, file_changes, args.requests)),
+        (f"pooled async x{args.concurrency}",
+         lambda: pooled_async(base_url, file_changes, args.requests, args.concurrency)),
+    ]
+
+    print(f"{'mode':<18} {'ms/request':>11} {'connections':>12}")
+    for name, run in modes:
+        server.connections = 0
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<18} {elapsed * 1000 / args.requests:>11.2f} {server.connections:>12}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
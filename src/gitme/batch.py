@@ -0,0 +1,180 @@
+"""Generate commit messages for many repositories at once.
+
+Diffs are collected in a process pool, one repository per task, and the
+generations then share one event loop with a bound on how many are in
+flight, so a directory of checkouts costs about as long as its slowest
+repositories rather than the sum of all of them.
+"""
+import os
+import subprocess
+import time
+from typing import Callable, Dict, List, Optional
+
+from .config import Config
+
+
+# Directories never searched for repositories
+SKIP_DIRS = {"node_modules", "__pycache__", ".venv", "venv", ".tox"}
+
+
+class BatchResult:
+    """Outcome for one repository"""
+    
+    def __init__(self, repo: str):
+        self.repo = repo
+        self.file_changes: Dict[str, str] = {}
+        self.message: Optional[str] = None
+        self.error: Optional[str] = None
+        self.committed = False
+        self.collect_seconds = 0.0
+        self.generate_seconds = 0.0
+    
+    @property
+    def status(self) -> str:
+        if self.error:
+            return "error"
+        if not self.file_changes:
+            return "no changes"
+        if self.committed:
+            return "committed"
+        return "generated" if self.message else "pending"
+
+
+def find_repositories(root: str, max_depth: int = 4) -> List[str]:
+    """Work trees under root (root included), without descending into
+    repositories that were found or into hidden and dependency folders"""
+    root = os.path.realpath(root)
+    repos = []
+    
+    def walk(directory: str, depth: int):
+        if os.path.exists(os.path.join(directory, ".git")):
+            repos.append(directory)
+            return
+        if depth >= max_depth:
+            return
+        try:
+            with os.scandir(directory) as it:
+                children = sorted(entry.name for entry in it
+                                  if entry.is_dir(follow_symlinks=False)
+                                  and not entry.name.startswith(".") and entry.name not in SKIP_DIRS)
+        except OSError:
+            return
+        for name in children:
+            walk(os.path.join(directory, name), depth + 1)
+    
+    walk(root, 0)
+    return repos
+
+
+def collect_changes(repo: str, staged_only: bool, options: Dict) -> Dict:
+    """Diffs of one repository; runs in a worker process"""
+    from .diff_cache import DiffCache
+    from .git_diff import GitDiffAnalyzer
+    
+    start = time.monotonic()
+    try:
+        analyzer = GitDiffAnalyzer(
+            max_file_bytes=options.get("max_diff_bytes_per_file", 65536),
+            max_total_bytes=options.get("max_diff_bytes_total", 4194304),
+            diff_cache=DiffCache(max_bytes=options.get("diff_cache_max_bytes", 67108864))
+            if options.get("diff_cache", True) else None,
+            cwd=repo,
+            use_status=options.get("status_snapshot", True)
+        )
+        if not analyzer.in_git_repo:
+            return {"error": "not a git work tree", "seconds": time.monotonic() - start}
+        file_changes = analyzer.get_file_changes(staged_only=staged_only, single_pass=True)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}", "seconds": time.monotonic() - start}
+    return {"file_changes": file_changes, "seconds": time.monotonic() - start}
+
+
+def collect_all(repos: List[str], staged_only: bool, config: Config, jobs: Optional[int] = None) -> List[BatchResult]:
+    """Collect every repository's diffs, in parallel across jobs processes"""
+    options = {key: config.get(key) for key in ("max_diff_bytes_per_file", "max_diff_bytes_total",
+                                                "diff_cache", "diff_cache_max_bytes", "status_snapshot")
+               if config.get(key) is not None}
+    jobs = min(jobs or os.cpu_count() or 1, len(repos)) or 1
+    if jobs == 1:
+        collected = [collect_changes(repo, staged_only, options) for repo in repos]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            collected = list(pool.map(collect_changes, repos, [staged_only] * len(repos), [options] * len(repos)))
+    
+    results = []
+    for repo, outcome in zip(repos, collected):
+        result = BatchResult(repo)
+        result.collect_seconds = outcome["seconds"]
+        result.error = outcome.get("error")
+        result.file_changes = outcome.get("file_changes") or {}
+        results.append(result)
+    return results
+
+
+async def generate_all(results: List[BatchResult], generator, max_in_flight: int = 8,
+                       on_done: Optional[Callable[[BatchResult], None]] = None) -> None:
+    """Generate a message for every result with changes, at most
+    max_in_flight at a time, on the generator's pooled async client"""
+    import asyncio
+    semaphore = asyncio.Semaphore(max(1, max_in_flight))
+    
+    async def generate(result: BatchResult):
+        async with semaphore:
+            start = time.monotonic()
+            try:
+                result.message = await generator.agenerate_commit_message(result.file_changes, raise_errors=True)
+            except Exception as e:
+                result.error = f"{type(e).__name__}: {e}"
+            result.generate_seconds = time.monotonic() - start
+        if on_done is not None:
+            on_done(result)
+    
+    try:
+        await asyncio.gather(*(generate(result) for result in results if result.file_changes and not result.error))
+    finally:
+        await generator.pool.aclose()
+
+
+def submit_all(results: List[BatchResult], generator,
+               on_status: Optional[Callable[[Dict[str, int]], None]] = None) -> None:
+    """Generate every message as one provider batch job instead of one
+    request per repository"""
+    from .llm_client import BatchJobError
+    pending = [result for result in results if result.file_changes and not result.error]
+    start = time.monotonic()
+    try:
+        messages, errors = generator.generate_batch({result.repo: result.file_changes for result in pending},
+                                                    on_status=on_status)
+    except BatchJobError as e:
+        messages, errors = {}, {result.repo: str(e) for result in pending}
+    for result in pending:
+        result.message = messages.get(result.repo)
+        result.error = errors.get(result.repo)
+        result.generate_seconds = time.monotonic() - start
+
+
+def commit(result: BatchResult, all_changes: bool) -> None:
+    """Commit result.message in its repository"""
+    args = ["git", "commit", "-m", result.message]
+    if all_changes:
+        args.insert(2, "-a")
+    try:
+        subprocess.run(args, cwd=result.repo, check=True, capture_output=True, text=True)
+        result.committed = True
+    except subprocess.CalledProcessError as e:
+        result.error = (e.stderr or e.stdout or str(e)).strip()
+
+
+def format_summary(results: List[BatchResult], root: str) -> List[str]:
+    """Summary table lines, one row per repository"""
+    names = [os.path.relpath(result.repo, root) for result in results]
+    width = max([len("Repository")] + [len(name) for name in names])
+    lines = [f"{'Repository':<{width}}  {'Files':>5}  {'Collect':>8}  {'Generate':>8}  Result",
+             f"{'-' * width}  {'-' * 5}  {'-' * 8}  {'-' * 8}  {'-' * 10}"]
+    for name, result in zip(names, results):
+        generate = f"{result.generate_seconds:7.2f}s" if result.generate_seconds else f"{'-':>8}"
+        outcome = result.status if not result.error else f"error: {result.error.splitlines()[0][:60]}"
+        lines.append(f"{name:<{width}}  {len(result.file_changes):>5}  {result.collect_seconds:7.2f}s  "
+                     f"{generate}  {outcome}")
+    return lines
@@ -0,0 +1,104 @@
+import hashlib
+import os
+import zlib
+from pathlib import Path
+from typing import Iterable, Optional
+
+_zstandard = None
+
+
+def _zstd():
+    """The zstandard module if it is installed, imported on first use"""
+    global _zstandard
+    if _zstandard is None:
+        try:
+            import zstandard
+            _zstandard = zstandard
+        except ImportError:
+            _zstandard = False
+    return _zstandard or None
+
+
+class BlobStore:
+    """Compressed, content-addressed store for diff text under ~/.gitme/blobs
+
+    A blob is named by the sha256 of its text, so the same diff saved twice is
+    stored once. Blobs are compressed with zstd when the zstandard package is
+    installed and with zlib otherwise; the file suffix records which.
+    """
+    
+    SUFFIXES = (".zst", ".z")
+    
+    def __init__(self, store_dir: Optional[Path] = None):
+        self.store_dir = Path(store_dir) if store_dir else Path.home() / ".gitme" / "blobs"
+    
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8", errors="surrogateescape")).hexdigest()
+    
+    def _path(self, key: str, suffix: str) -> Path:
+        return self.store_dir / key[:2] / (key[2:] + suffix)
+    
+    def put(self, text: str) -> str:
+        key = self.key(text)
+        if any(self._path(key, suffix).exists() for suffix in self.SUFFIXES):
+            return key
+        data = text.encode("utf-8", errors="surrogateescape")
+        zstd = _zstd()
+        if zstd is not None:
+            path = self._path(key, ".zst")
+            data = zstd.ZstdCompressor().compress(data)
+        else:
+            path = self._path(key, ".z")
+            data = zlib.compress(data, 6)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + f".{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return key
+    
+    def get(self, key: str) -> Optional[str]:
+        for suffix in self.SUFFIXES:
+            try:
+                with open(self._path(key, suffix), "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                continue
+            if suffix == ".zst":
+                zstd = _zstd()
+                if zstd is None:
+                    return None
+                data = zstd.ZstdDecompressor().decompress(data)
+            else:
+                data = zlib.decompress(data)
+            return data.decode("utf-8", errors="surrogateescape")
+        return None
+    
+    def delete(self, key: str) -> None:
+        for suffix in self.SUFFIXES:
+            try:
+                os.unlink(self._path(key, suffix))
+            except FileNotFoundError:
+                pass
+    
+    def keys(self) -> Iterable[str]:
+        if not self.store_dir.exists():
+            return
+        for shard in os.scandir(self.store_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                name, suffix = os.path.splitext(entry.name)
+                if suffix in self.SUFFIXES:
+                    yield shard.name + name
+    
+    def collect_garbage(self, referenced: Iterable[str]) -> int:
+        """Delete blobs not in referenced; returns how many were removed"""
+        keep = set(referenced)
+        removed = 0
+        for key in list(self.keys()):
+            if key not in keep:
+                self.delete(key)
+                removed += 1
+        return removed
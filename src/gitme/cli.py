@@ -1,15 +1,33 @@
 import click
 import json
 import os
-from typing import Optional
-from datetime import datetime
+from typing import Dict, Optional
 
+from .diff_cache import DiffCache
 from .git_diff import GitDiffAnalyzer
 from .llm_client import CommitMessageGenerator
 from .config import Config
+from .response_cache import ResponseCache
 from .storage import MessageStorage
 from . import __version__
 
+
+def open_storage(config: Config):
+    """History store selected by the history_backend setting"""
+    max_entries = config.get("history_max_entries", 100)
+    if config.get("history_backend", "jsonl") == "sqlite":
+        from .sqlite_storage import SQLiteMessageStorage
+        return SQLiteMessageStorage(max_entries=max_entries)
+    return MessageStorage(max_entries=max_entries)
+
+
+def connect_daemon(config: Config):
+    """Client for a running `gitme daemon`, or None to work in-process"""
+    if not config.get("daemon", True):
+        return None
+    from .daemon import DaemonClient
+    return DaemonClient.connect(config)
+
 @click.group(invoke_without_command=True)
 @click.option('--version', '-v', is_flag=True, help='Show version and exit')
 @click.pass_context
@@ -20,6 +38,7 @@ def cli(ctx, version):
     USAGE:
       gitme [OPTIONS]         Generate commit message
       gitme show [OPTIONS]    Display message history
+      gitme daemon [OPTIONS]  Keep gitme warm in the background
       gitme -v                Show version information
 
     \b
@@ -46,6 +65,8 @@ def cli(ctx, version):
         gitme show            # Show last 10 messages
         gitme show -n 5       # Show last 5 messages
         gitme show -r         # Show all repositories
+        gitme show --grep auth  # Search messages
+        gitme show --file src/  # Messages that changed a path
         gitme show --clear    # Clear history
 
     \b
@@ -74,7 +95,8 @@ def cli(ctx, version):
 @click.option('--provider', '-p', type=click.Choice(['anthropic', 'openai']), default='anthropic', help='LLM provider to use (default: anthropic)')
 @click.option('--commit', '-c', is_flag=True, help='Create commit with generated message')
 @click.option('--upstream', '-u', help='Create commit and push to upstream branch (specify branch name)')
-def generate(staged: bool, all: bool, model: str, provider: str, commit: bool, upstream: Optional[str]):
+@click.option('--no-cache', is_flag=True, help='Always ask the model instead of reusing a cached message')
+def generate(staged: bool, all: bool, model: str, provider: str, commit: bool, upstream: Optional[str], no_cache: bool):
     """Generate a commit message for current changes
     
     By default analyzes staged changes only. Use -a for all changes.
@@ -83,7 +105,25 @@ def generate(staged: bool, all: bool, model: str, provider: str, commit: bool, u
     You can combine -c and -u flags together.
     """
     
-    analyzer = GitDiffAnalyzer()
+    config = Config()
+    
+    def local_analyzer():
+        return GitDiffAnalyzer(
+            in_process=config.get("git_engine") == "in-process",
+            max_file_bytes=config.get("max_diff_bytes_per_file", 65536),
+            max_total_bytes=config.get("max_diff_bytes_total", 4194304),
+            diff_cache=DiffCache(max_bytes=config.get("diff_cache_max_bytes", 67108864))
+            if config.get("diff_cache", True) else None,
+            use_status=config.get("status_snapshot", True)
+        )
+    
+    # A running daemon answers from warm state; otherwise everything runs here
+    daemon_client = connect_daemon(config)
+    if daemon_client is not None:
+        from .daemon import RemoteAnalyzer
+        analyzer = RemoteAnalyzer(daemon_client, os.getcwd(), local_analyzer)
+    else:
+        analyzer = local_analyzer()
     
     if not analyzer.git_available:
         click.echo(click.style("𐩃 Error: Git is not installed on your system", fg="red", bold=True), err=True)
@@ -110,60 +150,93 @@ def generate(staged: bool, all: bool, model: str, provider: str, commit: bool, u
         # Explicitly requested staged only
         use_staged = True
     
+    if provider == 'openai':
+        # Set default OpenAI model if Claude model was specified
+        model = 'gpt-4o-mini'
+    
     # Check for untracked files first
     untracked_files = analyzer.get_untracked_files()
+    speculation = None
+    added = False
     
     if untracked_files:
         click.echo(click.style("📁 Untracked files found:", fg="yellow", bold=True))
         for file in untracked_files:
             click.echo(f"    {file}")
         
+        if config.get("speculative_generation", True):
+            # Have the model work on both answers while the user decides
+            from .speculative import SpeculativeGeneration
+            speculation = SpeculativeGeneration(
+                lambda changes, on_token: _generate_message(config, daemon_client, changes, provider, model,
+                                                            use_cache=not no_cache, on_token=on_token)
+            )
+            speculation.start("without", lambda: analyzer.get_file_changes(staged_only=use_staged, single_pass=True))
+            speculation.start("with", lambda: analyzer.get_file_changes_with_untracked(untracked_files, use_staged))
+        
         if click.confirm("Add these untracked files to staging area?"):
             import subprocess
             try:
                 subprocess.run(["git", "add"] + untracked_files, check=True)
+                added = True
                 click.echo(click.style("✓ Untracked files added to staging area", fg="green"))
             except subprocess.CalledProcessError as e:
                 click.echo(click.style(f"⚠️ Failed to add untracked files: {e}", fg="red"), err=True)
     
     # Get file changes
-    file_changes = analyzer.get_file_changes(staged_only=use_staged)
+    if speculation is not None:
+        speculation.wait_for_changes()
+    file_changes = analyzer.get_file_changes(staged_only=use_staged, single_pass=True)
     
     if not file_changes:
+        if speculation is not None:
+            speculation.cancel()
         click.echo(click.style("⚠️  No changes detected to analyze", fg="yellow"))
         return
     
+    # Print tokens as they arrive; the assembled message is used below as before
+    streamed = []
+    def show_token(text: str):
+        if not streamed:
+            text = text.lstrip()
+            if not text:
+                return
+            click.echo()
+            click.echo(click.style("🎉 Generated commit message:", fg="green", bold=True))
+        streamed.append(text)
+        click.echo(click.style(text, fg="cyan"), nl=False)
+    on_token = show_token if config.get("stream_output", True) else None
+    
     # Generate commit message
     try:
-        if provider == 'openai':
-            # Set default OpenAI model if Claude model was specified
-            model = 'gpt-4o-mini'
-            commit_message = CommitMessageGenerator.generate_commit_message_openai(
-                file_changes=file_changes,
-                model=model
-            )
-        else:
-            # Use Anthropic (default)
-            generator = CommitMessageGenerator()
-            generator.model = model
-            commit_message = generator.generate_commit_message(file_changes)
+        result = speculation.take("with" if added else "without", file_changes, on_token) if speculation else None
+        if result is None:
+            result = _generate_message(config, daemon_client, file_changes, provider, model,
+                                       use_cache=not no_cache, on_token=on_token, on_restart=streamed.clear)
+        commit_message, cache_hit = result
         
         # do not save the generated message 
-        storage = MessageStorage()
+        storage = open_storage(config)
         repo_path = os.getcwd()
         original_message = commit_message
         #storage.save_message(original_message, repo_path, file_changes, provider, model)
         
-        click.echo()
-        click.echo(click.style("🎉 Generated commit message:", fg="green", bold=True))
-        click.echo(click.style(commit_message, fg="cyan"))
+        if streamed:
+            click.echo()
+        if "".join(streamed).strip() != commit_message:
+            # Cached, non-streamed or failed mid-stream: show the final message
+            click.echo()
+            click.echo(click.style("🎉 Generated commit message:", fg="green", bold=True))
+            click.echo(click.style(commit_message, fg="cyan"))
+        if cache_hit:
+            click.echo(click.style("⚡ Reused a cached message for these changes (use --no-cache to regenerate)", fg="yellow"))
         
         if commit or upstream:
             # For explicit -c/-u flags, skip confirmation (user intent is clear)
             should_commit = True
             if not (commit or upstream):
                 should_commit = click.confirm("Create a commit with this message?")
-
+            
             if should_commit:
                 # Allow user to modify the commit message
                 if click.confirm("Add a personal note to this commit? default is N - no addition to the message", default=False):
@@ -206,18 +279,114 @@ def generate(staged: bool, all: bool, model: str, provider: str, commit: bool, u
         click.echo(click.style(f"𐩃 Error: {e}", fg="red", bold=True), err=True)
 
 
+def _generate_message(config: Config, daemon_client, file_changes: dict, provider: str, model: str,
+                      use_cache: bool = True, on_token=None, on_restart=None) -> tuple:
+    """(commit message, whether it came from the response cache), from the
+    daemon when one runs and in-process otherwise. on_restart is called if
+    the daemon drops mid-stream and generation starts over here."""
+    response_cache = None
+    if config.get("response_cache", True) and use_cache:
+        response_cache = ResponseCache(
+            ttl=config.get("response_cache_ttl", 86400),
+            max_entries=config.get("response_cache_max_entries", 200)
+        )
+    
+    if daemon_client is not None:
+        from .daemon import DaemonError
+        try:
+            return daemon_client.generate(
+                file_changes, provider, model, use_cache=response_cache is not None, on_token=on_token
+            )
+        except DaemonError:
+            # The daemon went away; generate here instead
+            if on_restart is not None:
+                on_restart()
+    
+    if provider == 'openai':
+        commit_message = CommitMessageGenerator.generate_commit_message_openai(
+            file_changes=file_changes,
+            model=model,
+            cache=response_cache,
+            on_token=on_token,
+            config=config
+        )
+    else:
+        # Use Anthropic (default)
+        generator = CommitMessageGenerator(cache=response_cache, config=config)
+        generator.model = model
+        commit_message = generator.generate_commit_message(file_changes, on_token=on_token)
+    # Summaries of a map-reduce run may hit while the message itself is new
+    return commit_message, bool(response_cache is not None and response_cache.last_hit)
+
+
+def _time_bound(value: Optional[str], end: bool = False) -> Optional[str]:
+    """ISO timestamp for --since/--until; a bare date given to --until
+    covers that whole day"""
+    if not value:
+        return None
+    from datetime import datetime, timedelta
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise click.BadParameter(f"expected a date or time such as 2025-01-31 or 2025-01-31T18:00, got '{value}'")
+    if end and len(value) == 10:
+        moment += timedelta(days=1)
+    return moment.isoformat()
+
+
+def _format_entry(number: int, entry: dict, all_repos: bool) -> str:
+    from datetime import datetime
+    timestamp = datetime.fromisoformat(entry['timestamp'])
+    formatted_time = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+    
+    lines = [f"\n{click.style(f'[{number}]', fg='cyan', bold=True)} {click.style(formatted_time, fg='green')}"]
+    if all_repos:
+        lines.append(f"    {click.style('📁 Repository:', fg='magenta')} {entry['repo_path']}")
+    lines.append(f"    {click.style('💬 Message:', fg='blue', bold=True)}")
+    # Display multi-line messages with proper indentation
+    for line in entry['message'].split('\n'):
+        lines.append(f"    {line}")
+    
+    # Show provider and model information
+    provider = entry.get('provider', 'unknown')
+    model = entry.get('model', 'unknown')
+    if provider or model:
+        provider_display = provider.title() if provider != 'unknown' else 'Unknown'
+        model_display = model if model and model != 'unknown' else 'Unknown'
+        lines.append(f"    {click.style('🤖 AI Provider:', fg='magenta')} {provider_display} ({model_display})")
+    
+    # Show file changes summary
+    # Diffs are kept in the blob store; entries list the changed files
+    files = entry.get('files') or entry.get('file_changes') or {}
+    if files:
+        files_count = len(files)
+        lines.append(f"    {click.style('📝 Files changed:', fg='yellow')} {files_count}")
+    return "\n".join(lines)
+
+
 @cli.command()
 @click.option('--limit', '-n', default=10, help='Number of messages to show (default: 10)')
 @click.option('--all-repos', '-r', is_flag=True, help='Show messages from all repositories')
 @click.option('--clear', is_flag=True, help='Clear message history')
-def show(limit: int, all_repos: bool, clear: bool):
+@click.option('--grep', 'grep', metavar='TEXT', help='Only show messages containing TEXT')
+@click.option('--file', 'file', metavar='PATH', help='Only show messages that changed PATH (a file or directory)')
+@click.option('--offset', default=0, type=click.IntRange(min=0), help='Skip this many of the newest messages')
+@click.option('--page', type=click.IntRange(min=1), help='Show page N of -n messages each (1 is the newest)')
+@click.option('--since', metavar='DATE', help='Only show messages from DATE on (e.g. 2025-01-31 or 2025-01-31T18:00)')
+@click.option('--until', metavar='DATE', help='Only show messages before DATE (a date includes that whole day)')
+@click.option('--pager', is_flag=True, help='Stream every matching message through a pager (ignores -n/--page)')
+def show(limit: int, all_repos: bool, clear: bool, grep: Optional[str], file: Optional[str],
+         offset: int, page: Optional[int], since: Optional[str], until: Optional[str], pager: bool):
     """Show previously generated commit messages
     
     Displays message history for the current repository by default.
     Use -r to show messages from all repositories.
+    Use --grep/--file to search the history.
+    Use --page/--offset and --since/--until to go further back.
+    Use --pager to scroll through everything; entries are read as you scroll.
     Use --clear to remove message history.
     """
-    storage = MessageStorage()
+    storage = open_storage(Config())
     repo_path = os.getcwd() if not all_repos else None
     
     if clear:
@@ -226,37 +395,385 @@ def show(limit: int, all_repos: bool, clear: bool):
             click.echo(click.style("🗑️  Message history cleared.", fg="green"))
         return
     
-    messages = storage.get_messages(repo_path, limit)
+    since = _time_bound(since)
+    until = _time_bound(until, end=True)
+    
+    if pager:
+        from itertools import islice
+        entries = islice(storage.iter_messages(repo_path, grep=grep, file=file, since=since, until=until), offset, None)
+        # echo_via_pager pulls from the generator, so only what is shown gets read
+        click.echo_via_pager(
+            _format_entry(number, entry, all_repos) + "\n"
+            for number, entry in enumerate(entries, offset + 1)
+        )
+        return
+    
+    if page:
+        offset += (page - 1) * limit
+    messages = storage.get_messages(repo_path, limit, grep=grep, file=file, offset=offset, since=since, until=until)
     
     if not messages:
         click.echo(click.style("📭 No previously generated messages found.", fg="yellow"))
         return
     
-    for i, entry in enumerate(reversed(messages), 1):
-        timestamp = datetime.fromisoformat(entry['timestamp'])
-        formatted_time = timestamp.strftime("%Y-%m-%d %H:%M:%S")
-        
-        click.echo(f"\n{click.style(f'[{i}]', fg='cyan', bold=True)} {click.style(formatted_time, fg='green')}")
-        if all_repos:
-            click.echo(f"    {click.style('📁 Repository:', fg='magenta')} {entry['repo_path']}")
-        click.echo(f"    {click.style('💬 Message:', fg='blue', bold=True)}")
-        # Display multi-line messages with proper indentation
-        for line in entry['message'].split('\n'):
-            click.echo(f"    {line}")
-        
-        # Show provider and model information
-        provider = entry.get('provider', 'unknown')
-        model = entry.get('model', 'unknown')
-        if provider or model:
-            provider_display = provider.title() if provider != 'unknown' else 'Unknown'
-            model_display = model if model and model != 'unknown' else 'Unknown'
-            click.echo(f"    {click.style('🤖 AI Provider:', fg='magenta')} {provider_display} ({model_display})")
-        
-        # Show file changes summary
-        file_changes = entry.get('file_changes', {})
-        if file_changes:
-            files_count = len(file_changes)
-            click.echo(f"    {click.style('📝 Files changed:', fg='yellow')} {files_count}")
+    for i, entry in enumerate(reversed(messages), offset + 1):
+        click.echo(_format_entry(i, entry, all_repos))
+
+
+@cli.command()
+@click.option('--background', '-b', is_flag=True, help='Start the daemon as a detached background process')
+@click.option('--stop', is_flag=True, help='Stop the running daemon')
+@click.option('--status', is_flag=True, help='Show whether a daemon is running')
+def daemon(background: bool, stop: bool, status: bool):
+    """Keep gitme warm in a background process
+    
+    The daemon keeps git state per repository, the LLM SDK with its
+    connection pool and the caches loaded, and serves gitme over a Unix
+    socket (~/.gitme/daemon.sock). While it runs, gitme hands the work to
+    it; without it, gitme works in-process as usual.
+    Runs in the foreground unless -b is given.
+    """
+    from .daemon import DaemonClient, GitmeDaemon, socket_path, start_background
+    config = Config()
+    client = DaemonClient.connect(config)
+    
+    if stop or status:
+        if client is None:
+            click.echo(click.style("💤 No gitme daemon is running.", fg="yellow"))
+            return
+        info = client.status()
+        if stop:
+            client.shutdown()
+            click.echo(click.style(f"✓ Stopped gitme daemon (pid {info['pid']}).", fg="green"))
+        else:
+            click.echo(click.style(f"✓ gitme daemon running (pid {info['pid']})", fg="green", bold=True))
+            click.echo(f"    Socket: {socket_path(config)}")
+            click.echo(f"    Uptime: {int(info['uptime'])}s, {info['requests']} requests")
+            for repo in info['repositories']:
+                click.echo(f"    Warm: {repo}")
+            for watched in info.get('watched', []):
+                click.echo(f"    Watching: {watched['worktree']} ({watched['events']} events, "
+                           f"{watched['ignored_events']} ignored, {watched['recomputes']} recomputes)")
+        return
+    
+    if client is not None:
+        click.echo(click.style("✓ A gitme daemon is already running.", fg="green"))
+        return
+    
+    if background:
+        pid = start_background(config)
+        click.echo(click.style(f"✓ Started gitme daemon (pid {pid}).", fg="green"))
+        return
+    
+    click.echo(click.style(f"🚀 gitme daemon listening on {socket_path(config)} (Ctrl+C to stop)", fg="green"))
+    try:
+        GitmeDaemon(socket_path(config)).serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+@cli.command()
+@click.option('--debounce', default=0.3, type=click.FloatRange(min=0), help='Seconds of quiet before recomputing (default: 0.3)')
+def watch(debounce: float):
+    """Watch this repository and keep its diffs computed
+    
+    Uses inotify (Linux) to notice changes, skipping files .gitignore
+    excludes, and recomputes the staged, unstaged and untracked changes
+    once a burst of edits settles. The daemon does the same for each
+    repository it serves when "watch" is true in the config.
+    """
+    from .storage import canonical_repo_root
+    from .watcher import DiffWatcher, WatcherUnavailable
+    config = Config()
+    analyzer = GitDiffAnalyzer(
+        in_process=config.get("git_engine") == "in-process",
+        max_file_bytes=config.get("max_diff_bytes_per_file", 65536),
+        max_total_bytes=config.get("max_diff_bytes_total", 4194304),
+        diff_cache=DiffCache(max_bytes=config.get("diff_cache_max_bytes", 67108864))
+        if config.get("diff_cache", True) else None,
+        use_status=config.get("status_snapshot", True)
+    )
+    if not analyzer.in_git_repo:
+        click.echo(click.style("𐩃 Error: Not in a git repository", fg="red", bold=True), err=True)
+        return
+    
+    def report():
+        staged = watcher.snapshot("staged") or {}
+        changed = watcher.snapshot("all") or {}
+        untracked = watcher.snapshot("untracked") or []
+        click.echo(f"↻ {len(staged)} staged, {len(changed)} changed, {len(untracked)} untracked "
+                   f"({watcher.last_duration:.2f}s, {watcher.events} events, {watcher.ignored_events} ignored)")
+    
+    try:
+        watcher = DiffWatcher(analyzer, canonical_repo_root(os.getcwd()), debounce=debounce, on_update=report)
+    except WatcherUnavailable as e:
+        click.echo(click.style(f"𐩃 Error: {e}", fg="red", bold=True), err=True)
+        return
+    click.echo(click.style(f"👀 Watching {watcher.worktree} (Ctrl+C to stop)", fg="green"))
+    watcher.start()
+    try:
+        watcher.wait_stopped()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop()
+
+
+def _show_batch_status(counts: Dict[str, int]) -> None:
+    """One progress line per poll of a provider batch job"""
+    states = ", ".join(f"{count} {state}" for state, count in counts.items() if count)
+    click.echo(click.style(f"⏳ Batch job: {states or 'submitted'}", dim=True))
+
+
+@cli.command()
+@click.argument('root', default='.', type=click.Path(exists=True, file_okay=False))
+@click.option('--all', '-a', 'all_changes', is_flag=True, help='Analyze all changes (staged and unstaged)')
+@click.option('--model', '-m', default='claude-haiku-4-5', help='Model to use (Claude or OpenAI)')
+@click.option('--provider', '-p', type=click.Choice(['anthropic', 'openai']), default='anthropic', help='LLM provider to use (default: anthropic)')
+@click.option('--commit', '-c', is_flag=True, help='Commit all changes in each repository with its generated message')
+@click.option('--jobs', '-j', type=click.IntRange(min=1), help='Processes collecting diffs (default: one per CPU)')
+@click.option('--max-in-flight', type=click.IntRange(min=1), help='Generations running at once (default: 8)')
+@click.option('--depth', default=4, type=click.IntRange(min=0), help='How deep to look for repositories under ROOT (default: 4)')
+@click.option('--batch-api/--no-batch-api', default=None, help="Send all prompts as one discounted provider batch job and wait for it")
+def batch(root: str, all_changes: bool, model: str, provider: str, commit: bool, jobs: Optional[int],
+          max_in_flight: Optional[int], depth: int, batch_api: Optional[bool]):
+    """Generate commit messages for every repository under ROOT
+    
+    Finds the git work trees under ROOT, collects their diffs in parallel
+    processes and generates the messages concurrently. Prints each message,
+    or with -c commits it, then a summary with per-repository timings.
+    Untracked files are left alone.
+    """
+    import asyncio
+    from . import batch as batch_mode
+    config = Config()
+    if provider == 'openai':
+        # Set default OpenAI model if Claude model was specified
+        model = 'gpt-4o-mini'
+    # Committing takes every change, as `gitme -c` does
+    all_changes = all_changes or commit
+    
+    repos = batch_mode.find_repositories(root, max_depth=depth)
+    if not repos:
+        click.echo(click.style(f"⚠️  No git repositories found under {root}", fg="yellow"))
+        return
+    click.echo(click.style(f"🔍 Found {len(repos)} repositories; collecting changes...", fg="green"))
+    results = batch_mode.collect_all(repos, staged_only=not all_changes, config=config, jobs=jobs)
+    
+    try:
+        cache = None
+        if config.get("response_cache", True):
+            cache = ResponseCache(ttl=config.get("response_cache_ttl", 86400),
+                                  max_entries=config.get("response_cache_max_entries", 200))
+        generator = CommitMessageGenerator(cache=cache, config=config, provider=provider, model=model)
+    except (ValueError, ImportError) as e:
+        click.echo(click.style(f"𐩃 Error: {e}", fg="red", bold=True), err=True)
+        return
+    storage = open_storage(config)
+    root_path = os.path.realpath(root)
+    
+    def done(result):
+        if result.error:
+            return
+        if commit:
+            batch_mode.commit(result, all_changes=True)
+            if result.committed:
+                storage.save_message(result.message, result.repo, result.file_changes, provider, model)
+        click.echo()
+        click.echo(click.style(f"📦 {os.path.relpath(result.repo, root_path)}", fg="green", bold=True))
+        click.echo(click.style(result.message, fg="cyan"))
+    
+    if config.get("batch_api", False) if batch_api is None else batch_api:
+        click.echo(click.style("📨 Submitting one batch job; this can take a while...", fg="green"))
+        batch_mode.submit_all(results, generator, on_status=_show_batch_status)
+        for result in results:
+            if result.file_changes:
+                done(result)
+    else:
+        asyncio.run(batch_mode.generate_all(results, generator,
+                                            max_in_flight or config.get("batch_max_in_flight", 8), on_done=done))
+    
+    click.echo()
+    for line in batch_mode.format_summary(results, root_path):
+        click.echo(line)
+    counts = {}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+    click.echo(click.style(", ".join(f"{count} {status}" for status, count in sorted(counts.items())), bold=True))
+
+
+@cli.command()
+@click.argument('revision_range')
+@click.option('--model', '-m', default='claude-haiku-4-5', help='Model to use (Claude or OpenAI)')
+@click.option('--provider', '-p', type=click.Choice(['anthropic', 'openai']), default='anthropic', help='LLM provider to use (default: anthropic)')
+@click.option('--concurrency', type=click.IntRange(min=1), help='Generations running at once (default: 4)')
+@click.option('--dry-run', is_flag=True, help='Show the new messages without rewriting any commit')
+@click.option('--yes', '-y', is_flag=True, help='Rewrite without asking for confirmation')
+@click.option('--batch-api/--no-batch-api', default=None, help="Send all prompts as one discounted provider batch job and wait for it")
+def reword(revision_range: str, model: str, provider: str, concurrency: Optional[int], dry_run: bool, yes: bool,
+           batch_api: Optional[bool]):
+    """Regenerate the messages of the commits in REVISION_RANGE
+    
+    REVISION_RANGE is BASE..HEAD, or BASE for short. The messages are
+    generated concurrently and the commits are then recreated with the same
+    trees and authors, and the branch moved to them; the old head is kept as
+    ORIG_HEAD. The work tree is not touched. If generation stops halfway,
+    running the command again reuses the messages already generated.
+    """
+    import asyncio
+    from .reword import Reworder, RewordError
+    config = Config()
+    if provider == 'openai':
+        # Set default OpenAI model if Claude model was specified
+        model = 'gpt-4o-mini'
+    
+    analyzer = GitDiffAnalyzer(
+        max_file_bytes=config.get("max_diff_bytes_per_file", 65536),
+        max_total_bytes=config.get("max_diff_bytes_total", 4194304)
+    )
+    if not analyzer.in_git_repo:
+        click.echo(click.style("𐩃 Error: Not in a git repository. Please run 'git init' to initialize a repository first.", fg="red", bold=True), err=True)
+        return
+    reworder = Reworder(revision_range, analyzer, provider=provider, model=model)
+    try:
+        commits = reworder.plan()
+    except RewordError as e:
+        click.echo(click.style(f"𐩃 Error: {e}", fg="red", bold=True), err=True)
+        return
+    
+    try:
+        cache = None
+        if config.get("response_cache", True):
+            cache = ResponseCache(ttl=config.get("response_cache_ttl", 86400),
+                                  max_entries=config.get("response_cache_max_entries", 200))
+        generator = CommitMessageGenerator(cache=cache, config=config, provider=provider, model=model)
+    except (ValueError, ImportError) as e:
+        click.echo(click.style(f"𐩃 Error: {e}", fg="red", bold=True), err=True)
+        return
+    
+    click.echo(click.style(f"✏️  Rewording {len(commits)} commits in {reworder.revision_range}...", fg="green"))
+    
+    def show(commit, message):
+        click.echo()
+        click.echo(click.style(f"{commit.oid[:7]} {commit.subject}", dim=True))
+        click.echo(click.style(message, fg="cyan"))
+    
+    if config.get("batch_api", False) if batch_api is None else batch_api:
+        from .llm_client import BatchJobError
+        click.echo(click.style("📨 Submitting one batch job; this can take a while...", fg="green"))
+        try:
+            messages, errors = reworder.generate_batch(commits, generator, on_status=_show_batch_status)
+        except BatchJobError as e:
+            click.echo(click.style(f"𐩃 Error: {e}", fg="red", bold=True), err=True)
+            return
+        for commit in commits:
+            if commit.oid in messages:
+                show(commit, messages[commit.oid])
+    else:
+        messages, errors = asyncio.run(reworder.generate(commits, generator,
+                                                         concurrency or config.get("reword_concurrency", 4),
+                                                         on_message=show))
+    click.echo()
+    if errors:
+        for oid, error in errors.items():
+            click.echo(click.style(f"𐩃 {oid[:7]}: {error}", fg="red"), err=True)
+        click.echo(click.style(f"⚠️  {len(errors)} of {len(commits)} messages failed; nothing was rewritten. "
+                               f"Run the command again to resume.", fg="yellow"), err=True)
+        return
+    if dry_run:
+        click.echo(click.style("Dry run: nothing was rewritten. The messages are kept for the next run.", fg="yellow"))
+        return
+    if not yes and not click.confirm(f"Rewrite {len(commits)} commits on {reworder.ref}?", default=True):
+        click.echo(click.style("Reword cancelled. The messages are kept for the next run.", fg="yellow"))
+        return
+    try:
+        new_head = reworder.rewrite(commits, messages)
+    except RewordError as e:
+        click.echo(click.style(f"𐩃 Error: {e}", fg="red", bold=True), err=True)
+        return
+    click.echo(click.style(f"✓ Rewrote {len(commits)} commits; HEAD is now {new_head[:7]} "
+                           f"(the old head is ORIG_HEAD)", fg="green", bold=True))
+
+
+@cli.command()
+@click.argument('revision_range')
+@click.option('--model', '-m', default='claude-haiku-4-5', help='Model to use (Claude or OpenAI)')
+@click.option('--provider', '-p', type=click.Choice(['anthropic', 'openai']), default='anthropic', help='LLM provider to use (default: anthropic)')
+@click.option('--no-cache', is_flag=True, help='Summarize every commit again instead of reusing cached summaries')
+def pr(revision_range: str, model: str, provider: str, no_cache: bool):
+    """Write a pull request description for the commits in REVISION_RANGE
+    
+    REVISION_RANGE is BASE..HEAD, or BASE for BASE..HEAD. Each commit is
+    summarized once and its summary cached by commit id, then the summaries
+    are turned into the description, so running it again after adding
+    commits only summarizes the new ones.
+    """
+    import asyncio
+    from .pr import PullRequestError, PullRequestWriter, SummaryCache
+    config = Config()
+    if provider == 'openai':
+        # Set default OpenAI model if Claude model was specified
+        model = 'gpt-4o-mini'
+    
+    analyzer = GitDiffAnalyzer(
+        max_file_bytes=config.get("max_diff_bytes_per_file", 65536),
+        max_total_bytes=config.get("max_diff_bytes_total", 4194304)
+    )
+    if not analyzer.in_git_repo:
+        click.echo(click.style("𐩃 Error: Not in a git repository. Please run 'git init' to initialize a repository first.", fg="red", bold=True), err=True)
+        return
+    try:
+        cache = None
+        if config.get("response_cache", True) and not no_cache:
+            cache = ResponseCache(ttl=config.get("response_cache_ttl", 86400),
+                                  max_entries=config.get("response_cache_max_entries", 200))
+        generator = CommitMessageGenerator(cache=cache, config=config, provider=provider, model=model)
+    except (ValueError, ImportError) as e:
+        click.echo(click.style(f"𐩃 Error: {e}", fg="red", bold=True), err=True)
+        return
+    summary_cache = SummaryCache() if config.get("commit_summary_cache", True) and not no_cache else None
+    writer = PullRequestWriter(revision_range, analyzer, generator, cache=summary_cache, provider=provider)
+    try:
+        commits = writer.commits()
+    except PullRequestError as e:
+        click.echo(click.style(f"𐩃 Error: {e}", fg="red", bold=True), err=True)
+        return
+    
+    click.echo(click.style(f"📝 Summarizing {len(commits)} commits in {writer.revision_range}...", fg="green"))
+    summaries, errors = asyncio.run(writer.summarize(commits))
+    if errors:
+        for oid, error in errors.items():
+            click.echo(click.style(f"𐩃 {oid[:7]}: {error}", fg="red"), err=True)
+        click.echo(click.style(f"⚠️  {len(errors)} of {len(commits)} commits could not be summarized. "
+                               f"Run the command again to retry them.", fg="yellow"), err=True)
+        return
+    click.echo(click.style(f"⚡ {len(commits) - writer.summarized} summaries reused, {writer.summarized} new",
+                           dim=True))
+    
+    streamed = []
+    def show_token(text: str):
+        if not streamed:
+            text = text.lstrip()
+            if not text:
+                return
+            click.echo()
+            click.echo(click.style("🎉 Pull request description:", fg="green", bold=True))
+        streamed.append(text)
+        click.echo(click.style(text, fg="cyan"), nl=False)
+    
+    try:
+        description = writer.describe(commits, summaries,
+                                      on_token=show_token if config.get("stream_output", True) else None)
+    except Exception as e:
+        click.echo(click.style(f"𐩃 Error: {e}", fg="red", bold=True), err=True)
+        return
+    if streamed:
+        click.echo()
+    if "".join(streamed).strip() != description:
+        # Cached or not streamed: show the final description
+        click.echo()
+        click.echo(click.style("🎉 Pull request description:", fg="green", bold=True))
+        click.echo(click.style(description, fg="cyan"))
 
 
 def main():
@@ -272,7 +789,7 @@ def main():
         sys.argv.append('generate')
         cli()
     # If the first argument is a known subcommand, use the group
-    elif len(sys.argv) > 1 and sys.argv[1] in ['generate', 'show']:
+    elif len(sys.argv) > 1 and sys.argv[1] in ['generate', 'show', 'daemon', 'watch', 'batch', 'reword', 'pr']:
         cli()
     # Otherwise, assume it's the old-style command and prepend 'generate'
     else:
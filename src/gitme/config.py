@@ -24,7 +24,33 @@ class Config:
             "model": "claude-haiku-4-5",
             "max_tokens": 300,
             "temperature": 0.3,
-            "staged_only": True
+            "staged_only": True,
+            "git_engine": "subprocess",
+            "max_diff_bytes_per_file": 65536,
+            "max_diff_bytes_total": 4194304,
+            "status_snapshot": True,
+            "diff_cache": True,
+            "diff_cache_max_bytes": 67108864,
+            "response_cache": True,
+            "response_cache_ttl": 86400,
+            "response_cache_max_entries": 200,
+            "stream_output": True,
+            "max_prompt_tokens": 8000,
+            "map_reduce_threshold_tokens": 20000,
+            "map_reduce_chunk_tokens": 6000,
+            "map_reduce_concurrency": 4,
+            "history_backend": "jsonl",
+            "history_max_entries": 100,
+            "speculative_generation": True,
+            "batch_max_in_flight": 8,
+            "reword_concurrency": 4,
+            "batch_api": False,
+            "batch_api_poll_interval": 10,
+            "batch_api_timeout": 86400,
+            "commit_summary_cache": True,
+            "daemon": True,
+            "watch": False,
+            "watch_debounce": 0.3
         }
     
     def save_config(self):
@@ -0,0 +1,346 @@
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from . import __version__
+from .config import Config
+
+
+class DaemonError(Exception):
+    """The daemon could not be reached or dropped the connection"""
+
+
+def socket_path(config: Optional[Config] = None) -> Path:
+    configured = (config or Config()).get("daemon_socket")
+    return Path(configured).expanduser() if configured else Path.home() / ".gitme" / "daemon.sock"
+
+
+class DaemonClient:
+    """Talks to a running `gitme daemon` over its Unix socket
+
+    Requests and replies are single JSON lines; a generation streams
+    {"token": ...} lines before its final reply. Errors the daemon reports
+    as ValueError or ImportError (e.g. a missing API key) are raised as
+    such, anything else as DaemonError.
+    """
+    
+    def __init__(self, path: Path, timeout: float = 300.0):
+        self.path = Path(path)
+        self.timeout = timeout
+    
+    @classmethod
+    def connect(cls, config: Optional[Config] = None) -> Optional["DaemonClient"]:
+        """A client for the daemon if one of this version is running, else None"""
+        path = socket_path(config)
+        if not path.exists():
+            return None
+        client = cls(path)
+        try:
+            reply = client.request("ping")
+        except DaemonError:
+            return None
+        # A daemon left running across an upgrade would answer in an old format
+        return client if reply.get("version") == __version__ else None
+    
+    def alive(self) -> bool:
+        try:
+            self.request("ping")
+            return True
+        except DaemonError:
+            return False
+    
+    def request(self, op: str, on_token: Optional[Callable[[str], None]] = None, **params) -> Dict:
+        reply = None
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(str(self.path))
+                sock.sendall(json.dumps(dict(params, op=op)).encode("utf-8") + b"\n")
+                with sock.makefile("rb") as replies:
+                    for line in replies:
+                        message = json.loads(line)
+                        if "token" not in message:
+                            reply = message
+                            break
+                        if on_token is not None:
+                            on_token(message["token"])
+        except (OSError, json.JSONDecodeError) as e:
+            raise DaemonError(f"gitme daemon at {self.path}: {e}") from e
+        if reply is None:
+            raise DaemonError(f"gitme daemon at {self.path} closed the connection")
+        if "error" in reply:
+            kind = {"ValueError": ValueError, "ImportError": ImportError}.get(reply.get("type"), DaemonError)
+            raise kind(reply["error"])
+        return reply
+    
+    def generate(self, file_changes: Dict[str, str], provider: str = "anthropic", model: Optional[str] = None,
+                 use_cache: bool = True, on_token: Optional[Callable[[str], None]] = None) -> Tuple[str, bool]:
+        """(commit message, whether it came from the response cache)"""
+        # The key from this shell wins over whatever the daemon was started with
+        api_key = os.environ.get("OPENAI_API_KEY" if provider == "openai" else "ANTHROPIC_API_KEY")
+        reply = self.request("generate", on_token=on_token, file_changes=file_changes, provider=provider,
+                             model=model, use_cache=use_cache, stream=on_token is not None, api_key=api_key)
+        return reply["message"], reply["cache_hit"]
+    
+    def status(self) -> Dict:
+        return self.request("status")
+    
+    def shutdown(self) -> None:
+        self.request("shutdown")
+
+
+class RemoteAnalyzer:
+    """The parts of GitDiffAnalyzer that `generate` uses, answered by the
+    daemon's warm analyzer for cwd. If the daemon goes away mid-run, the
+    remaining calls go to a local analyzer built by fallback."""
+    
+    def __init__(self, client: DaemonClient, cwd: str, fallback: Callable[[], object]):
+        self.client = client
+        self.cwd = cwd
+        self._fallback = fallback
+        self._local = None
+        probe = self._call("probe", lambda local: {"git_available": local.git_available,
+                                                   "in_git_repo": local.in_git_repo})
+        self.git_available = probe["git_available"]
+        self.in_git_repo = probe["in_git_repo"]
+    
+    def _call(self, op: str, local_call: Callable, **params):
+        if self._local is None:
+            try:
+                return self.client.request(op, cwd=self.cwd, **params)
+            except DaemonError:
+                self._local = self._fallback()
+        return local_call(self._local)
+    
+    def get_untracked_files(self) -> List[str]:
+        return self._call("untracked", lambda local: {"files": local.get_untracked_files()})["files"]
+    
+    def get_file_changes(self, staged_only: bool = True, single_pass: bool = False) -> Dict[str, str]:
+        reply = self._call("file_changes",
+                           lambda local: {"file_changes": local.get_file_changes(staged_only, single_pass)},
+                           staged_only=staged_only, single_pass=single_pass)
+        return reply["file_changes"]
+    
+    def get_file_changes_with_untracked(self, untracked_files: List[str], staged_only: bool = True) -> Dict[str, str]:
+        reply = self._call("file_changes",
+                           lambda local: {"file_changes": local.get_file_changes_with_untracked(untracked_files,
+                                                                                                staged_only)},
+                           staged_only=staged_only, untracked=untracked_files)
+        return reply["file_changes"]
+
+
+class GitmeDaemon:
+    """Serves gitme requests over a Unix socket from one long-lived process
+
+    Keeps a GitDiffAnalyzer per working directory (so git is probed once),
+    one DiffCache, and the SDK clients in llm_client's shared pool with
+    their keep-alive connections. Each connection carries one request.
+    """
+    
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else socket_path()
+        self.started = time.time()
+        self.requests = 0
+        self._analyzers: Dict[Tuple, Tuple[object, threading.Lock]] = {}
+        self._watchers: Dict[object, object] = {}
+        self._lock = threading.Lock()
+        self._diff_cache = None
+        self._server = None
+    
+    def analyzer(self, cwd: str, config: Config):
+        """Warm analyzer for cwd under the current budgets, and its lock"""
+        from .diff_cache import DiffCache
+        from .git_diff import GitDiffAnalyzer
+        
+        cwd = os.path.realpath(cwd)
+        key = (cwd, config.get("git_engine"), config.get("max_diff_bytes_per_file", 65536),
+               config.get("max_diff_bytes_total", 4194304), config.get("diff_cache", True),
+               config.get("status_snapshot", True))
+        with self._lock:
+            # A directory that was not a repository may have become one
+            if key not in self._analyzers or not self._analyzers[key][0].in_git_repo:
+                if config.get("diff_cache", True) and self._diff_cache is None:
+                    self._diff_cache = DiffCache(max_bytes=config.get("diff_cache_max_bytes", 67108864))
+                analyzer = GitDiffAnalyzer(
+                    in_process=config.get("git_engine") == "in-process",
+                    max_file_bytes=config.get("max_diff_bytes_per_file", 65536),
+                    max_total_bytes=config.get("max_diff_bytes_total", 4194304),
+                    diff_cache=self._diff_cache if config.get("diff_cache", True) else None,
+                    cwd=cwd,
+                    use_status=config.get("status_snapshot", True)
+                )
+                self._analyzers[key] = (analyzer, threading.Lock())
+            return self._analyzers[key]
+    
+    def watcher(self, analyzer, lock: threading.Lock, config: Config):
+        """DiffWatcher keeping analyzer's diffs computed, or None when
+        watching is off or inotify is unavailable"""
+        if not config.get("watch", False) or not analyzer.in_git_repo:
+            return None
+        with self._lock:
+            if analyzer not in self._watchers:
+                from .storage import canonical_repo_root
+                from .watcher import DiffWatcher, WatcherUnavailable
+                try:
+                    self._watchers[analyzer] = DiffWatcher(
+                        analyzer, canonical_repo_root(analyzer.cwd or os.getcwd()),
+                        debounce=config.get("watch_debounce", 0.3), lock=lock
+                    ).start()
+                except (WatcherUnavailable, OSError):
+                    self._watchers[analyzer] = None
+            return self._watchers[analyzer]
+    
+    def handle(self, request: Dict, send: Callable[[Dict], None]) -> None:
+        op = request.get("op")
+        self.requests += 1
+        config = Config()
+        if op == "ping":
+            send({"version": __version__, "pid": os.getpid()})
+        elif op == "status":
+            send({"version": __version__, "pid": os.getpid(), "uptime": time.time() - self.started,
+                  "requests": self.requests, "repositories": sorted({key[0] for key in self._analyzers}),
+                  "watched": [{"worktree": w.worktree, "events": w.events, "ignored_events": w.ignored_events,
+                               "recomputes": w.recomputes, "last_duration": w.last_duration}
+                              for w in self._watchers.values() if w is not None]})
+        elif op == "shutdown":
+            send({"stopping": True})
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+        elif op in ("probe", "untracked", "file_changes"):
+            cwd = request.get("cwd")
+            if not cwd or not os.path.isdir(cwd):
+                send({"error": f"no such directory: {cwd}"})
+                return
+            analyzer, lock = self.analyzer(cwd, config)
+            watcher = self.watcher(analyzer, lock, config)
+            if op == "file_changes" and request.get("untracked"):
+                # Runs its own git processes, so it needs no analyzer lock
+                send({"file_changes": analyzer.get_file_changes_with_untracked(
+                    request["untracked"], staged_only=request.get("staged_only", True))})
+                return
+            # Answer from the diffs computed after the last change, once they
+            # cover events still queued (a git add just before this request)
+            if watcher is not None and op != "probe" and watcher.wait_until_fresh(watcher.debounce):
+                snapshot = watcher.snapshot("untracked" if op == "untracked" else
+                                            "staged" if request.get("staged_only", True) else "all")
+                if snapshot is not None:
+                    send({"files": snapshot} if op == "untracked" else {"file_changes": snapshot})
+                    return
+            with lock:
+                if op == "probe":
+                    # A new gitme run: what git saw for the last one may be out of date
+                    analyzer.invalidate_status()
+                    send({"git_available": analyzer.git_available, "in_git_repo": analyzer.in_git_repo})
+                elif op == "untracked":
+                    send({"files": analyzer.get_untracked_files()})
+                else:
+                    send({"file_changes": analyzer.get_file_changes(
+                        staged_only=request.get("staged_only", True),
+                        single_pass=request.get("single_pass", False))})
+        elif op == "generate":
+            send(self._generate(request, config, lambda text: send({"token": text})))
+        else:
+            send({"error": f"unknown request: {op}"})
+    
+    def _generate(self, request: Dict, config: Config, on_token: Callable[[str], None]) -> Dict:
+        from .llm_client import CommitMessageGenerator
+        from .response_cache import ResponseCache
+        
+        cache = None
+        if config.get("response_cache", True) and request.get("use_cache", True):
+            cache = ResponseCache(ttl=config.get("response_cache_ttl", 86400),
+                                  max_entries=config.get("response_cache_max_entries", 200))
+        generator = CommitMessageGenerator(
+            api_key=request.get("api_key"),
+            cache=cache,
+            config=config,
+            provider=request.get("provider", "anthropic"),
+            model=request.get("model")
+        )
+        message = generator.generate_commit_message(
+            request["file_changes"], on_token=on_token if request.get("stream") else None
+        )
+        return {"message": message, "cache_hit": bool(cache is not None and cache.last_hit)}
+    
+    def serve_forever(self) -> None:
+        import socketserver
+        daemon = self
+        
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                line = self.rfile.readline()
+                if not line:
+                    return
+                
+                def send(reply: Dict) -> None:
+                    self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+                    self.wfile.flush()
+                
+                try:
+                    daemon.handle(json.loads(line), send)
+                except (ValueError, ImportError) as e:
+                    send({"error": str(e), "type": type(e).__name__})
+                except BrokenPipeError:
+                    pass
+                except Exception as e:
+                    send({"error": f"{type(e).__name__}: {e}"})
+        
+        self._claim_socket()
+        self._server = socketserver.ThreadingUnixStreamServer(str(self.path), Handler)
+        self._server.daemon_threads = True
+        os.chmod(self.path, 0o600)
+        # Load the SDK now rather than on the first generation
+        threading.Thread(target=self._warm_up, daemon=True).start()
+        try:
+            self._server.serve_forever()
+        finally:
+            for watcher in self._watchers.values():
+                if watcher is not None:
+                    watcher.stop()
+            self._server.server_close()
+            if self.path.exists():
+                self.path.unlink()
+            from .llm_client import shared_pool
+            shared_pool.close()
+    
+    def _claim_socket(self) -> None:
+        """Remove a socket left by a daemon that is no longer running"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if not self.path.exists():
+            return
+        if DaemonClient(self.path, timeout=2).alive():
+            raise RuntimeError(f"a gitme daemon is already running on {self.path}")
+        self.path.unlink()
+    
+    @staticmethod
+    def _warm_up() -> None:
+        from . import llm_client
+        try:
+            llm_client.Anthropic
+        except ImportError:
+            pass
+
+
+def start_background(config: Optional[Config] = None) -> int:
+    """Start a detached daemon process; returns its pid"""
+    import subprocess
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gitme.daemon"],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+    path = socket_path(config)
+    # Wait for the socket so the next gitme run already finds it
+    for _ in range(100):
+        if path.exists():
+            break
+        time.sleep(0.05)
+    return process.pid
+
+
+if __name__ == "__main__":
+    GitmeDaemon().serve_forever()
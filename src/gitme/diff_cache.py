@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional
+
+
+class DiffCache:
+    """On-disk cache of rendered per-file diffs under ~/.gitme/diff_cache
+
+    Entries are keyed by the blob ids on both sides of a change plus the
+    options that affect rendering, so an entry never goes stale. The least
+    recently used entries are evicted once the cache grows past max_bytes.
+    """
+
+    # Bump when the rendered format changes so old entries stop matching
+    FORMAT_VERSION = 1
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_bytes: int = 64 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir) if cache_dir else Path.home() / ".gitme" / "diff_cache"
+        self.stats_file = self.cache_dir / "stats.json"
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._written = 0
+
+    def key(self, old_oid: str, new_oid: str, old_mode: str, new_mode: str,
+            old_path: str, new_path: str, options: str = "") -> str:
+        # Paths appear in the rendered text, so they are part of the key too
+        material = "\0".join([str(self.FORMAT_VERSION), old_oid, new_oid, old_mode, new_mode,
+                              old_path, new_path, options])
+        return hashlib.sha256(material.encode("utf-8", errors="surrogateescape")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key[2:]
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8", errors="surrogateescape") as f:
+                patch = f.read()
+        except (FileNotFoundError, NotADirectoryError):
+            self.misses += 1
+            return None
+        # The modification time doubles as the last-used time for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return patch
+
+    def put(self, key: str, patch: str) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # A unique temporary name, since threads of one process can write the same key
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8", errors="surrogateescape") as f:
+                f.write(patch)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._written += len(patch)
+
+    def size(self) -> int:
+        return sum(entry[1] for entry in self._entries())
+
+    def _entries(self):
+        if not self.cache_dir.exists():
+            return []
+        entries = []
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime_ns, st.st_size, entry.path))
+        return entries
+
+    def evict(self) -> int:
+        """Remove least recently used entries until the cache fits; returns bytes freed"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for _, size, path in entries:
+            if total - freed <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                freed += size
+            except FileNotFoundError:
+                pass
+        return freed
+
+    def flush(self) -> Dict[str, int]:
+        """Evict if anything was written and add this run's counters to the
+        totals in stats.json; returns the updated totals"""
+        if self._written:
+            self.evict()
+            self._written = 0
+        totals = self.total_stats()
+        totals["hits"] += self.hits
+        totals["misses"] += self.misses
+        self.hits = self.misses = 0
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.stats_file, "w") as f:
+            json.dump(totals, f)
+        return totals
+
+    def total_stats(self) -> Dict[str, int]:
+        try:
+            with open(self.stats_file, "r") as f:
+                stats = json.load(f)
+            return {"hits": int(stats.get("hits", 0)), "misses": int(stats.get("misses", 0))}
+        except (FileNotFoundError, json.JSONDecodeError, ValueError, AttributeError):
+            return {"hits": 0, "misses": 0}
+
+    def clear(self) -> None:
+        for _, _, path in self._entries():
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
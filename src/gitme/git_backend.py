@@ -0,0 +1,148 @@
+import subprocess
+import threading
+from typing import Iterator, List, Optional, Tuple
+
+
+class SubprocessBackend:
+    """Runs every git request of a GitDiffAnalyzer as a fresh `git`
+    process, in cwd when given, and counts the processes it starts"""
+    
+    def __init__(self, cwd: Optional[str] = None):
+        self.forks = 0
+        self.cwd = cwd
+        # Passed to subprocess only when set, so the default calls are unchanged
+        self._in_cwd = {"cwd": cwd} if cwd else {}
+    
+    def _spawn(self, args: List[str], **kwargs) -> subprocess.Popen:
+        self.forks += 1
+        return subprocess.Popen(["git"] + args, **self._in_cwd, **kwargs)
+    
+    def check_git(self) -> bool:
+        self.forks += 1
+        try:
+            subprocess.run(["git", "--version"], capture_output=True, check=True, **self._in_cwd)
+            return True
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            return False
+    
+    def check_repo(self) -> bool:
+        self.forks += 1
+        try:
+            subprocess.run(
+                ["git", "rev-parse", "--git-dir"],
+                capture_output=True,
+                check=True,
+                **self._in_cwd
+            )
+            return True
+        except subprocess.CalledProcessError:
+            return False
+    
+    def probe(self) -> Tuple[bool, Optional[Tuple[str, str, str]]]:
+        """(whether git is installed, and outside a work tree None, else the
+        git dir, the top of the work tree and the cwd relative to it), all
+        from one git process"""
+        self.forks += 1
+        try:
+            result = subprocess.run(
+                ["git", "rev-parse", "--absolute-git-dir", "--show-toplevel", "--show-prefix"],
+                capture_output=True,
+                text=True,
+                **self._in_cwd
+            )
+        except FileNotFoundError:
+            return False, None
+        lines = result.stdout.split("\n")
+        if result.returncode != 0 or len(lines) < 3:
+            return True, None
+        return True, (lines[0], lines[1], lines[2])
+    
+    def run(self, args: List[str], input: Optional[str] = None) -> Optional[str]:
+        self.forks += 1
+        kwargs = {"input": input} if input is not None else {}
+        try:
+            result = subprocess.run(
+                ["git"] + args,
+                capture_output=True,
+                text=True,
+                errors="replace",
+                check=True,
+                **self._in_cwd,
+                **kwargs
+            )
+            return result.stdout.strip()
+        except subprocess.CalledProcessError as e:
+            print(f"Git command failed: {e.stderr}")
+            return None
+    
+    def stream(self, args: List[str], chunk_size: int = 65536) -> Iterator[str]:
+        """Run a git command and yield its stdout line by line
+
+        Lines longer than chunk_size are yielded in pieces, so memory use
+        stays bounded. If the consumer stops early, git is killed instead
+        of being left to write the rest of its output.
+        """
+        # Paths that are not UTF-8 must not stop the diff
+        process = self._spawn(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, errors="replace")
+        finished = False
+        try:
+            for line in iter(lambda: process.stdout.readline(chunk_size), ""):
+                yield line
+            finished = True
+        finally:
+            if not finished:
+                process.kill()
+            process.stdout.close()
+            stderr = process.stderr.read()
+            process.stderr.close()
+            if process.wait() != 0 and finished:
+                print(f"Git command failed: {stderr}")
+    
+    def diff_commit(self, commit: str) -> Optional[str]:
+        """Patch introduced by a commit relative to its first parent"""
+        return self.run(["-c", "core.quotePath=false", "diff-tree", "-p", "-r", "-M",
+                         "--root", "--no-commit-id", commit])
+    
+    def diff_commits(self, commits: List[Tuple[str, Optional[str]]]) -> Iterator[Tuple[str, str]]:
+        """(commit, patch) for every (commit, parent) pair, all from one
+        `git diff-tree --stdin` process. Commit and parent must be full
+        object ids; a parent of None diffs against the empty tree. Patches
+        are yielded one at a time as diff-tree produces them."""
+        process = self._spawn(
+            ["-c", "core.quotePath=false", "diff-tree", "--stdin", "-p", "-r", "-M",
+             "--root", "--always", "--format=%x01%H"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+        
+        # Written from a thread so a long range cannot fill both pipes
+        def feed():
+            try:
+                for commit, parent in commits:
+                    process.stdin.write(f"{commit} {parent}\n".encode() if parent else f"{commit}\n".encode())
+                process.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+        
+        writer = threading.Thread(target=feed, daemon=True)
+        writer.start()
+        current = None
+        lines: List[bytes] = []
+        try:
+            for line in process.stdout:
+                if line.startswith(b"\x01"):
+                    if current is not None:
+                        yield current, b"".join(lines).decode("utf-8", errors="replace").strip()
+                    current = line[1:].strip().decode()
+                    lines = []
+                else:
+                    lines.append(line)
+            if current is not None:
+                yield current, b"".join(lines).decode("utf-8", errors="replace").strip()
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.stdout.close()
+            process.wait()
+            writer.join()
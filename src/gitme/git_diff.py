@@ -1,46 +1,367 @@
-import subprocess
+import io
 import json
-from typing import Dict, List, Optional
+import os
+import shutil
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .diff_cache import DiffCache
+from .git_backend import SubprocessBackend
+
+
+def _unquote_path(path: str) -> str:
+    """Undo git's C-style quoting of paths containing special characters"""
+    if not (len(path) >= 2 and path[0] == '"' and path[-1] == '"'):
+        return path
+    escapes = {'a': 7, 'b': 8, 't': 9, 'n': 10, 'v': 11, 'f': 12, 'r': 13, '"': 34, '\\': 92}
+    body = path[1:-1]
+    out = bytearray()
+    i = 0
+    while i < len(body):
+        ch = body[i]
+        if ch == '\\' and i + 1 < len(body):
+            nxt = body[i + 1]
+            if nxt in escapes:
+                out.append(escapes[nxt])
+                i += 2
+                continue
+            if nxt.isdigit():
+                out.append(int(body[i + 1:i + 4], 8))
+                i += 4
+                continue
+        out.extend(ch.encode('utf-8'))
+        i += 1
+    return out.decode('utf-8', errors='replace')
+
+
+def _strip_prefix(path: str) -> str:
+    path = _unquote_path(path)
+    if path.startswith(("a/", "b/")):
+        return path[2:]
+    return path
+
+
+def _patch_filename(header: List[str]) -> Optional[str]:
+    """Work out which path a single-file patch belongs to from its header lines"""
+    old_name = new_name = None
+    for line in header:
+        if line.startswith("rename to ") or line.startswith("copy to "):
+            return _unquote_path(line.split(" to ", 1)[1])
+        if line.startswith("+++ "):
+            target = line[4:].rstrip("\t")
+            if target != "/dev/null":
+                new_name = _strip_prefix(target)
+        elif line.startswith("--- "):
+            source = line[4:].rstrip("\t")
+            if source != "/dev/null":
+                old_name = _strip_prefix(source)
+        elif line.startswith("@@"):
+            break
+    if new_name or old_name:
+        return new_name or old_name
+    
+    # Binary and mode-only patches have no ---/+++ lines; for those the
+    # "diff --git a/<path> b/<path>" line carries the same path twice.
+    rest = header[0][len("diff --git "):]
+    if rest.startswith('"'):
+        end = rest.find('" ', 1)
+        return _strip_prefix(rest[:end + 1]) if end != -1 else None
+    half = (len(rest) - 1) // 2
+    if rest[half] == " " and rest[2:half] == rest[half + 3:]:
+        return rest[2:half]
+    return None
+
+
+TRUNCATED_MARKER = "... [diff truncated]"
+
+
+def iter_file_patches(lines: Iterable[str], max_file_bytes: Optional[int] = None,
+                      max_total_bytes: Optional[int] = None) -> Iterator[Tuple[str, str]]:
+    """Split a multi-file `git diff` stream into (filename, patch) pairs
+
+    Lines are consumed lazily, so only one file's patch is held in memory
+    at a time. Input may also be chunks of over-long lines. With budgets
+    set, the part of a file's patch past max_file_bytes is skipped, and
+    reading stops altogether once max_total_bytes have been kept. Header
+    lines are always kept so the file can still be identified.
+    """
+    current: List[str] = []
+    header_lines = 0
+    in_header = False
+    truncated = False
+    kept = 0
+    total = 0
+    at_line_start = True
+    
+    def finish() -> Optional[Tuple[str, str]]:
+        filename = _patch_filename([line.rstrip("\n") for line in current[:header_lines]])
+        if filename:
+            return filename, "".join(current).strip()
+        return None
+    
+    def mark_truncated():
+        if current and not current[-1].endswith("\n"):
+            current.append("\n")
+        current.append(TRUNCATED_MARKER + "\n")
+    
+    for piece in lines:
+        starts_line = at_line_start
+        at_line_start = piece.endswith("\n")
+        if starts_line and piece.startswith("diff --git "):
+            if current:
+                patch = finish()
+                if patch:
+                    yield patch
+            current = []
+            header_lines = 0
+            in_header = True
+            truncated = False
+            kept = 0
+        elif not current:
+            continue
+        
+        size = len(piece.encode("utf-8", errors="surrogateescape"))
+        if in_header and starts_line and piece.startswith(("@@", "Binary files ", "GIT binary patch")):
+            in_header = False
+        if in_header:
+            current.append(piece)
+            header_lines += 1
+            total += size
+            continue
+        if truncated:
+            continue
+        if max_total_bytes is not None and total + size > max_total_bytes:
+            mark_truncated()
+            break
+        if max_file_bytes is not None and kept + size > max_file_bytes:
+            mark_truncated()
+            truncated = True
+            continue
+        current.append(piece)
+        kept += size
+        total += size
+    
+    if current:
+        patch = finish()
+        if patch:
+            yield patch
+
+
+def _patch_lines(patch: str) -> Iterator[str]:
+    """Lines of a patch held in memory, with their terminators"""
+    return io.StringIO(patch, newline="\n")
+
+
+class RawChange:
+    """One entry of `git diff --raw` output"""
+    
+    def __init__(self, old_mode: str, new_mode: str, old_oid: str, new_oid: str,
+                 status: str, old_path: str, new_path: str):
+        self.old_mode = old_mode
+        self.new_mode = new_mode
+        self.old_oid = old_oid
+        self.new_oid = new_oid
+        self.status = status
+        self.old_path = old_path
+        self.new_path = new_path
+
+
+def parse_raw_diff(output: str) -> List[RawChange]:
+    """Parse `git diff --raw -z --no-abbrev` output"""
+    tokens = output.split("\0")
+    changes = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        i += 1
+        if not token.startswith(":"):
+            continue
+        fields = token[1:].split(" ")
+        if len(fields) < 5:
+            continue
+        old_mode, new_mode, old_oid, new_oid, status = fields[:5]
+        if status[:1] in ("R", "C"):
+            old_path, new_path = tokens[i], tokens[i + 1]
+            i += 2
+        else:
+            old_path = new_path = tokens[i]
+            i += 1
+        changes.append(RawChange(old_mode, new_mode, old_oid, new_oid, status, old_path, new_path))
+    return changes
+
+
+NULL_OID = "0" * 40
+NULL_MODE = "000000"
+
+
+class StatusEntry:
+    """One changed path from `git status --porcelain=v2`
+
+    xy holds the index and worktree status letters ("." for unchanged);
+    the modes and blob ids are those in HEAD and the index, plus the
+    worktree mode. orig_path is set for renames and copies.
+    """
+    
+    def __init__(self, xy: str, head_mode: str, index_mode: str, worktree_mode: str,
+                 head_oid: str, index_oid: str, path: str, orig_path: Optional[str] = None,
+                 score: Optional[str] = None):
+        self.xy = xy
+        self.head_mode = head_mode
+        self.index_mode = index_mode
+        self.worktree_mode = worktree_mode
+        self.head_oid = head_oid
+        self.index_oid = index_oid
+        self.path = path
+        self.orig_path = orig_path
+        self.score = score
+    
+    @property
+    def staged(self) -> bool:
+        return self.xy[0] != "."
+    
+    @property
+    def unstaged(self) -> bool:
+        return self.xy[1] != "."
+
+
+class StatusSnapshot:
+    """Staged, unstaged and untracked paths from a single
+    `git status --porcelain=v2 -z --untracked-files=all`, i.e. one walk of
+    the index and worktree. Paths are relative to the repository root."""
+    
+    COMMAND = ["status", "--porcelain=v2", "-z", "--untracked-files=all"]
+    
+    def __init__(self, entries: List[StatusEntry], untracked: List[str], unmerged: List[str]):
+        self.entries = entries
+        self.untracked = untracked
+        self.unmerged = unmerged
+    
+    @classmethod
+    def parse(cls, output: str) -> "StatusSnapshot":
+        entries, untracked, unmerged = [], [], []
+        tokens = output.split("\0")
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            i += 1
+            kind = token[:2]
+            if kind == "1 ":
+                fields = token.split(" ", 8)
+                entries.append(StatusEntry(fields[1], fields[3], fields[4], fields[5], fields[6], fields[7], fields[8]))
+            elif kind == "2 ":
+                # The original path follows as its own NUL-terminated field
+                fields = token.split(" ", 9)
+                entries.append(StatusEntry(fields[1], fields[3], fields[4], fields[5], fields[6], fields[7],
+                                           fields[9], orig_path=tokens[i], score=fields[8]))
+                i += 1
+            elif kind == "u ":
+                unmerged.append(token.split(" ", 10)[10])
+            elif kind == "? ":
+                untracked.append(token[2:])
+        return cls(entries, untracked, unmerged)
+    
+    def has_changes(self, staged_only: bool = True) -> bool:
+        if self.unmerged:
+            return True
+        return any(entry.staged or (not staged_only and entry.unstaged) for entry in self.entries)
+    
+    def raw_changes(self, staged_only: bool = True) -> Optional[List[RawChange]]:
+        """The changes `git diff --raw --no-abbrev -M` would list for the
+        index (staged_only) or the worktree against HEAD, or None when status
+        cannot tell (unmerged paths). status does not hash worktree files, so
+        modified ones get a null new blob id; the rename score is that of
+        the index."""
+        if self.unmerged:
+            return None
+        changes = []
+        for entry in self.entries:
+            old_path = entry.orig_path or entry.path
+            if staged_only:
+                if not entry.staged:
+                    continue
+                new_mode, new_oid = entry.index_mode, entry.index_oid
+            else:
+                if not (entry.staged or entry.unstaged):
+                    continue
+                new_mode = entry.worktree_mode
+                new_oid = NULL_OID if entry.unstaged or new_mode == NULL_MODE else entry.index_oid
+            if entry.head_mode == NULL_MODE and new_mode == NULL_MODE:
+                # Added to the index, then deleted from the worktree
+                continue
+            if entry.orig_path and entry.xy[0] in "RC":
+                status = entry.score
+            elif entry.head_mode == NULL_MODE:
+                status = "A"
+            elif new_mode == NULL_MODE:
+                status = "D"
+            else:
+                status = "M"
+            changes.append(RawChange(entry.head_mode, new_mode, entry.head_oid, new_oid, status,
+                                     old_path, entry.path))
+        return changes
+
+
+def _stat_key(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
 
 
 class GitDiffAnalyzer:
-    def __init__(self):
-        self.git_available = self._check_git()
-        self.in_git_repo = self._check_git_repo()
+    def __init__(self, in_process: bool = False,
+                 max_file_bytes: Optional[int] = None, max_total_bytes: Optional[int] = None,
+                 diff_cache: Optional[DiffCache] = None, cwd: Optional[str] = None,
+                 use_status: bool = False):
+        # Directory git runs in; None means the process's cwd
+        self.cwd = cwd
+        self.backend = SubprocessBackend(cwd)
+        self.diff_cache = diff_cache
+        self._toplevel: Optional[str] = None
+        # Serve untracked files and the list of changes from one `git status`
+        self.use_status = use_status
+        self._repo_paths: Optional[Tuple[str, str, str]] = None
+        self._status: Optional[Tuple[StatusSnapshot, Optional[Tuple[int, int, int]], float]] = None
+        # Budgets for diff text kept in memory, per file and overall
+        self.max_file_bytes = max_file_bytes
+        self.max_total_bytes = max_total_bytes
+        # In-process reader for the repository, used before falling back to git
+        self.repository = None
+        if in_process:
+            from .git_objects import open_repository
+            self.repository = open_repository(cwd)
+        if use_status and self.repository is None:
+            # One rev-parse stands in for both probes and finds the paths status needs
+            self.git_available, self._repo_paths = self.backend.probe()
+            self.in_git_repo = self._repo_paths is not None
+            if self._repo_paths is not None:
+                self._toplevel = self._repo_paths[1]
+        else:
+            self.git_available = self._check_git()
+            self.in_git_repo = self._check_git_repo()
     
     def _check_git(self) -> bool:
-        try:
-            subprocess.run(["git", "--version"], capture_output=True, check=True)
-            return True
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            return False
+        if self.repository is not None:
+            return shutil.which("git") is not None
+        return self.backend.check_git()
     
     def _check_git_repo(self) -> bool:
         """Check if current directory is inside a git repository"""
         if not self.git_available:
             return False
-        try:
-            result = subprocess.run(
-                ["git", "rev-parse", "--git-dir"],
-                capture_output=True,
-                check=True
-            )
+        if self.repository is not None:
             return True
-        except subprocess.CalledProcessError:
-            return False
+        return self.backend.check_repo()
     
-    def _run_git_command(self, args: List[str]) -> Optional[str]:
-        try:
-            result = subprocess.run(
-                ["git"] + args,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            return result.stdout.strip()
-        except subprocess.CalledProcessError as e:
-            print(f"Git command failed: {e.stderr}")
-            return None
+    def _run_git_command(self, args: List[str], input: Optional[str] = None) -> Optional[str]:
+        if input is not None:
+            return self.backend.run(args, input=input)
+        return self.backend.run(args)
+    
+    def _stream_git_command(self, args: List[str]) -> Iterator[str]:
+        """Run a git command and yield its stdout line by line"""
+        return self.backend.stream(args)
     
     def get_staged_diff(self) -> Optional[str]:
         return self._run_git_command(["diff", "--staged"])
@@ -48,7 +369,27 @@ class GitDiffAnalyzer:
     def get_all_diff(self) -> Optional[str]:
         return self._run_git_command(["diff", "HEAD"])
     
-    def get_file_changes(self, staged_only: bool = True) -> Dict[str, str]:
+    def get_file_changes(self, staged_only: bool = True, single_pass: bool = False) -> Dict[str, str]:
+        if self.repository is not None:
+            from .git_objects import GitObjectError
+            try:
+                file_changes = self.repository.file_changes(staged_only, max_blob_bytes=self.max_total_bytes)
+                return self._apply_budgets(file_changes, self.max_file_bytes)
+            except (GitObjectError, OSError):
+                pass
+        
+        snapshot = self.status() if self.use_status else None
+        if snapshot is not None and not snapshot.has_changes(staged_only):
+            return {}
+        
+        if self.diff_cache is not None:
+            file_changes = self._get_file_changes_cached(staged_only, snapshot)
+            if file_changes is not None:
+                return file_changes
+        
+        if single_pass:
+            return self._get_file_changes_single_pass(staged_only)
+        
         diff_args = ["diff", "--name-status"]
         if staged_only:
             diff_args.append("--staged")
@@ -80,12 +421,213 @@ class GitDiffAnalyzer:
         
         return file_changes
     
+    def _apply_budgets(self, file_changes: Dict[str, str], max_file_bytes: Optional[int]) -> Dict[str, str]:
+        """Truncate already collected diffs to the analyzer's budgets"""
+        if max_file_bytes is None and self.max_total_bytes is None:
+            return file_changes
+        patches = _patch_lines("\n".join(file_changes.values()))
+        return dict(iter_file_patches(patches, max_file_bytes, self.max_total_bytes))
+    
+    def _get_toplevel(self) -> Optional[str]:
+        if self._toplevel is None:
+            self._toplevel = self._run_git_command(["rev-parse", "--show-toplevel"])
+        return self._toplevel
+    
+    # How long one status snapshot answers queries while the index is unchanged;
+    # long enough for the untracked and diff queries of a single gitme run
+    STATUS_MAX_AGE = 1.0
+    
+    def invalidate_status(self) -> None:
+        """Take a new status snapshot on the next query, e.g. after the
+        worktree changed"""
+        self._status = None
+    
+    def status(self) -> Optional[StatusSnapshot]:
+        """Staged, unstaged and untracked paths from one `git status` walk,
+        or None if git could not produce them"""
+        if self._repo_paths is None:
+            return None
+        index = os.path.join(self._repo_paths[0], "index")
+        if self._status is not None:
+            snapshot, index_stat, taken = self._status
+            if time.monotonic() - taken < self.STATUS_MAX_AGE and _stat_key(index) == index_stat:
+                return snapshot
+        # No optional locks: the index is not refreshed, so this never
+        # competes with the user's own git commands for index.lock
+        output = self._run_git_command(["--no-optional-locks"] + StatusSnapshot.COMMAND)
+        if output is None:
+            return None
+        snapshot = StatusSnapshot.parse(output)
+        self._status = (snapshot, _stat_key(index), time.monotonic())
+        return snapshot
+    
+    def _hash_worktree_files(self, paths: List[str]) -> Optional[List[str]]:
+        """Blob ids of worktree files, given repository-relative paths"""
+        toplevel = self._get_toplevel()
+        if not toplevel:
+            return None
+        output = self._run_git_command(["-C", toplevel, "hash-object", "--stdin-paths"],
+                                       input="\n".join(paths) + "\n")
+        if output is None:
+            return None
+        oids = output.split("\n")
+        return oids if len(oids) == len(paths) else None
+    
+    def _get_file_changes_cached(self, staged_only: bool = True,
+                                 snapshot: Optional[StatusSnapshot] = None) -> Optional[Dict[str, str]]:
+        """Serve per-file diffs from the diff cache, diffing only the files
+        whose (old blob, new blob) pair has not been seen before"""
+        changes = snapshot.raw_changes(staged_only) if snapshot is not None else None
+        if changes is None:
+            target = "--staged" if staged_only else "HEAD"
+            raw = self._run_git_command(["diff", "--raw", "-z", "--no-abbrev", "-M", target])
+            if raw is None:
+                return None
+            changes = parse_raw_diff(raw)
+        if not changes:
+            return {}
+        
+        # `git diff HEAD` does not hash modified worktree files, so their
+        # new blob id shows up as all zeros.
+        unhashed = [change for change in changes
+                    if change.new_oid == NULL_OID and change.new_mode not in ("000000", "120000", "160000")
+                    and "\n" not in change.new_path]
+        if unhashed:
+            oids = self._hash_worktree_files([change.new_path for change in unhashed])
+            if oids is None:
+                return None
+            for change, oid in zip(unhashed, oids):
+                change.new_oid = oid
+        
+        options = f"M;max_file_bytes={self.max_file_bytes}"
+        file_changes: Dict[str, Optional[str]] = {}
+        keys: Dict[str, str] = {}
+        missed: List[RawChange] = []
+        for change in changes:
+            cacheable = change.new_oid != NULL_OID or change.new_mode == "000000"
+            if cacheable:
+                key = self.diff_cache.key(change.old_oid, change.new_oid, change.old_mode, change.new_mode,
+                                          change.old_path, change.new_path, options)
+                keys[change.new_path] = key
+                patch = self.diff_cache.get(key)
+                if patch is not None:
+                    file_changes[change.new_path] = patch
+                    continue
+            file_changes[change.new_path] = None
+            missed.append(change)
+        
+        if missed:
+            paths = None
+            if len(missed) < len(changes):
+                paths = []
+                for change in missed:
+                    paths.extend({change.old_path, change.new_path})
+            fresh = self._get_file_changes_single_pass(staged_only, paths)
+            last = next(reversed(fresh), None) if fresh else None
+            for filename, patch in fresh.items():
+                if filename in file_changes:
+                    file_changes[filename] = patch
+                # The last patch may have been cut short by the total budget,
+                # which depends on everything else in this run.
+                cut_by_total = (filename == last and self.max_total_bytes is not None
+                                and patch.endswith(TRUNCATED_MARKER))
+                if filename in keys and not cut_by_total:
+                    self.diff_cache.put(keys[filename], patch)
+        self.diff_cache.flush()
+        
+        collected = {name: patch for name, patch in file_changes.items() if patch}
+        return self._apply_budgets(collected, None)
+    
+    def _get_file_changes_single_pass(self, staged_only: bool = True,
+                                      paths: Optional[List[str]] = None) -> Dict[str, str]:
+        """Collect every per-file diff from one `git diff` process"""
+        diff_args = ["-c", "core.quotePath=false", "diff"]
+        if staged_only:
+            diff_args.append("--staged")
+        else:
+            diff_args.append("HEAD")
+        if paths:
+            # Paths are relative to the repository root, whatever the cwd
+            diff_args.append("--")
+            diff_args.extend(f":(top,literal){path}" for path in paths)
+        
+        file_changes = {}
+        stream = self._stream_git_command(diff_args)
+        try:
+            for filename, patch in iter_file_patches(stream, self.max_file_bytes, self.max_total_bytes):
+                if patch:
+                    file_changes[filename] = patch
+        finally:
+            # Stops git if the budget ran out before the diff did
+            close = getattr(stream, "close", None)
+            if close:
+                close()
+        return file_changes
+    
+    def iter_commit_changes(self, commits: List[Tuple[str, Optional[str]]]) -> Iterator[Tuple[str, Dict[str, str]]]:
+        """(commit, per-file diffs) for many (commit, parent) pairs, from one
+        diff-tree process and within the analyzer's budgets per commit"""
+        for commit, patch in self.backend.diff_commits(commits):
+            yield commit, dict(iter_file_patches(_patch_lines(patch), self.max_file_bytes, self.max_total_bytes))
+    
     def get_untracked_files(self) -> List[str]:
         """Get list of untracked files in the repository"""
-        output = self._run_git_command(["ls-files", "--others", "--exclude-standard"])
+        if self.repository is not None:
+            from .git_objects import GitObjectError
+            try:
+                return self.repository.untracked_files(self.cwd)
+            except (GitObjectError, OSError):
+                pass
+        
+        snapshot = self.status() if self.use_status else None
+        if snapshot is not None:
+            # Like ls-files: only paths under the cwd, relative to it
+            prefix = self._repo_paths[2]
+            return [path[len(prefix):] for path in snapshot.untracked if path.startswith(prefix)]
+        
+        output = self._run_git_command(["ls-files", "-z", "--others", "--exclude-standard"])
         if not output:
             return []
-        return [line.strip() for line in output.split('\n') if line.strip()]
+        return [path for path in output.split('\0') if path]
+    
+    def get_file_changes_with_untracked(self, untracked_files: List[str],
+                                        staged_only: bool = True) -> Dict[str, str]:
+        """File changes as get_file_changes would return them after
+        `git add untracked_files`, without touching the real index
+
+        The files are added to a scratch copy of the index, which the diff
+        then reads through GIT_INDEX_FILE. Safe to call from another
+        thread: it runs its own git processes rather than the backend's.
+        """
+        git_dir = self._run_git_command(["rev-parse", "--absolute-git-dir"])
+        if not git_dir:
+            return {}
+        import subprocess
+        import tempfile
+        in_cwd = {"cwd": self.cwd} if self.cwd else {}
+        with tempfile.TemporaryDirectory(prefix="gitme-index-") as scratch:
+            env = dict(os.environ, GIT_INDEX_FILE=os.path.join(scratch, "index"))
+            index = os.path.join(git_dir, "index")
+            if os.path.exists(index):
+                shutil.copyfile(index, env["GIT_INDEX_FILE"])
+            added = subprocess.run(["git", "add", "--"] + untracked_files, env=env,
+                                   capture_output=True, **in_cwd)
+            if added.returncode != 0:
+                return {}
+            diff_args = ["git", "-c", "core.quotePath=false", "diff", "--staged" if staged_only else "HEAD"]
+            process = subprocess.Popen(diff_args, env=env, stdout=subprocess.PIPE,
+                                       stderr=subprocess.DEVNULL, text=True, **in_cwd)
+            file_changes = {}
+            try:
+                for filename, patch in iter_file_patches(process.stdout, self.max_file_bytes,
+                                                         self.max_total_bytes):
+                    if patch:
+                        file_changes[filename] = patch
+            finally:
+                process.kill()
+                process.stdout.close()
+                process.wait()
+        return file_changes
     
     def format_changes_json(self, staged_only: bool = True) -> str:
         changes = self.get_file_changes(staged_only)
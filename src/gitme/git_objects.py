@@ -0,0 +1,1103 @@
+"""Read git repositories directly from disk, without running git.
+
+Only the parts gitme needs are implemented: the index, loose and packed
+objects, refs, and enough of the ignore rules to list untracked files.
+Anything outside that (unusual config, attributes, submodules, sparse or
+split indexes, inexact renames, non-UTF-8 paths, edits whose hunks git
+might align differently) raises UnsupportedRepository, and malformed data
+raises GitObjectError, so callers can fall back to running git.
+"""
+import difflib
+import functools
+import hashlib
+import mmap
+import os
+import posixpath
+import re
+import stat
+import struct
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+
+class GitObjectError(Exception):
+    pass
+
+
+class UnsupportedRepository(GitObjectError):
+    pass
+
+
+def _reports_corruption(method):
+    """Turn the errors malformed objects, refs or indexes cause while
+    parsing into GitObjectError"""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        try:
+            return method(*args, **kwargs)
+        except (ValueError, IndexError, struct.error) as e:
+            raise GitObjectError(f"corrupt repository data: {e}")
+    return wrapper
+
+
+NULL_OID = "0" * 40
+EMPTY_BLOB_OID = "e69de29bb2d1d6434b8b29ae775ad8c2e48c5391"
+
+MODE_TREE = 0o040000
+MODE_SYMLINK = 0o120000
+MODE_GITLINK = 0o160000
+
+_TYPE_NAMES = {1: "commit", 2: "tree", 3: "blob", 4: "tag"}
+_OFS_DELTA = 6
+_REF_DELTA = 7
+
+# Environment variables that relocate parts of the repository; honouring
+# them is left to git itself.
+_RELOCATING_ENV = ("GIT_DIR", "GIT_WORK_TREE", "GIT_INDEX_FILE", "GIT_OBJECT_DIRECTORY",
+                   "GIT_ALTERNATE_OBJECT_DIRECTORIES", "GIT_COMMON_DIR")
+
+# Config keys that change what `git diff` prints or how worktree files are
+# read. Their defaults are what the renderer below reproduces.
+_UNSUPPORTED_CONFIG = {
+    "core.autocrlf": ("false",),
+    "core.eol": (),
+    "core.ignorecase": ("false",),
+    "core.symlinks": ("true",),
+    "core.abbrev": (),
+    "core.attributesfile": (),
+    "core.precomposeunicode": ("false",),
+    "diff.noprefix": ("false",),
+    "diff.mnemonicprefix": ("false",),
+    "diff.renames": ("true",),
+    "diff.algorithm": (),
+    "diff.context": ("3",),
+    "diff.interhunkcontext": ("0",),
+    "diff.relative": ("false",),
+    "diff.external": (),
+    "diff.orderfile": (),
+    "diff.suppressblankempty": ("false",),
+    "extensions.objectformat": ("sha1",),
+    "extensions.refstorage": ("files",),
+    "index.sparse": ("false",),
+}
+
+
+def _read_config_file(path: str, config: Dict[str, str]) -> None:
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            lines = f.readlines()
+    except OSError:
+        return
+    section = ""
+    for raw in lines:
+        line = raw.strip()
+        if not line or line[0] in "#;":
+            continue
+        if line.startswith("["):
+            header = line[1:line.index("]")] if "]" in line else line[1:]
+            name, _, subsection = header.partition(" ")
+            section = name.lower()
+            if section in ("include", "includeif"):
+                raise UnsupportedRepository("config includes are not supported")
+            if subsection:
+                section = f"{section}.{subsection.strip().strip(chr(34))}"
+            continue
+        key, sep, value = line.partition("=")
+        value = value.split(" #")[0].split(" ;")[0].strip().strip('"') if sep else "true"
+        config[f"{section}.{key.strip().lower()}"] = value
+
+
+def _home_path(*parts: str) -> str:
+    return os.path.join(os.path.expanduser("~"), *parts)
+
+
+def _xdg_config_path(*parts: str) -> str:
+    base = os.environ.get("XDG_CONFIG_HOME") or _home_path(".config")
+    return os.path.join(base, "git", *parts)
+
+
+def _load_config(common_dir: str) -> Dict[str, str]:
+    config: Dict[str, str] = {}
+    if not os.environ.get("GIT_CONFIG_NOSYSTEM"):
+        _read_config_file("/etc/gitconfig", config)
+    _read_config_file(_xdg_config_path("config"), config)
+    _read_config_file(_home_path(".gitconfig"), config)
+    _read_config_file(os.path.join(common_dir, "config"), config)
+    for key, allowed in _UNSUPPORTED_CONFIG.items():
+        if key in config and config[key].lower() not in allowed:
+            raise UnsupportedRepository(f"{key}={config[key]} is not supported")
+    return config
+
+
+def find_repository(start: Optional[str] = None) -> Optional[Tuple[str, str, str]]:
+    """Locate (worktree, git_dir, common_dir) for the directory `start`"""
+    path = os.path.abspath(start or os.getcwd())
+    ceilings = [os.path.abspath(p) for p in os.environ.get("GIT_CEILING_DIRECTORIES", "").split(os.pathsep) if p]
+    while True:
+        dot_git = os.path.join(path, ".git")
+        if os.path.isdir(dot_git):
+            git_dir = dot_git
+            break
+        if os.path.isfile(dot_git):
+            with open(dot_git, "r") as f:
+                content = f.read().strip()
+            if not content.startswith("gitdir:"):
+                return None
+            git_dir = os.path.normpath(os.path.join(path, content[len("gitdir:"):].strip()))
+            break
+        parent = os.path.dirname(path)
+        if parent == path or parent in ceilings:
+            return None
+        path = parent
+
+    common_dir = git_dir
+    commondir_file = os.path.join(git_dir, "commondir")
+    if os.path.isfile(commondir_file):
+        with open(commondir_file, "r") as f:
+            common_dir = os.path.normpath(os.path.join(git_dir, f.read().strip()))
+    return path, git_dir, common_dir
+
+
+class PackFile:
+    """A packfile plus its version 2 .idx, both memory-mapped"""
+
+    def __init__(self, idx_path: str):
+        self.idx_path = idx_path
+        self.pack_path = idx_path[:-len(".idx")] + ".pack"
+        with open(idx_path, "rb") as f:
+            self._idx = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._idx[:4] != b"\377tOc" or struct.unpack_from(">I", self._idx, 4)[0] != 2:
+            raise UnsupportedRepository(f"unsupported pack index format: {idx_path}")
+        self._fanout = struct.unpack_from(">256I", self._idx, 8)
+        self.count = self._fanout[255]
+        self._oid_base = 8 + 256 * 4
+        self._offset_base = self._oid_base + 24 * self.count
+        self._large_offset_base = self._offset_base + 4 * self.count
+        self._pack: Optional[mmap.mmap] = None
+
+    def _oid_at(self, position: int) -> bytes:
+        start = self._oid_base + 20 * position
+        return self._idx[start:start + 20]
+
+    def _search(self, prefix: bytes) -> int:
+        """Position of the first object id >= prefix"""
+        first = prefix[0]
+        lo = self._fanout[first - 1] if first else 0
+        hi = self._fanout[first]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._oid_at(mid) < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find(self, oid: bytes) -> Optional[int]:
+        position = self._search(oid)
+        if position < self.count and self._oid_at(position) == oid:
+            offset = struct.unpack_from(">I", self._idx, self._offset_base + 4 * position)[0]
+            if offset & 0x80000000:
+                index = offset & 0x7fffffff
+                offset = struct.unpack_from(">Q", self._idx, self._large_offset_base + 8 * index)[0]
+            return offset
+        return None
+
+    def matches(self, hex_prefix: str) -> List[str]:
+        """Object ids in this pack starting with an even-length hex prefix"""
+        prefix = bytes.fromhex(hex_prefix)
+        position = self._search(prefix)
+        found = []
+        while position < self.count:
+            oid = self._oid_at(position)
+            if not oid.startswith(prefix):
+                break
+            found.append(oid.hex())
+            position += 1
+        return found
+
+    def _pack_map(self) -> mmap.mmap:
+        if self._pack is None:
+            with open(self.pack_path, "rb") as f:
+                self._pack = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._pack
+
+    def _entry_header(self, offset: int) -> Tuple[int, int, int]:
+        """(type, size, data position) of the pack entry at offset"""
+        data = self._pack_map()
+        byte = data[offset]
+        kind = (byte >> 4) & 7
+        size = byte & 0x0f
+        shift = 4
+        pos = offset + 1
+        while byte & 0x80:
+            byte = data[pos]
+            size |= (byte & 0x7f) << shift
+            shift += 7
+            pos += 1
+        return kind, size, pos
+
+    def size_at(self, offset: int) -> int:
+        """Size of the object at offset, without inflating all of it"""
+        kind, size, pos = self._entry_header(offset)
+        if kind not in (_OFS_DELTA, _REF_DELTA):
+            return size
+        data = self._pack_map()
+        if kind == _OFS_DELTA:
+            while data[pos] & 0x80:
+                pos += 1
+            pos += 1
+        else:
+            pos += 20
+        # The delta starts with the base size and then the result size.
+        head = zlib.decompressobj().decompress(memoryview(data)[pos:pos + 64 + size], 20)
+        _, cursor = _read_varint(head, 0)
+        return _read_varint(head, cursor)[0]
+
+    def read_at(self, offset: int, store: "ObjectStore") -> Tuple[str, bytes]:
+        data = self._pack_map()
+        kind, size, pos = self._entry_header(offset)
+
+        if kind == _OFS_DELTA:
+            byte = data[pos]
+            pos += 1
+            distance = byte & 0x7f
+            while byte & 0x80:
+                byte = data[pos]
+                pos += 1
+                distance = ((distance + 1) << 7) | (byte & 0x7f)
+            base_type, base = self.read_at(offset - distance, store)
+            return base_type, _apply_delta(base, _inflate(data, pos, size))
+        if kind == _REF_DELTA:
+            base_oid = data[pos:pos + 20].hex()
+            base_type, base = store.read(base_oid)
+            return base_type, _apply_delta(base, _inflate(data, pos + 20, size))
+        if kind not in _TYPE_NAMES:
+            raise GitObjectError(f"bad object type {kind} in {self.pack_path}")
+        return _TYPE_NAMES[kind], _inflate(data, pos, size)
+
+
+def _inflate(data: mmap.mmap, pos: int, size: int) -> bytes:
+    try:
+        result = zlib.decompressobj().decompress(memoryview(data)[pos:], size)
+    except zlib.error as e:
+        raise GitObjectError(f"corrupt pack data: {e}")
+    if len(result) != size:
+        raise GitObjectError("truncated pack data")
+    return result
+
+
+def _read_varint(delta: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = delta[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, pos
+
+
+def _apply_delta(base: bytes, delta: bytes) -> bytes:
+    source_size, pos = _read_varint(delta, 0)
+    target_size, pos = _read_varint(delta, pos)
+    if source_size != len(base):
+        raise GitObjectError("delta base size mismatch")
+    out = bytearray()
+    while pos < len(delta):
+        op = delta[pos]
+        pos += 1
+        if op & 0x80:
+            offset = size = 0
+            for i in range(4):
+                if op & (1 << i):
+                    offset |= delta[pos] << (8 * i)
+                    pos += 1
+            for i in range(3):
+                if op & (1 << (4 + i)):
+                    size |= delta[pos] << (8 * i)
+                    pos += 1
+            out += base[offset:offset + (size or 0x10000)]
+        elif op:
+            out += delta[pos:pos + op]
+            pos += op
+        else:
+            raise GitObjectError("invalid delta opcode")
+    if len(out) != target_size:
+        raise GitObjectError("delta result size mismatch")
+    return bytes(out)
+
+
+class ObjectStore:
+    """Loose and packed objects of one repository, including alternates"""
+
+    def __init__(self, objects_dir: str):
+        self.object_dirs = [objects_dir]
+        alternates = os.path.join(objects_dir, "info", "alternates")
+        if os.path.isfile(alternates):
+            with open(alternates, "r") as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        self.object_dirs.append(os.path.normpath(os.path.join(objects_dir, line)))
+        self._packs: Optional[List[PackFile]] = None
+
+    @property
+    def packs(self) -> List[PackFile]:
+        if self._packs is None:
+            packs = []
+            for objects_dir in self.object_dirs:
+                pack_dir = os.path.join(objects_dir, "pack")
+                if not os.path.isdir(pack_dir):
+                    continue
+                for name in sorted(os.listdir(pack_dir)):
+                    if name.endswith(".idx"):
+                        packs.append(PackFile(os.path.join(pack_dir, name)))
+            self._packs = packs
+        return self._packs
+
+    def refresh(self):
+        self._packs = None
+
+    def read(self, oid: str) -> Tuple[str, bytes]:
+        for objects_dir in self.object_dirs:
+            path = os.path.join(objects_dir, oid[:2], oid[2:])
+            try:
+                with open(path, "rb") as f:
+                    raw = zlib.decompress(f.read())
+            except FileNotFoundError:
+                continue
+            except zlib.error as e:
+                raise GitObjectError(f"corrupt loose object {oid}: {e}")
+            header, _, body = raw.partition(b"\0")
+            return header.split(b" ", 1)[0].decode(), body
+
+        binary = bytes.fromhex(oid)
+        for attempt in range(2):
+            for pack in self.packs:
+                offset = pack.find(binary)
+                if offset is not None:
+                    return pack.read_at(offset, self)
+            # A repack may have happened since the pack list was read.
+            self.refresh()
+        raise GitObjectError(f"object not found: {oid}")
+
+    def size(self, oid: str) -> int:
+        for objects_dir in self.object_dirs:
+            path = os.path.join(objects_dir, oid[:2], oid[2:])
+            try:
+                with open(path, "rb") as f:
+                    head = zlib.decompressobj().decompress(f.read(256), 64)
+            except FileNotFoundError:
+                continue
+            except zlib.error as e:
+                raise GitObjectError(f"corrupt loose object {oid}: {e}")
+            return int(head.split(b"\0", 1)[0].split(b" ")[1])
+        binary = bytes.fromhex(oid)
+        for pack in self.packs:
+            offset = pack.find(binary)
+            if offset is not None:
+                return pack.size_at(offset)
+        raise GitObjectError(f"object not found: {oid}")
+
+    def approximate_count(self) -> int:
+        return sum(pack.count for pack in self.packs)
+
+    def is_ambiguous(self, oid: str, length: int) -> bool:
+        prefix = oid[:length]
+        found = set()
+        for objects_dir in self.object_dirs:
+            loose_dir = os.path.join(objects_dir, prefix[:2])
+            if os.path.isdir(loose_dir):
+                found.update(prefix[:2] + name for name in os.listdir(loose_dir)
+                             if name.startswith(prefix[2:]))
+        even = prefix[:len(prefix) - len(prefix) % 2]
+        for pack in self.packs:
+            found.update(match for match in pack.matches(even) if match.startswith(prefix))
+        found.discard(oid)
+        return bool(found)
+
+
+class IndexEntry:
+    __slots__ = ("path", "mode", "oid", "mtime", "size", "ino")
+
+    def __init__(self, path: str, mode: int, oid: str, mtime: Tuple[int, int], size: int, ino: int):
+        self.path = path
+        self.mode = mode
+        self.oid = oid
+        self.mtime = mtime
+        self.size = size
+        self.ino = ino
+
+
+_index_cache: Dict[str, Tuple[Tuple[int, int], Dict[str, IndexEntry]]] = {}
+
+
+def read_index(path: str) -> Dict[str, IndexEntry]:
+    """Parse a version 2-4 index file, reusing the last parse if unchanged"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return {}
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _index_cache.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+
+    with open(path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        entries = _parse_index(data)
+    except (struct.error, IndexError, ValueError) as e:
+        raise GitObjectError(f"corrupt index: {e}")
+    finally:
+        data.close()
+    _index_cache[path] = (key, entries)
+    return entries
+
+
+def _parse_index(data: mmap.mmap) -> Dict[str, IndexEntry]:
+    signature, version, count = struct.unpack_from(">4sII", data, 0)
+    if signature != b"DIRC" or version not in (2, 3, 4):
+        raise UnsupportedRepository("unsupported index format")
+    entries: Dict[str, IndexEntry] = {}
+    pos = 12
+    previous = b""
+    for _ in range(count):
+        start = pos
+        (_ctime_s, _ctime_ns, mtime_s, mtime_ns, _dev, ino, mode, _uid, _gid,
+         size) = struct.unpack_from(">10I", data, pos)
+        oid = data[pos + 40:pos + 60].hex()
+        flags = struct.unpack_from(">H", data, pos + 60)[0]
+        pos += 62
+        if flags & 0x4000:
+            extended = struct.unpack_from(">H", data, pos)[0]
+            pos += 2
+            if extended & 0x6000:
+                raise UnsupportedRepository("skip-worktree or intent-to-add entries")
+        if version == 4:
+            strip, pos = _read_varint(data, pos)
+            end = data.find(b"\0", pos)
+            name = previous[:len(previous) - strip] + data[pos:end]
+            pos = end + 1
+        else:
+            end = data.find(b"\0", pos)
+            name = data[pos:end]
+            pos = start + ((end - start) // 8 + 1) * 8
+        previous = name
+        if (flags >> 12) & 3:
+            raise UnsupportedRepository("index has unmerged entries")
+        try:
+            path = name.decode("utf-8")
+        except UnicodeDecodeError:
+            raise UnsupportedRepository("index has a non-UTF-8 path")
+        entries[path] = IndexEntry(path, mode, oid, (mtime_s, mtime_ns), size, ino)
+
+    while pos + 8 <= len(data) - 20:
+        signature, length = struct.unpack_from(">4sI", data, pos)
+        if signature in (b"link", b"sdir"):
+            raise UnsupportedRepository("split or sparse index")
+        pos += 8 + length
+    return entries
+
+
+def _git_hash(kind: str, content: bytes) -> str:
+    return hashlib.sha1(f"{kind} {len(content)}\0".encode() + content).hexdigest()
+
+
+class IgnoreRules:
+    """The subset of gitignore semantics used by `git ls-files --exclude-standard`"""
+
+    def __init__(self):
+        # (base directory, [(regex, negated, dir_only)]) from lowest to
+        # highest precedence
+        self._sources: List[Tuple[str, List[Tuple["re.Pattern", bool, bool]]]] = []
+
+    @staticmethod
+    def _translate(pattern: str) -> str:
+        out = []
+        i = 0
+        while i < len(pattern):
+            ch = pattern[i]
+            if ch == "*":
+                if pattern[i:i + 2] == "**" and (i == 0 or pattern[i - 1] == "/"):
+                    rest = pattern[i + 2:]
+                    if rest.startswith("/"):
+                        out.append("(?:.*/)?")
+                        i += 3
+                        continue
+                    if not rest:
+                        out.append(".*")
+                        i += 2
+                        continue
+                out.append("[^/]*")
+                while i < len(pattern) and pattern[i] == "*":
+                    i += 1
+                continue
+            if ch == "?":
+                out.append("[^/]")
+            elif ch == "[":
+                end = pattern.find("]", i + 2)
+                if end == -1:
+                    out.append(re.escape(ch))
+                else:
+                    body = pattern[i + 1:end]
+                    if body.startswith("!"):
+                        body = "^" + body[1:]
+                    out.append("[" + body.replace("\\", "\\\\") + "]")
+                    i = end
+            elif ch == "\\" and i + 1 < len(pattern):
+                i += 1
+                out.append(re.escape(pattern[i]))
+            else:
+                out.append(re.escape(ch))
+            i += 1
+        return "".join(out)
+
+    def add_file(self, path: str, base: str = "") -> None:
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                lines = f.read().splitlines()
+        except (FileNotFoundError, NotADirectoryError, IsADirectoryError, PermissionError):
+            return
+        rules = []
+        for line in lines:
+            if not line or line.startswith("#"):
+                continue
+            while line.endswith(" ") and not line.endswith("\\ "):
+                line = line[:-1]
+            negated = line.startswith("!")
+            if negated:
+                line = line[1:]
+            elif line.startswith("\\!") or line.startswith("\\#"):
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            if "/" in line:
+                regex = self._translate(line.lstrip("/"))
+            else:
+                regex = "(?:.*/)?" + self._translate(line)
+            rules.append((re.compile(regex + r"\Z", re.DOTALL), negated, dir_only))
+        if rules:
+            self._sources.append((base, rules))
+
+    def copy(self) -> "IgnoreRules":
+        rules = IgnoreRules()
+        rules._sources = list(self._sources)
+        return rules
+
+    def pop(self, base: str) -> None:
+        if self._sources and self._sources[-1][0] == base:
+            self._sources.pop()
+
+    def is_ignored(self, path: str, is_dir: bool) -> bool:
+        for base, rules in reversed(self._sources):
+            if base:
+                if not path.startswith(base + "/"):
+                    continue
+                relative = path[len(base) + 1:]
+            else:
+                relative = path
+            for regex, negated, dir_only in reversed(rules):
+                if dir_only and not is_dir:
+                    continue
+                if regex.match(relative):
+                    return not negated
+        return False
+
+
+def load_ignore_rules(repository: "Repository") -> IgnoreRules:
+    """Global excludes and info/exclude; .gitignore files are added per directory"""
+    rules = IgnoreRules()
+    excludes_file = repository.config.get("core.excludesfile")
+    rules.add_file(os.path.expanduser(excludes_file) if excludes_file else _xdg_config_path("ignore"))
+    rules.add_file(os.path.join(repository.common_dir, "info", "exclude"))
+    return rules
+
+
+class IgnoreMatcher:
+    """is_ignored for any worktree path, deciding the way untracked_files
+    does while it walks: global and info/exclude rules, then each .gitignore
+    from the top down to the path's directory, and nothing inside an
+    ignored directory counts. Rules are loaded once per directory."""
+
+    def __init__(self, repository: "Repository"):
+        self.repository = repository
+        self._rules: Dict[str, IgnoreRules] = {}
+
+    def invalidate(self) -> None:
+        """Forget loaded rules, e.g. after a .gitignore changed"""
+        self._rules.clear()
+
+    def _rules_for(self, directory: str) -> IgnoreRules:
+        rules = self._rules.get(directory)
+        if rules is None:
+            if directory:
+                rules = self._rules_for(posixpath.dirname(directory)).copy()
+            else:
+                rules = load_ignore_rules(self.repository)
+            rules.add_file(os.path.join(self.repository.worktree, directory, ".gitignore"), directory)
+            self._rules[directory] = rules
+        return rules
+
+    def is_ignored(self, path: str, is_dir: bool = False) -> bool:
+        parts = path.split("/")
+        if parts[0] == ".git":
+            return True
+        for depth in range(1, len(parts)):
+            directory = "/".join(parts[:depth])
+            if self._rules_for(posixpath.dirname(directory)).is_ignored(directory, True):
+                return True
+        return self._rules_for(posixpath.dirname(path)).is_ignored(path, is_dir)
+
+
+class Repository:
+    """Read-only, in-process view of a non-bare repository"""
+
+    def __init__(self, worktree: str, git_dir: str, common_dir: str):
+        self.worktree = worktree
+        self.git_dir = git_dir
+        self.common_dir = common_dir
+        self.config = _load_config(common_dir)
+        if self.config.get("core.bare", "false").lower() == "true":
+            raise UnsupportedRepository("bare repository")
+        self.objects = ObjectStore(os.path.join(common_dir, "objects"))
+
+    @classmethod
+    def open(cls, start: Optional[str] = None) -> "Repository":
+        for name in _RELOCATING_ENV:
+            if os.environ.get(name):
+                raise UnsupportedRepository(f"{name} is set")
+        location = find_repository(start)
+        if location is None:
+            raise GitObjectError("not a git repository")
+        return cls(*location)
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.git_dir, "index")
+
+    def index(self) -> Dict[str, IndexEntry]:
+        return read_index(self.index_path)
+
+    def _read_ref(self, name: str) -> Optional[str]:
+        for _ in range(10):
+            if not name.startswith("refs/"):
+                path = os.path.join(self.git_dir, name)
+            else:
+                path = os.path.join(self.common_dir, name)
+            try:
+                with open(path, "r") as f:
+                    value = f.read().strip()
+            except (FileNotFoundError, NotADirectoryError):
+                return self._packed_ref(name)
+            if value.startswith("ref:"):
+                name = value[4:].strip()
+                continue
+            return value
+        raise GitObjectError("symbolic ref loop")
+
+    def _packed_ref(self, name: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self.common_dir, "packed-refs"), "r") as f:
+                for line in f:
+                    if line[:1] in "#^":
+                        continue
+                    oid, _, ref = line.strip().partition(" ")
+                    if ref == name:
+                        return oid
+        except FileNotFoundError:
+            pass
+        return None
+
+    def head_commit(self) -> Optional[str]:
+        return self._read_ref("HEAD")
+
+    def read_tree(self, tree_oid: str, prefix: str = "") -> Dict[str, Tuple[int, str]]:
+        """Flatten a tree into {path: (mode, blob id)}"""
+        kind, data = self.objects.read(tree_oid)
+        if kind != "tree":
+            raise GitObjectError(f"{tree_oid} is not a tree")
+        entries: Dict[str, Tuple[int, str]] = {}
+        pos = 0
+        while pos < len(data):
+            try:
+                space = data.index(b" ", pos)
+                nul = data.index(b"\0", space)
+                mode = int(data[pos:space], 8)
+            except ValueError:
+                raise GitObjectError(f"corrupt tree {tree_oid}")
+            try:
+                name = data[space + 1:nul].decode("utf-8")
+            except UnicodeDecodeError:
+                raise UnsupportedRepository(f"tree {tree_oid} has a non-UTF-8 path")
+            oid = data[nul + 1:nul + 21].hex()
+            if len(oid) != 40:
+                raise GitObjectError(f"corrupt tree {tree_oid}")
+            pos = nul + 21
+            path = prefix + name
+            if mode == MODE_TREE:
+                entries.update(self.read_tree(oid, path + "/"))
+            else:
+                entries[path] = (mode, oid)
+        return entries
+
+    def head_tree(self) -> Optional[Dict[str, Tuple[int, str]]]:
+        commit = self.head_commit()
+        if commit is None:
+            return None
+        kind, data = self.objects.read(commit)
+        if kind != "commit" or not data.startswith(b"tree "):
+            raise GitObjectError("HEAD does not point at a commit")
+        return self.read_tree(data[5:45].decode())
+
+    def _worktree_state(self, entry: IndexEntry, index_mtime: Tuple[int, int]):
+        """(mode, oid, content) of a tracked worktree file, or None if it is gone.
+
+        Content is None when the stat data shows the file still matches the
+        index, in which case it is read from the object store on demand.
+        """
+        path = os.path.join(self.worktree, entry.path)
+        try:
+            st = os.lstat(path)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        if stat.S_ISLNK(st.st_mode):
+            mode = MODE_SYMLINK
+        elif stat.S_ISREG(st.st_mode):
+            if self.config.get("core.filemode", "true").lower() == "false":
+                mode = entry.mode
+            else:
+                mode = 0o100755 if st.st_mode & 0o100 else 0o100644
+        else:
+            return None
+
+        mtime = divmod(st.st_mtime_ns, 1000000000)
+        racy = mtime >= index_mtime
+        if (mode == entry.mode and not racy and mtime == entry.mtime
+                and st.st_size == entry.size and st.st_ino & 0xffffffff == entry.ino):
+            return mode, entry.oid, None
+        if mode == MODE_SYMLINK:
+            content = os.fsencode(os.readlink(path))
+        else:
+            with open(path, "rb") as f:
+                content = f.read()
+        return mode, _git_hash("blob", content), content
+
+    @_reports_corruption
+    def file_changes(self, staged_only: bool = True, max_blob_bytes: Optional[int] = None) -> Dict[str, str]:
+        """Same result as GitDiffAnalyzer.get_file_changes(single_pass=True)
+
+        Blobs are diffed in memory, so changes involving a blob larger than
+        max_blob_bytes raise UnsupportedRepository; git's streamed output
+        can be truncated instead. So do edits git might align differently
+        (see _unified_hunks).
+        """
+        if os.path.exists(os.path.join(self.worktree, ".gitattributes")) or \
+                os.path.exists(os.path.join(self.common_dir, "info", "attributes")):
+            raise UnsupportedRepository("gitattributes may change diff output")
+
+        head = self.head_tree()
+        if head is None:
+            if not staged_only:
+                # `git diff HEAD` fails on an unborn branch; let git report it.
+                raise UnsupportedRepository("HEAD does not exist yet")
+            head = {}
+        index = self.index()
+
+        new_side: Dict[str, Tuple[int, str, Optional[bytes]]] = {}
+        if staged_only:
+            for path, entry in index.items():
+                new_side[path] = (entry.mode, entry.oid, None)
+        else:
+            index_stat = os.stat(self.index_path) if index else None
+            index_mtime = divmod(index_stat.st_mtime_ns, 1000000000) if index_stat else (0, 0)
+            for path, entry in index.items():
+                if entry.mode == MODE_GITLINK:
+                    raise UnsupportedRepository("submodules are not supported")
+                state = self._worktree_state(entry, index_mtime)
+                if state is not None:
+                    new_side[path] = state
+
+        changed: Dict[str, Tuple[Optional[Tuple[int, str]], Optional[Tuple[int, str, Optional[bytes]]]]] = {}
+        for path in set(head) | set(new_side):
+            old = head.get(path)
+            new = new_side.get(path)
+            if old and new and old[0] == new[0] and old[1] == new[1]:
+                continue
+            if (old and old[0] == MODE_GITLINK) or (new and new[0] == MODE_GITLINK):
+                raise UnsupportedRepository("submodules are not supported")
+            if old and new and old[0] & 0o170000 != new[0] & 0o170000:
+                # git prints a type change as two patches for the same path
+                raise UnsupportedRepository("file type changes are not supported")
+            changed[path] = (old, new)
+
+        renames = self._exact_renames(changed)
+        if max_blob_bytes is not None:
+            for old, new in changed.values():
+                sizes = []
+                if old:
+                    sizes.append(self.objects.size(old[1]))
+                if new:
+                    sizes.append(len(new[2]) if new[2] is not None else self.objects.size(new[1]))
+                if any(size > max_blob_bytes for size in sizes):
+                    raise UnsupportedRepository("blob too large to diff in memory")
+
+        self._abbrev_length = max(7, (self.objects.approximate_count().bit_length() + 1) // 2)
+        file_changes = {}
+        for path in sorted(changed, key=lambda p: p.encode("utf-8")):
+            if path in renames.values():
+                continue
+            old, new = changed[path]
+            if path in renames:
+                patch = self._render_rename(renames[path], path)
+            else:
+                patch = self._render_patch(path, old, new)
+            file_changes[path] = patch.replace("\r\n", "\n").replace("\r", "\n").strip()
+        return file_changes
+
+    def _exact_renames(self, changed) -> Dict[str, str]:
+        """Map new path -> old path for additions that exactly match a deletion"""
+        added = {path: new for path, (old, new) in changed.items() if old is None}
+        deleted = {path: old for path, (old, new) in changed.items() if new is None}
+        if not added or not deleted:
+            return {}
+        by_oid: Dict[str, List[str]] = {}
+        for path, (mode, oid) in deleted.items():
+            if oid == EMPTY_BLOB_OID:
+                raise UnsupportedRepository("git does not pair empty files as renames")
+            by_oid.setdefault(oid, []).append(path)
+        renames = {}
+        for path, (mode, oid, _content) in added.items():
+            sources = by_oid.get(oid, [])
+            if len(sources) > 1 or any(p in renames.values() for p in sources):
+                raise UnsupportedRepository("ambiguous rename")
+            if sources:
+                if deleted[sources[0]][0] != mode:
+                    raise UnsupportedRepository("rename with mode change")
+                renames[path] = sources[0]
+        if len(renames) != len(added) and len(renames) != len(deleted):
+            # git would try to pair the rest by similarity.
+            raise UnsupportedRepository("possible inexact renames")
+        return renames
+
+    def _abbrev(self, oid: str) -> str:
+        if oid == NULL_OID:
+            return oid[:self._abbrev_length]
+        length = self._abbrev_length
+        while length < 40 and self.objects.is_ambiguous(oid, length):
+            length += 1
+        return oid[:length]
+
+    def _blob(self, oid: str, content: Optional[bytes]) -> bytes:
+        if content is not None:
+            return content
+        kind, data = self.objects.read(oid)
+        return data
+
+    def _render_rename(self, old_path: str, new_path: str) -> str:
+        return "\n".join([
+            f"diff --git {_quote('a/' + old_path)} {_quote('b/' + new_path)}",
+            "similarity index 100%",
+            f"rename from {_quote(old_path)}",
+            f"rename to {_quote(new_path)}",
+        ])
+
+    def _render_patch(self, path: str, old, new) -> str:
+        a_name = _quote("a/" + path)
+        b_name = _quote("b/" + path)
+        lines = [f"diff --git {a_name} {b_name}"]
+        old_mode, old_oid = (old[0], old[1]) if old else (None, NULL_OID)
+        new_mode, new_oid = (new[0], new[1]) if new else (None, NULL_OID)
+        if old is None:
+            lines.append(f"new file mode {new_mode:o}")
+        elif new is None:
+            lines.append(f"deleted file mode {old_mode:o}")
+        elif old_mode != new_mode:
+            lines.append(f"old mode {old_mode:o}")
+            lines.append(f"new mode {new_mode:o}")
+        if old_oid == new_oid:
+            return "\n".join(lines)
+
+        index_line = f"index {self._abbrev(old_oid)}..{self._abbrev(new_oid)}"
+        if old_mode is not None and old_mode == new_mode:
+            index_line += f" {old_mode:o}"
+        lines.append(index_line)
+
+        old_data = self._blob(old_oid, None) if old else b""
+        new_data = self._blob(new_oid, new[2]) if new else b""
+        old_label = a_name if old else "/dev/null"
+        new_label = b_name if new else "/dev/null"
+        if b"\0" in old_data[:8000] or b"\0" in new_data[:8000]:
+            lines.append(f"Binary files {old_label} and {new_label} differ")
+            return "\n".join(lines)
+
+        hunks = _unified_hunks(old_data, new_data)
+        if hunks:
+            # git adds a tab after names containing spaces
+            lines.append(f"--- {old_label}" + _name_terminator(old_label))
+            lines.append(f"+++ {new_label}" + _name_terminator(new_label))
+            lines.extend(hunks)
+        return "\n".join(lines)
+
+    @_reports_corruption
+    def untracked_files(self, cwd: Optional[str] = None) -> List[str]:
+        """Same result as `git ls-files --others --exclude-standard` run in
+        cwd (default: the current directory), which lists paths under it,
+        relative to it"""
+        prefix = os.path.relpath(os.path.abspath(cwd or os.getcwd()), self.worktree).replace(os.sep, "/")
+        prefix = "" if prefix == "." else prefix + "/"
+        index = self.index()
+        tracked_dirs = set()
+        for path in index:
+            parts = path.split("/")
+            for depth in range(1, len(parts)):
+                tracked_dirs.add("/".join(parts[:depth]))
+
+        rules = load_ignore_rules(self)
+        found: List[str] = []
+
+        def walk(directory: str, relative: str):
+            rules.add_file(os.path.join(directory, ".gitignore"), relative)
+            try:
+                with os.scandir(directory) as it:
+                    children = sorted(it, key=lambda e: e.name.encode("utf-8", "surrogateescape"))
+            except (PermissionError, NotADirectoryError):
+                children = []
+            for child in children:
+                if child.name == ".git":
+                    continue
+                path = f"{relative}/{child.name}" if relative else child.name
+                is_dir = child.is_dir(follow_symlinks=False)
+                if not (path + "/").startswith(prefix) and not prefix.startswith(path + "/"):
+                    continue
+                if is_dir:
+                    if path not in tracked_dirs and os.path.exists(os.path.join(child.path, ".git")):
+                        if path not in index and not rules.is_ignored(path, True):
+                            found.append(path + "/")
+                        continue
+                    if rules.is_ignored(path, True):
+                        continue
+                    walk(child.path, path)
+                elif path not in index and not rules.is_ignored(path, False):
+                    if _has_surrogates(path):
+                        # git quotes names that are not UTF-8
+                        raise UnsupportedRepository("untracked file with a non-UTF-8 name")
+                    found.append(path)
+            rules.pop(relative)
+
+        walk(self.worktree, "")
+        found = [path[len(prefix):] for path in found if path.startswith(prefix)]
+        return sorted(found, key=lambda p: p.encode("utf-8", "surrogateescape"))
+
+
+def _has_surrogates(name: str) -> bool:
+    try:
+        name.encode("utf-8")
+    except UnicodeEncodeError:
+        return True
+    return False
+
+
+def _quote(name: str) -> str:
+    """Quote a path the way git does with core.quotePath=false"""
+    special = {'"': '\\"', "\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r",
+               "\a": "\\a", "\b": "\\b", "\f": "\\f", "\v": "\\v"}
+    if not any(ch in special or ord(ch) < 0x20 or ord(ch) == 0x7f for ch in name):
+        return name
+    out = []
+    for ch in name:
+        if ch in special:
+            out.append(special[ch])
+        elif ord(ch) < 0x20 or ord(ch) == 0x7f:
+            out.append(f"\\{ord(ch):03o}")
+        else:
+            out.append(ch)
+    return '"' + "".join(out) + '"'
+
+
+def _name_terminator(label: str) -> str:
+    # git ends unquoted ---/+++ names containing spaces with a tab
+    return "\t" if " " in label and not label.startswith('"') else ""
+
+
+def _split_lines(data: bytes) -> List[bytes]:
+    parts = data.split(b"\n")
+    lines = [part + b"\n" for part in parts[:-1]]
+    if parts[-1]:
+        lines.append(parts[-1])
+    return lines
+
+
+def _function_context(line: bytes) -> bool:
+    return bool(line) and (chr(line[0]).isalpha() or line[:1] in (b"_", b"$"))
+
+
+def _unified_hunks(old_data: bytes, new_data: bytes, context: int = 3) -> List[str]:
+    """Hunk lines in git's format, including function-name hunk headers.
+
+    Hunks come from difflib, which can align an edit differently from git's
+    own diff algorithm when a removed or added line also appears on the
+    other side (moved lines, a repeated `}` or blank line that could slide).
+    Those edits raise UnsupportedRepository; in the others no line can be
+    matched any other way, so both algorithms produce the same hunks. Only
+    simple edits qualify: on gitme's own history about two thirds of the
+    modified files fall back (benchmarks/bench_in_process_fallback.py).
+    """
+    # Lines keep their terminator so a missing newline at end of file
+    # counts as a change, as it does for git.
+    old_lines = _split_lines(old_data)
+    new_lines = _split_lines(new_data)
+
+    def emit(prefix: str, line: bytes):
+        if line.endswith(b"\n"):
+            out.append(prefix + line[:-1].decode("utf-8", errors="replace"))
+        else:
+            out.append(prefix + line.decode("utf-8", errors="replace"))
+            out.append("\\ No newline at end of file")
+
+    def span(start: int, stop: int) -> str:
+        length = stop - start
+        if length == 1:
+            return str(start + 1)
+        return f"{start if not length else start + 1},{length}"
+
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    opcodes = matcher.get_opcodes()
+    old_set, new_set = set(old_lines), set(new_lines)
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag != "equal" and (any(line in new_set for line in old_lines[i1:i2])
+                               or any(line in old_set for line in new_lines[j1:j2])):
+            raise UnsupportedRepository("edit may be aligned differently by git")
+
+    out: List[str] = []
+    for group in matcher.get_grouped_opcodes(context):
+        if all(tag == "equal" for tag, *_ in group):
+            continue
+        first, last = group[0], group[-1]
+        header = f"@@ -{span(first[1], last[2])} +{span(first[3], last[4])} @@"
+        for line in reversed(old_lines[:first[1]]):
+            if _function_context(line):
+                header += " " + line.rstrip().decode("utf-8", errors="replace")[:80]
+                break
+        out.append(header)
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                for i in range(i1, i2):
+                    emit(" ", old_lines[i])
+                continue
+            for i in range(i1, i2):
+                emit("-", old_lines[i])
+            for j in range(j1, j2):
+                emit("+", new_lines[j])
+    return out
+
+
+def open_repository(start: Optional[str] = None) -> Optional[Repository]:
+    """Open the repository containing `start` in-process, or None if that
+    is not possible and git itself should be used"""
+    try:
+        return Repository.open(start)
+    except (GitObjectError, OSError, ValueError):
+        return None
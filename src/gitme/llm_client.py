@@ -1,91 +1,553 @@
 import os
 import json
-from typing import Dict, Optional
-from anthropic import Anthropic
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-try:
-    from openai import OpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
+from .config import Config
+from .prompt_packer import estimate_tokens, pack_diff, pack_file_changes
+from .response_cache import ResponseCache
+
+
+TEMPERATURE = 0.3
+
+# OpenAI batch statuses after which the job will not change any more
+OPENAI_BATCH_DONE = {"completed", "failed", "expired", "cancelled"}
+
+_ANTHROPIC_NAMES = ("Anthropic", "AsyncAnthropic")
+_OPENAI_NAMES = ("OpenAI", "AsyncOpenAI", "OPENAI_AVAILABLE")
+
+
+def __getattr__(name: str):
+    # The provider SDKs take far longer to import than the rest of gitme, so
+    # they are only loaded once a client is actually needed
+    if name in _ANTHROPIC_NAMES:
+        import anthropic
+        for sdk_name in _ANTHROPIC_NAMES:
+            globals()[sdk_name] = getattr(anthropic, sdk_name)
+    elif name in _OPENAI_NAMES:
+        try:
+            from openai import AsyncOpenAI, OpenAI
+            globals().update(OpenAI=OpenAI, AsyncOpenAI=AsyncOpenAI, OPENAI_AVAILABLE=True)
+        except ImportError:
+            globals()["OPENAI_AVAILABLE"] = False
+            if name != "OPENAI_AVAILABLE":
+                raise AttributeError(name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return globals()[name]
+
+
+def _sdk(name: str):
+    """Look up a lazily imported SDK name through the module, so patches apply"""
+    return getattr(sys.modules[__name__], name)
+
+
+class ClientPool:
+    """Hands out one SDK client per provider, key and endpoint so every
+    generation reuses the same HTTP connection pool and its keep-alive
+    connections. Async clients are also keyed by event loop, since their
+    connections cannot move between loops."""
+    
+    def __init__(self):
+        self._clients: Dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, provider: str, api_key: str, base_url: Optional[str] = None, asynchronous: bool = False):
+        if provider == "openai":
+            factory = _sdk("AsyncOpenAI" if asynchronous else "OpenAI")
+        else:
+            factory = _sdk("AsyncAnthropic" if asynchronous else "Anthropic")
+        loop = None
+        if asynchronous:
+            import asyncio
+            loop = id(asyncio.get_running_loop())
+        # The factory is part of the key so a patched SDK class gets its own client
+        key = (factory, api_key, base_url, loop)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                kwargs = {"api_key": api_key}
+                if base_url:
+                    kwargs["base_url"] = base_url
+                client = factory(**kwargs)
+                self._clients[key] = client
+            return client
+    
+    def close(self) -> None:
+        """Close the synchronous clients; async clients are dropped with their loop"""
+        with self._lock:
+            clients, self._clients = self._clients, {}
+        for key, client in clients.items():
+            if key[3] is None:
+                client.close()
+    
+    async def aclose(self) -> None:
+        """Close the async clients created on the running loop"""
+        import asyncio
+        loop = id(asyncio.get_running_loop())
+        with self._lock:
+            keys = [key for key in self._clients if key[3] == loop]
+            clients = [self._clients.pop(key) for key in keys]
+        for client in clients:
+            await client.close()
+
+
+class BatchJobError(Exception):
+    """A provider batch job failed, expired or took too long as a whole"""
+
+
+# Shared by every generator in the process unless one is given its own pool
+shared_pool = ClientPool()
 
 
 class CommitMessageGenerator:
-    def __init__(self, api_key: Optional[str] = None):
-        self.api_key = api_key or os.environ.get("ANTHROPIC_API_KEY")
-        if not self.api_key:
-            raise ValueError("Anthropic API key is required. Set ANTHROPIC_API_KEY environment variable.")
+    # Token budget shared by all diffs in a single-request prompt
+    max_prompt_tokens = 8000
+    # Changes whose diffs are estimated above this size are summarized in groups first
+    map_reduce_threshold = 20000
+    # Token budget of the diffs sent in one group summary request
+    chunk_tokens = 6000
+    # Group summaries requested in parallel
+    concurrency = 4
+    # Seconds between status checks of a submitted batch job
+    batch_poll_interval = 10.0
+    # Seconds to wait for a batch job; both providers finish within a day
+    batch_timeout = 86400.0
+    
+    def __init__(self, api_key: Optional[str] = None, cache: Optional[ResponseCache] = None,
+                 config: Optional[Config] = None, provider: str = "anthropic",
+                 model: Optional[str] = None, base_url: Optional[str] = None,
+                 pool: Optional[ClientPool] = None):
+        self._is_openai = provider == "openai"
+        if self._is_openai:
+            if not _sdk("OPENAI_AVAILABLE"):
+                raise ImportError("OpenAI library not installed. Install with: pip install openai")
+            self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
+            if not self.api_key:
+                raise ValueError("OpenAI API key is required. Set OPENAI_API_KEY environment variable.")
+        else:
+            self.api_key = api_key or os.environ.get("ANTHROPIC_API_KEY")
+            if not self.api_key:
+                raise ValueError("Anthropic API key is required. Set ANTHROPIC_API_KEY environment variable.")
         
-        self.client = Anthropic(api_key=self.api_key)
-        self.model = "claude-3-5-haiku-latest"  # Using Haiku 3.5 latest
-        self._is_openai = False
+        self.pool = pool or shared_pool
+        self.base_url = base_url
+        self.client = self.pool.get(provider, self.api_key, base_url)
+        self.model = model or ("gpt-4o-mini" if self._is_openai else "claude-3-5-haiku-latest")  # Using Haiku 3.5 latest
+        self.cache = cache
+        self._apply_config(config)
     
     @classmethod
-    def generate_commit_message_openai(cls, file_changes: Dict[str, str], api_key: Optional[str] = None, model: str = "gpt-4o-mini"):
-        """Create a CommitMessageGenerator instance configured for OpenAI API."""
-        if not OPENAI_AVAILABLE:
-            raise ImportError("OpenAI library not installed. Install with: pip install openai")
-        
-        instance = cls.__new__(cls)
-        instance.api_key = api_key or os.environ.get("OPENAI_API_KEY")
-        if not instance.api_key:
-            raise ValueError("OpenAI API key is required. Set OPENAI_API_KEY environment variable.")
-        
-        instance.client = OpenAI(api_key=instance.api_key)
-        instance.model = model
-        instance._is_openai = True
-        prompt = instance._create_prompt(file_changes)
+    def generate_commit_message_openai(cls, file_changes: Dict[str, str], api_key: Optional[str] = None, model: str = "gpt-4o-mini",
+                                       cache: Optional[ResponseCache] = None,
+                                       on_token: Optional[Callable[[str], None]] = None,
+                                       config: Optional[Config] = None):
+        """Generate a commit message with the OpenAI API."""
+        generator = cls(api_key, cache=cache, config=config, provider="openai", model=model)
+        return generator.generate_commit_message(file_changes, on_token=on_token)
+    
+    @property
+    def async_client(self):
+        """Async client from the pool, for the running event loop"""
+        return self.pool.get("openai" if self._is_openai else "anthropic", self.api_key, self.base_url, asynchronous=True)
+    
+    def _apply_config(self, config: Optional[Config]) -> None:
+        if config is None:
+            return
+        self.max_prompt_tokens = config.get("max_prompt_tokens", self.max_prompt_tokens)
+        self.map_reduce_threshold = config.get("map_reduce_threshold_tokens", self.map_reduce_threshold)
+        self.chunk_tokens = config.get("map_reduce_chunk_tokens", self.chunk_tokens)
+        self.concurrency = config.get("map_reduce_concurrency", self.concurrency)
+        self.batch_poll_interval = config.get("batch_api_poll_interval", self.batch_poll_interval)
+        self.batch_timeout = config.get("batch_api_timeout", self.batch_timeout)
+    
+    def generate_commit_message(self, file_changes: Dict[str, str],
+                                on_token: Optional[Callable[[str], None]] = None) -> str:
+        """Generate a commit message; when on_token is given the completion is
+        streamed and each text fragment is passed to it as it arrives"""
+        if not file_changes:
+            return "No changes to commit"
         
         try:
-            response = instance.client.chat.completions.create(
-                model=instance.model,
-                max_tokens=500,
-                temperature=0.3,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            )
-            
-            return response.choices[0].message.content.strip()
+            if self._needs_map_reduce(file_changes):
+                return self._generate_map_reduce(file_changes, on_token)
+            return self._complete(self._create_prompt(file_changes), on_token)
         
         except Exception as e:
             print(f"Error generating commit message: {e}")
+            if self.cache is not None:
+                # A summary may have hit before the failure; the fallback did not
+                self.cache.last_hit = False
             return "Update files"
     
-    def generate_commit_message(self, file_changes: Dict[str, str]) -> str:
+    async def agenerate_commit_message(self, file_changes: Dict[str, str], raise_errors: bool = False) -> str:
+        """Async generate_commit_message on the pooled async client, so many
+        generations can share one event loop and its connections. With
+        raise_errors, a failed request raises instead of falling back to a
+        generic message."""
         if not file_changes:
             return "No changes to commit"
         
-        prompt = self._create_prompt(file_changes)
-        
         try:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=500,
-                temperature=0.3,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            )
+            if not self._needs_map_reduce(file_changes):
+                return await self._acomplete(self._create_prompt(file_changes))
+            
+            import asyncio
+            semaphore = asyncio.Semaphore(max(1, self.concurrency))
             
-            return response.content[0].text.strip()
+            async def summarize(group):
+                async with semaphore:
+                    return await self._acomplete(self._create_summary_prompt(group))
+            
+            summaries = await asyncio.gather(*(summarize(group) for group in self._chunk_file_changes(file_changes)))
+            return await self._acomplete(self._create_reduce_prompt(list(file_changes), list(summaries)))
         
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"Error generating commit message: {e}")
             return "Update files"
     
+    async def asummarize_commit(self, subject: str, file_changes: Dict[str, str]) -> str:
+        """Short bullet summary of one commit, for pull request descriptions;
+        request errors are raised"""
+        return await self._acomplete(self._create_commit_summary_prompt(subject, file_changes))
+    
+    def generate_pr_description(self, commits: List[Tuple[str, str]],
+                                on_token: Optional[Callable[[str], None]] = None) -> str:
+        """Pull request description from (subject, summary) per commit,
+        oldest first. While the summaries do not fit in max_prompt_tokens
+        they are condensed in groups of chunk_tokens, concurrently; if that
+        stops shrinking them, each is cut to its share of the budget."""
+        entries = [f"* {subject}\n{summary}" for subject, summary in commits]
+        total = sum(estimate_tokens(entry) for entry in entries)
+        while len(entries) > 1 and total > self.max_prompt_tokens:
+            previous = total
+            entries = self._condense_entries(entries)
+            total = sum(estimate_tokens(entry) for entry in entries)
+            if total >= previous:
+                break
+        if total > self.max_prompt_tokens:
+            share = max(1, self.max_prompt_tokens // len(entries))
+            entries = [pack_diff(entry, share) for entry in entries]
+        return self._complete(self._create_pr_prompt(entries), on_token)
+    
+    def _condense_entries(self, entries: List[str]) -> List[str]:
+        """One condensed entry per group of consecutive entries that fits in
+        chunk_tokens; an entry too long for any prompt is cut first"""
+        groups, current, used = [], [], 0
+        for entry in entries:
+            tokens = estimate_tokens(entry)
+            if tokens > self.max_prompt_tokens:
+                entry, tokens = pack_diff(entry, self.max_prompt_tokens), self.max_prompt_tokens
+            if current and used + tokens > self.chunk_tokens:
+                groups.append(current)
+                current, used = [], 0
+            current.append(entry)
+            used += tokens
+        groups.append(current)
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=max(1, self.concurrency)) as pool:
+            return list(pool.map(lambda group: self._complete(self._create_condense_prompt(group)), groups))
+    
+    def generate_batch(self, changesets: Dict[str, Dict[str, str]],
+                       on_status: Optional[Callable[[Dict[str, int]], None]] = None
+                       ) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """Generate messages for many changesets as one provider batch job
+        (Anthropic Message Batches or OpenAI Batch), which is billed at a
+        discount and kept out of the per-request rate limits, at the cost of
+        waiting for the job. Changesets are keyed by any string; each one
+        is a single prompt packed to max_prompt_tokens, and cached prompts
+        are not submitted. on_status gets the job's request counts after
+        every poll. Returns (messages, errors) by key; BatchJobError is
+        raised if the job as a whole fails, and interrupting the wait
+        cancels it."""
+        messages: Dict[str, str] = {}
+        prompts: Dict[str, str] = {}
+        for key, file_changes in changesets.items():
+            if not file_changes:
+                messages[key] = "No changes to commit"
+                continue
+            prompt = self._create_prompt(file_changes)
+            cached = self._cached_response(prompt)
+            if cached is not None:
+                messages[key] = cached
+            else:
+                prompts[key] = prompt
+        if not prompts:
+            return messages, {}
+        
+        # Both providers restrict custom ids to short plain strings
+        keys = {f"gitme-{index}": key for index, key in enumerate(prompts)}
+        run = self._run_openai_batch if self._is_openai else self._run_anthropic_batch
+        texts, failures = run({custom_id: prompts[key] for custom_id, key in keys.items()}, on_status)
+        errors: Dict[str, str] = {}
+        for custom_id, key in keys.items():
+            if custom_id in texts:
+                messages[key] = self._store_response(prompts[key], texts[custom_id])
+            else:
+                errors[key] = failures.get(custom_id, "missing from the batch results")
+        return messages, errors
+    
+    def _poll_batch(self, job, retrieve: Callable, finished: Callable, counts: Callable, cancel: Callable,
+                    on_status: Optional[Callable[[Dict[str, int]], None]]):
+        """Retrieve job until finished(job), cancelling it if the wait is
+        interrupted or runs out"""
+        deadline = time.monotonic() + self.batch_timeout
+        try:
+            while True:
+                job = retrieve(job.id)
+                if on_status is not None:
+                    on_status(counts(job))
+                if finished(job):
+                    return job
+                if time.monotonic() >= deadline:
+                    raise BatchJobError(f"batch {job.id} did not finish within {self.batch_timeout:.0f}s")
+                time.sleep(self.batch_poll_interval)
+        except BaseException:
+            try:
+                cancel(job.id)
+            except Exception:
+                pass
+            raise
+    
+    def _run_anthropic_batch(self, prompts: Dict[str, str], on_status) -> Tuple[Dict[str, str], Dict[str, str]]:
+        batches = self.client.messages.batches
+        job = batches.create(requests=[{"custom_id": custom_id, "params": self._request(prompt)}
+                                       for custom_id, prompt in prompts.items()])
+        job = self._poll_batch(job, batches.retrieve, lambda job: job.processing_status == "ended",
+                               lambda job: dict(job.request_counts), batches.cancel, on_status)
+        texts, errors = {}, {}
+        for entry in batches.results(job.id):
+            result = entry.result
+            if result.type == "succeeded":
+                texts[entry.custom_id] = result.message.content[0].text.strip()
+            elif result.type == "errored":
+                errors[entry.custom_id] = f"{result.error.error.type}: {result.error.error.message}"
+            else:
+                errors[entry.custom_id] = f"request {result.type}"
+        return texts, errors
+    
+    def _run_openai_batch(self, prompts: Dict[str, str], on_status) -> Tuple[Dict[str, str], Dict[str, str]]:
+        lines = [json.dumps({"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions",
+                             "body": self._request(prompt)}) for custom_id, prompt in prompts.items()]
+        upload = self.client.files.create(file=("gitme-batch.jsonl", "\n".join(lines).encode("utf-8")),
+                                          purpose="batch")
+        job = self.client.batches.create(input_file_id=upload.id, endpoint="/v1/chat/completions",
+                                         completion_window="24h")
+        job = self._poll_batch(
+            job, self.client.batches.retrieve, lambda job: job.status in OPENAI_BATCH_DONE,
+            lambda job: {"completed": job.request_counts.completed, "failed": job.request_counts.failed,
+                         "total": job.request_counts.total} if job.request_counts else {},
+            self.client.batches.cancel, on_status
+        )
+        if not job.output_file_id and not job.error_file_id:
+            raise BatchJobError(f"batch {job.id} {job.status}")
+        texts, errors = {}, {}
+        for file_id in (job.output_file_id, job.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                response = entry.get("response") or {}
+                body = response.get("body") or {}
+                if response.get("status_code") == 200:
+                    texts[entry["custom_id"]] = body["choices"][0]["message"]["content"].strip()
+                else:
+                    error = entry.get("error") or body.get("error") or {}
+                    errors[entry["custom_id"]] = error.get("message", f"status {response.get('status_code')}")
+        return texts, errors
+    
+    def _needs_map_reduce(self, file_changes: Dict[str, str]) -> bool:
+        return sum(estimate_tokens(diff) for diff in file_changes.values()) > self.map_reduce_threshold
+    
+    def _request(self, prompt: str) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "max_tokens": 500,
+            "temperature": TEMPERATURE,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+        }
+    
+    def _response_text(self, response) -> str:
+        if self._is_openai:
+            return response.choices[0].message.content.strip()
+        return response.content[0].text.strip()
+    
+    def _complete(self, prompt: str, on_token: Optional[Callable[[str], None]] = None) -> str:
+        """Send one prompt to the model, going through the response cache"""
+        cached = self._cached_response(prompt)
+        if cached is not None:
+            return cached
+        
+        if on_token is not None:
+            stream = self._stream_openai if self._is_openai else self._stream_anthropic
+            return self._store_response(prompt, stream(prompt, on_token).strip())
+        
+        if self._is_openai:
+            response = self.client.chat.completions.create(**self._request(prompt))
+        else:
+            response = self.client.messages.create(**self._request(prompt))
+        return self._store_response(prompt, self._response_text(response))
+    
+    async def _acomplete(self, prompt: str) -> str:
+        cached = self._cached_response(prompt)
+        if cached is not None:
+            return cached
+        
+        client = self.async_client
+        if self._is_openai:
+            response = await client.chat.completions.create(**self._request(prompt))
+        else:
+            response = await client.messages.create(**self._request(prompt))
+        return self._store_response(prompt, self._response_text(response))
+    
+    def _generate_map_reduce(self, file_changes: Dict[str, str],
+                             on_token: Optional[Callable[[str], None]] = None) -> str:
+        """Summarize token-budgeted groups of files concurrently, then write the
+        commit message from the group summaries"""
+        groups = self._chunk_file_changes(file_changes)
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=max(1, self.concurrency)) as pool:
+            summaries = list(pool.map(
+                lambda group: self._complete(self._create_summary_prompt(group)), groups
+            ))
+        return self._complete(self._create_reduce_prompt(list(file_changes), summaries), on_token)
+    
+    def _chunk_file_changes(self, file_changes: Dict[str, str]) -> List[Dict[str, str]]:
+        """Split file changes into groups whose diffs fit in chunk_tokens;
+        a single diff larger than the budget is packed to fit"""
+        groups = []
+        current = {}
+        used = 0
+        for filename, diff in file_changes.items():
+            tokens = estimate_tokens(diff)
+            if tokens > self.chunk_tokens:
+                diff = pack_diff(diff, self.chunk_tokens)
+                tokens = estimate_tokens(diff)
+            if current and used + tokens > self.chunk_tokens:
+                groups.append(current)
+                current = {}
+                used = 0
+            current[filename] = diff
+            used += tokens
+        if current:
+            groups.append(current)
+        return groups
+    
+    def _create_summary_prompt(self, group: Dict[str, str]) -> str:
+        changes = "\n".join(f"File: {filename}\nChanges:\n{diff}" for filename, diff in group.items())
+        return f"""Summarize the following part of a larger git diff.
+For each file write one short bullet point describing what changed and why it matters.
+Mention only behavior that is visible in the diff.
+
+Git diff:
+{changes}
+
+Summary:"""
+    
+    def _create_reduce_prompt(self, filenames: List[str], summaries: List[str]) -> str:
+        return f"""The following are summaries of the parts of one large git diff touching {len(filenames)} files.
+Generate a concise, informative commit message for the whole change.
+The commit message should:
+1. Have a summary line that starts with a verb in present tense (e.g., Add, Update, Fix, Remove)
+2. The summary line should be under 50 characters
+3. Include a blank line after the summary
+4. List the most important changes with bullet points, grouping related files
+5. Keep the total message concise and informative
+
+Summaries:
+{chr(10).join(summaries)}
+
+Generate only the commit message following the format above:"""
+    
+    def _create_commit_summary_prompt(self, subject: str, file_changes: Dict[str, str]) -> str:
+        changes = "\n".join(f"File: {filename}\nChanges:\n{diff}"
+                            for filename, diff in pack_file_changes(file_changes, self.max_prompt_tokens).items())
+        return f"""Summarize the following git commit for a pull request description.
+Its author described it as: {subject}
+Write one to three short bullet points describing what changed and why it matters.
+Mention only behavior that is visible in the diff.
+
+Git diff:
+{changes}
+
+Summary:"""
+    
+    def _create_condense_prompt(self, entries: List[str]) -> str:
+        return f"""The following are summaries of consecutive commits on a branch, oldest first.
+Merge them into at most five bullet points covering the most important changes.
+
+Commits:
+{chr(10).join(entries)}
+
+Summary:"""
+    
+    def _create_pr_prompt(self, entries: List[str]) -> str:
+        return f"""The following are summaries of the commits on a branch, oldest first.
+Write a pull request description for the whole branch.
+The description should:
+1. Start with a title line under 70 characters that starts with a verb in present tense
+2. Include a blank line after the title
+3. Explain in one or two sentences what the branch changes and why
+4. List the most important changes with bullet points, grouping related commits
+5. Leave out changes that a later commit undid
+
+Commits:
+{chr(10).join(entries)}
+
+Generate only the pull request description following the format above:"""
+    
+    def _stream_anthropic(self, prompt: str, on_token: Callable[[str], None]) -> str:
+        parts = []
+        with self.client.messages.stream(**self._request(prompt)) as stream:
+            for text in stream.text_stream:
+                parts.append(text)
+                on_token(text)
+        return "".join(parts)
+    
+    def _stream_openai(self, prompt: str, on_token: Callable[[str], None]) -> str:
+        parts = []
+        stream = self.client.chat.completions.create(**self._request(prompt), stream=True)
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if text:
+                parts.append(text)
+                on_token(text)
+        return "".join(parts)
+    
+    def _cache_key(self, prompt: str) -> str:
+        provider = "openai" if self._is_openai else "anthropic"
+        return self.cache.key(provider, self.model, TEMPERATURE, prompt)
+    
+    def _cached_response(self, prompt: str) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return self.cache.get(self._cache_key(prompt))
+    
+    def _store_response(self, prompt: str, message: str) -> str:
+        if self.cache is not None:
+            self.cache.put(self._cache_key(prompt), message)
+        return message
+    
     def _create_prompt(self, file_changes: Dict[str, str]) -> str:
         changes_summary = []
         filenames = list(file_changes.keys())
         
-        for filename, diff in file_changes.items():
-            changes_summary.append(f"File: {filename}\nChanges:\n{diff[:1000]}...")  # Truncate long diffs
+        # Spread the token budget over files instead of cutting each one alike
+        for filename, diff in pack_file_changes(file_changes, self.max_prompt_tokens).items():
+            changes_summary.append(f"File: {filename}\nChanges:\n{diff}")
         
         prompt = f"""Analyze the following git diff and generate a concise, informative commit message.
 The commit message should:
@@ -0,0 +1,145 @@
+"""Write pull request descriptions from the commits of a branch.
+
+Every commit is summarized on its own, and each summary is kept under
+~/.gitme/commit_summaries keyed by the commit id and the model. The
+summaries are then reduced into one description. Re-running after pushing
+more commits only summarizes the new ones, so the wait stays about the
+same however long the branch grows.
+"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .git_diff import GitDiffAnalyzer
+
+
+class PullRequestError(Exception):
+    """The range cannot be described"""
+
+
+class SummaryCache:
+    """Commit summaries on disk, one small file per commit and model. A
+    commit id names an immutable diff, so entries never go stale."""
+    
+    # Bump when the summary prompt changes so old entries stop matching
+    FORMAT_VERSION = 1
+    
+    def __init__(self, cache_dir: Optional[Path] = None):
+        self.cache_dir = Path(cache_dir) if cache_dir else Path.home() / ".gitme" / "commit_summaries"
+        self.hits = 0
+        self.misses = 0
+    
+    def key(self, oid: str, provider: str, model: str) -> str:
+        material = "\0".join([str(self.FORMAT_VERSION), provider, model, oid])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+    
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key[2:]
+    
+    def get(self, key: str) -> Optional[str]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                summary = f.read()
+        except (FileNotFoundError, NotADirectoryError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return summary
+    
+    def put(self, key: str, summary: str) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # A unique temporary name, since threads of one process can write the same key
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(summary)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+class PullRequestWriter:
+    """Summarizes the commits of revision_range (BASE..HEAD, or BASE for
+    BASE..HEAD) and writes a description from the summaries. Merge commits
+    are left out, since their changes come from the commits they merge."""
+    
+    def __init__(self, revision_range: str, analyzer: GitDiffAnalyzer, generator,
+                 cache: Optional[SummaryCache] = None, provider: str = "anthropic"):
+        self.revision_range = revision_range if ".." in revision_range else f"{revision_range}..HEAD"
+        self.analyzer = analyzer
+        self.generator = generator
+        self.cache = cache
+        self.provider = provider
+        self.summarized = 0
+    
+    def commits(self) -> List[Tuple[str, str, Optional[str]]]:
+        """(commit, subject, first parent) for the range, oldest first"""
+        output = self.analyzer.backend.run(["rev-list", "--reverse", "--topo-order", "--no-merges",
+                                            "--format=%P%x00%s", self.revision_range])
+        if output is None:
+            raise PullRequestError(f"cannot list the commits in {self.revision_range}")
+        lines = output.split("\n") if output else []
+        commits = []
+        for header, fields in zip(lines[0::2], lines[1::2]):
+            parents, subject = fields.split("\0", 1)
+            commits.append((header[len("commit "):], subject, parents.split()[0] if parents else None))
+        if not commits:
+            raise PullRequestError(f"no commits in {self.revision_range}")
+        return commits
+    
+    async def summarize(self, commits: List[Tuple[str, str, Optional[str]]],
+                        on_summary: Optional[Callable[[str, str, str], None]] = None
+                        ) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """(summaries, errors) by commit id. Cached summaries are reused;
+        the others are generated concurrently from one diff-tree process
+        and cached as they arrive."""
+        import asyncio
+        summaries: Dict[str, str] = {}
+        pending = []
+        for oid, subject, parent in commits:
+            cached = self.cache.get(self._key(oid)) if self.cache else None
+            if cached is not None:
+                summaries[oid] = cached
+            else:
+                pending.append((oid, subject, parent))
+        
+        errors: Dict[str, str] = {}
+        changes = dict(self.analyzer.iter_commit_changes([(oid, parent) for oid, _, parent in pending]))
+        semaphore = asyncio.Semaphore(max(1, self.generator.concurrency))
+        
+        async def summarize_one(oid: str, subject: str):
+            file_changes = changes.get(oid)
+            if not file_changes:
+                summary = "- No file changes"
+            else:
+                async with semaphore:
+                    try:
+                        summary = await self.generator.asummarize_commit(subject, file_changes)
+                    except Exception as e:
+                        errors[oid] = f"{type(e).__name__}: {e}"
+                        return
+            summaries[oid] = summary
+            self.summarized += 1
+            if self.cache:
+                self.cache.put(self._key(oid), summary)
+            if on_summary is not None:
+                on_summary(oid, subject, summary)
+        
+        try:
+            await asyncio.gather(*(summarize_one(oid, subject) for oid, subject, _ in pending))
+        finally:
+            await self.generator.pool.aclose()
+        return summaries, errors
+    
+    def describe(self, commits: List[Tuple[str, str, Optional[str]]], summaries: Dict[str, str],
+                 on_token: Optional[Callable[[str], None]] = None) -> str:
+        return self.generator.generate_pr_description(
+            [(subject, summaries[oid]) for oid, subject, _ in commits], on_token=on_token
+        )
+    
+    def _key(self, oid: str) -> str:
+        return self.cache.key(oid, self.provider, self.generator.model)
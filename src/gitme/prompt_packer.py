@@ -0,0 +1,155 @@
+import math
+import os
+import re
+from typing import Dict, List
+
+
+# Words are split into ~4 character pieces, numbers into ~3 digit pieces and
+# every other symbol is its own token, which tracks BPE tokenizers closely
+# enough for budgeting without a network round trip.
+_TOKEN_RE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]|\s+")
+
+# Lines longer than this (minified or generated code) are cut
+MAX_LINE_CHARS = 400
+
+GAP_MARKER = "..."
+
+LOW_VALUE_NAMES = {
+    "package-lock.json", "yarn.lock", "pnpm-lock.yaml", "poetry.lock", "Pipfile.lock",
+    "Cargo.lock", "Gemfile.lock", "composer.lock", "go.sum", "uv.lock",
+}
+LOW_VALUE_SUFFIXES = (".min.js", ".min.css", ".map", ".svg", ".snap", ".lock", ".csv", ".ipynb")
+DOC_SUFFIXES = (".md", ".rst", ".txt", ".adoc")
+
+# Lines that say what happened to the file; always kept if anything is
+HEADER_PREFIXES = ("diff --git", "@@", "new file mode", "deleted file mode", "old mode", "new mode",
+                   "rename from", "rename to", "copy from", "copy to", "similarity index", "Binary files")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate how many tokens a model would count for text, locally"""
+    tokens = 0
+    for piece in _TOKEN_RE.findall(text):
+        first = piece[0]
+        if first.isalpha():
+            tokens += (len(piece) + 3) // 4
+        elif first.isdigit():
+            tokens += (len(piece) + 2) // 3
+        else:
+            tokens += 1
+    return tokens
+
+
+def file_weight(filename: str, diff: str) -> float:
+    """How much of the budget a file deserves relative to the others"""
+    changed = 0
+    hunks = 0
+    for line in diff.splitlines():
+        if line.startswith("@@"):
+            hunks += 1
+        elif line[:1] in ("+", "-") and not line.startswith(("+++", "---")):
+            changed += 1
+
+    name = os.path.basename(filename)
+    if name in LOW_VALUE_NAMES or name.endswith(LOW_VALUE_SUFFIXES):
+        factor = 0.1
+    elif name.endswith(DOC_SUFFIXES):
+        factor = 0.6
+    elif "test" in filename.lower():
+        factor = 0.8
+    else:
+        factor = 1.0
+    return factor * (math.log2(2 + changed) + 0.5 * hunks)
+
+
+def _line_priority(line: str) -> int:
+    if line.startswith(HEADER_PREFIXES):
+        return 0
+    if line.startswith(("+++", "---", "index ", "\\")):
+        return 3
+    if line[:1] in ("+", "-"):
+        return 1
+    return 2
+
+
+def pack_diff(diff: str, budget: int) -> str:
+    """Cut a diff down to about budget tokens, keeping headers first, then
+    changed lines, then context; dropped runs of lines become GAP_MARKER"""
+    lines = []
+    for line in diff.splitlines():
+        if len(line) > MAX_LINE_CHARS:
+            line = line[:MAX_LINE_CHARS] + GAP_MARKER
+        lines.append(line)
+    costs = [estimate_tokens(line) + 1 for line in lines]
+    if sum(costs) <= budget:
+        return "\n".join(lines)
+
+    gap_cost = estimate_tokens(GAP_MARKER) + 1
+    keep = set()
+    # Everything starts out as one dropped run, shown as a single marker
+    used = gap_cost
+    skipped = None
+    last = len(lines) - 1
+    for i in sorted(range(len(lines)), key=lambda i: (_line_priority(lines[i]), i)):
+        priority = _line_priority(lines[i])
+        # Never let a less useful line in after a more useful one did not fit
+        if skipped is not None and priority > skipped:
+            break
+        # Keeping a line splits, shortens or closes the dropped run around it
+        gaps = (i > 0 and i - 1 not in keep) + (i < last and i + 1 not in keep) - 1
+        cost = costs[i] + gaps * gap_cost
+        if used + cost > budget:
+            skipped = priority
+            continue
+        keep.add(i)
+        used += cost
+
+    packed = []
+    for i, line in enumerate(lines):
+        if i in keep:
+            packed.append(line)
+        elif not packed or packed[-1] != GAP_MARKER:
+            packed.append(GAP_MARKER)
+    return "\n".join(packed)
+
+
+def allocate_budget(needs: List[int], weights: List[float], budget: int) -> List[int]:
+    """Share budget between files in proportion to weight, never giving a
+    file more than it needs and handing the surplus to the others"""
+    shares = [0] * len(needs)
+    open_files = [i for i, need in enumerate(needs) if need > 0]
+    remaining = budget
+    while open_files and remaining > 0:
+        total_weight = sum(weights[i] for i in open_files) or len(open_files)
+        capped = []
+        for i in open_files:
+            share = int(remaining * (weights[i] or 1) / total_weight)
+            if shares[i] + share >= needs[i]:
+                capped.append(i)
+        if not capped:
+            for i in open_files:
+                shares[i] += int(remaining * (weights[i] or 1) / total_weight)
+            break
+        for i in capped:
+            remaining -= needs[i] - shares[i]
+            shares[i] = needs[i]
+            open_files.remove(i)
+    return shares
+
+
+def pack_file_changes(file_changes: Dict[str, str], max_tokens: int,
+                      per_file_overhead: int = 8) -> Dict[str, str]:
+    """Fit file_changes into max_tokens, weighting files by change size,
+    file type and hunk count"""
+    filenames = list(file_changes)
+    budget = max(0, max_tokens - per_file_overhead * len(filenames))
+    needs: List[int] = []
+    weights: List[float] = []
+    for filename in filenames:
+        diff = file_changes[filename]
+        needs.append(estimate_tokens(diff) + diff.count("\n") + 1)
+        weights.append(file_weight(filename, diff))
+
+    shares = allocate_budget(needs, weights, budget)
+    return {filename: pack_diff(file_changes[filename], share)
+            for filename, share in zip(filenames, shares)}
@@ -0,0 +1,87 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from .storage import file_lock
+
+# Serializes writers within the process; the lock file serializes processes
+_write_lock = threading.Lock()
+
+
+class ResponseCache:
+    """Local cache of LLM responses, stored in ~/.gitme/responses.json
+
+    Entries are keyed by a hash of the provider, model, temperature and the
+    normalized prompt, expire after ttl seconds, and the oldest entries are
+    dropped once there are more than max_entries.
+    """
+
+    def __init__(self, cache_file: Optional[Path] = None, ttl: int = 86400, max_entries: int = 200):
+        self.cache_file = Path(cache_file) if cache_file else Path.home() / ".gitme" / "responses.json"
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # Outcome of the latest get; after a generation, whether its final
+        # prompt was answered from the cache
+        self.last_hit = False
+
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        # Trailing whitespace never changes what the model is asked
+        return "\n".join(line.rstrip() for line in prompt.strip().splitlines())
+
+    def key(self, provider: str, model: str, temperature: float, prompt: str) -> str:
+        material = json.dumps([provider, model, temperature, self.normalize_prompt(prompt)])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._load_entries().get(key)
+        if entry is None or time.time() - entry.get("created", 0) > self.ttl:
+            self.misses += 1
+            self.last_hit = False
+            return None
+        self.hits += 1
+        self.last_hit = True
+        return entry["response"]
+
+    def put(self, key: str, response: str) -> None:
+        # Every writer merges into the current file, so concurrent puts from
+        # threads (map-reduce, the daemon) or processes all land
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with _write_lock, file_lock(self.cache_file.with_name(self.cache_file.name + ".lock")):
+            entries = self._load_entries()
+            now = time.time()
+            entries = {k: v for k, v in entries.items() if now - v.get("created", 0) <= self.ttl}
+            entries[key] = {"response": response, "created": now}
+            if len(entries) > self.max_entries:
+                newest = sorted(entries.items(), key=lambda item: item[1]["created"])[-self.max_entries:]
+                entries = dict(newest)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_file.parent, prefix=self.cache_file.name + ".",
+                                            suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(entries, f)
+                os.replace(tmp_path, self.cache_file)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+    def clear(self) -> None:
+        if self.cache_file.exists():
+            self.cache_file.unlink()
+
+    def _load_entries(self) -> Dict[str, Dict]:
+        if not self.cache_file.exists():
+            return {}
+        try:
+            with open(self.cache_file, "r") as f:
+                entries = json.load(f)
+            return entries if isinstance(entries, dict) else {}
+        except (json.JSONDecodeError, IOError):
+            return {}
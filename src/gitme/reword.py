@@ -0,0 +1,191 @@
+"""Regenerate the messages of a range of existing commits.
+
+The diffs of the whole range come from one `git diff-tree --stdin`
+process, the messages are generated concurrently, and the history is then
+rebuilt bottom-up with `git commit-tree`: same trees, same authors, new
+messages. Generated messages are kept in a checkpoint file in the git
+directory, so a run that fails halfway resumes where it stopped.
+"""
+import json
+import os
+import subprocess
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .git_diff import GitDiffAnalyzer
+
+
+CHECKPOINT_NAME = "gitme-reword.json"
+
+
+class RewordError(Exception):
+    """The range cannot be reworded"""
+
+
+class CommitInfo:
+    """What rewriting one commit needs to know about it"""
+    
+    def __init__(self, oid: str, tree: str, parents: List[str], author_name: str,
+                 author_email: str, author_date: str, subject: str):
+        self.oid = oid
+        self.tree = tree
+        self.parents = parents
+        self.author_name = author_name
+        self.author_email = author_email
+        self.author_date = author_date
+        self.subject = subject
+
+
+class Reworder:
+    """Plans, generates and applies new messages for revision_range, whose
+    tip must be HEAD. A single revision X means X..HEAD."""
+    
+    def __init__(self, revision_range: str, analyzer: GitDiffAnalyzer, provider: str = "anthropic",
+                 model: Optional[str] = None):
+        self.revision_range = revision_range if ".." in revision_range else f"{revision_range}..HEAD"
+        self.analyzer = analyzer
+        self.provider = provider
+        self.model = model
+        self.head: Optional[str] = None
+        self.ref: Optional[str] = None
+        self.checkpoint_path: Optional[str] = None
+    
+    def _git(self, args: List[str]) -> str:
+        output = self.analyzer.backend.run(args)
+        if output is None:
+            raise RewordError(f"git {' '.join(args)} failed")
+        return output
+    
+    def plan(self) -> List[CommitInfo]:
+        """Commits of the range, parents before children"""
+        tip = self.revision_range.split("..")[-1].lstrip(".") or "HEAD"
+        self.head = self._git(["rev-parse", "--verify", "HEAD^{commit}"])
+        if self._git(["rev-parse", "--verify", f"{tip}^{{commit}}"]) != self.head:
+            raise RewordError(f"{tip} is not HEAD; only commits up to HEAD can be reworded")
+        symbolic = self.analyzer.backend.run(["symbolic-ref", "-q", "HEAD"])
+        self.ref = symbolic or "HEAD"
+        self.checkpoint_path = os.path.join(self._git(["rev-parse", "--absolute-git-dir"]), CHECKPOINT_NAME)
+        
+        output = self._git(["rev-list", "--reverse", "--topo-order", "--date=raw",
+                            "--format=%T%x00%P%x00%an%x00%ae%x00%ad%x00%s", self.revision_range])
+        lines = output.split("\n") if output else []
+        commits = []
+        for header, fields in zip(lines[0::2], lines[1::2]):
+            tree, parents, name, email, date, subject = fields.split("\0")
+            commits.append(CommitInfo(header[len("commit "):], tree, parents.split(), name, email, date, subject))
+        if not commits:
+            raise RewordError(f"no commits in {self.revision_range}")
+        return commits
+    
+    def load_checkpoint(self) -> Dict[str, str]:
+        """Messages generated by an earlier run with the same provider and model"""
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if state.get("provider") != self.provider or state.get("model") != self.model:
+            return {}
+        return state.get("messages", {})
+    
+    def save_checkpoint(self, messages: Dict[str, str]) -> None:
+        state = {"range": self.revision_range, "head": self.head, "provider": self.provider,
+                 "model": self.model, "messages": messages}
+        tmp_path = f"{self.checkpoint_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.checkpoint_path)
+    
+    def clear_checkpoint(self) -> None:
+        try:
+            os.remove(self.checkpoint_path)
+        except FileNotFoundError:
+            pass
+    
+    def _prepare(self, commits: List[CommitInfo]) -> Tuple[Dict[str, str], List[CommitInfo], Dict[str, Dict[str, str]]]:
+        """Checkpointed messages, the commits still without one, and their diffs"""
+        messages = self.load_checkpoint()
+        pending = [commit for commit in commits if commit.oid not in messages]
+        # One diff-tree process for the whole range; merges are diffed
+        # against their first parent
+        changes = dict(self.analyzer.iter_commit_changes(
+            [(commit.oid, commit.parents[0] if commit.parents else None) for commit in pending]
+        ))
+        return messages, pending, changes
+    
+    def _original_message(self, commit: CommitInfo) -> str:
+        # Nothing to describe: keep what the author wrote
+        return self._git(["log", "-1", "--format=%B", commit.oid])
+    
+    async def generate(self, commits: List[CommitInfo], generator, concurrency: int = 4,
+                       on_message: Optional[Callable[[CommitInfo, str], None]] = None
+                       ) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """(messages, errors) by commit id. Messages from the checkpoint are
+        reused; each new one is checkpointed as soon as it arrives."""
+        import asyncio
+        messages, pending, changes = self._prepare(commits)
+        errors: Dict[str, str] = {}
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        async def reword(commit: CommitInfo):
+            file_changes = changes.get(commit.oid)
+            if not file_changes:
+                messages[commit.oid] = self._original_message(commit)
+            else:
+                async with semaphore:
+                    try:
+                        messages[commit.oid] = await generator.agenerate_commit_message(file_changes,
+                                                                                         raise_errors=True)
+                    except Exception as e:
+                        errors[commit.oid] = f"{type(e).__name__}: {e}"
+                        return
+            self.save_checkpoint(messages)
+            if on_message is not None:
+                on_message(commit, messages[commit.oid])
+        
+        try:
+            await asyncio.gather(*(reword(commit) for commit in pending))
+        finally:
+            await generator.pool.aclose()
+        return messages, errors
+    
+    def generate_batch(self, commits: List[CommitInfo], generator,
+                       on_status: Optional[Callable[[Dict[str, int]], None]] = None
+                       ) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """Like generate, but as one provider batch job; the checkpoint is
+        written once the job has ended"""
+        messages, pending, changes = self._prepare(commits)
+        changesets = {}
+        for commit in pending:
+            if changes.get(commit.oid):
+                changesets[commit.oid] = changes[commit.oid]
+            else:
+                messages[commit.oid] = self._original_message(commit)
+        generated, errors = generator.generate_batch(changesets, on_status=on_status)
+        messages.update(generated)
+        self.save_checkpoint(messages)
+        return messages, errors
+    
+    def rewrite(self, commits: List[CommitInfo], messages: Dict[str, str]) -> str:
+        """Recreate the range with the new messages and move the branch to
+        the result; returns the new head. The old head is kept as ORIG_HEAD."""
+        rewritten: Dict[str, str] = {}
+        in_cwd = {"cwd": self.analyzer.cwd} if self.analyzer.cwd else {}
+        for commit in commits:
+            args = ["git", "commit-tree", commit.tree]
+            for parent in commit.parents:
+                args += ["-p", rewritten.get(parent, parent)]
+            env = dict(os.environ, GIT_AUTHOR_NAME=commit.author_name, GIT_AUTHOR_EMAIL=commit.author_email,
+                       GIT_AUTHOR_DATE=commit.author_date)
+            try:
+                result = subprocess.run(args, input=messages[commit.oid].strip() + "\n", env=env,
+                                        capture_output=True, text=True, check=True, **in_cwd)
+            except subprocess.CalledProcessError as e:
+                raise RewordError(f"git commit-tree failed for {commit.oid[:7]}: {e.stderr.strip()}")
+            rewritten[commit.oid] = result.stdout.strip()
+        
+        new_head = rewritten[commits[-1].oid]
+        # Fails rather than clobbering the branch if it moved meanwhile
+        self._git(["update-ref", "-m", "gitme reword", self.ref, new_head, self.head])
+        self._git(["update-ref", "ORIG_HEAD", self.head])
+        self.clear_checkpoint()
+        return new_head
@@ -0,0 +1,120 @@
+"""Start generating commit messages before the user has finished answering.
+
+While `generate` waits on a prompt whose answer changes the diff (such as
+whether to add untracked files), each possible diff is sent to the model
+in the background. Once the answer is in, the matching generation is kept
+and its tokens are shown, and the others are cancelled.
+"""
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+
+class GenerationCancelled(BaseException):
+    """Raised inside a speculative generation that is no longer wanted. Not
+    an Exception, so the generator's own error handling does not turn it
+    into a fallback message."""
+
+
+class Candidate:
+    """One speculative generation: its diff, its buffered tokens and its
+    outcome"""
+    
+    def __init__(self, file_changes: Callable[[], Dict[str, str]]):
+        self._compute_changes = file_changes
+        self.file_changes: Optional[Dict[str, str]] = None
+        self.changes_ready = threading.Event()
+        self.done = threading.Event()
+        self.result: Optional[Tuple[str, bool]] = None
+        self.error: Optional[BaseException] = None
+        self._tokens = []
+        self._forward: Optional[Callable[[str], None]] = None
+        self._cancelled = False
+        self._lock = threading.Lock()
+    
+    def on_token(self, text: str) -> None:
+        with self._lock:
+            if self._cancelled:
+                # Unwinds the model call, which closes its stream
+                raise GenerationCancelled()
+            if self._forward is not None:
+                self._forward(text)
+            else:
+                self._tokens.append(text)
+    
+    def attach(self, on_token: Optional[Callable[[str], None]]) -> None:
+        """Show the tokens received so far, and the rest as they arrive"""
+        with self._lock:
+            self._forward = on_token or (lambda text: None)
+            for text in self._tokens:
+                self._forward(text)
+            self._tokens = []
+    
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancelled = True
+    
+    def run(self, generate: Callable) -> None:
+        try:
+            self.file_changes = self._compute_changes()
+        except Exception:
+            # Leaves nothing to match, so the caller generates normally
+            self.file_changes = None
+        self.changes_ready.set()
+        try:
+            if self.file_changes and not self._cancelled:
+                self.result = generate(self.file_changes, self.on_token)
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.done.set()
+
+
+class SpeculativeGeneration:
+    """Generates a message for each possible outcome of a prompt at once
+
+    generate(file_changes, on_token) returns (message, cache_hit) like a
+    normal generation. Each outcome is named by a key and given a function
+    computing its diff, which runs in the background too.
+    """
+    
+    def __init__(self, generate: Callable[[Dict[str, str], Callable[[str], None]], Tuple[str, bool]]):
+        self._generate = generate
+        self.candidates: Dict[str, Candidate] = {}
+    
+    def start(self, key: str, file_changes: Callable[[], Dict[str, str]]) -> None:
+        candidate = Candidate(file_changes)
+        self.candidates[key] = candidate
+        threading.Thread(target=candidate.run, args=(self._generate,), name=f"gitme-speculative-{key}",
+                         daemon=True).start()
+    
+    def wait_for_changes(self) -> None:
+        """Block until every outcome's diff is computed, so the analyzer is
+        free for the caller again"""
+        for candidate in self.candidates.values():
+            candidate.changes_ready.wait()
+    
+    def take(self, key: str, file_changes: Dict[str, str],
+             on_token: Optional[Callable[[str], None]] = None) -> Optional[Tuple[str, bool]]:
+        """The result for outcome key if it was generated from exactly
+        file_changes, else None; every other outcome is cancelled. Errors
+        from the generation are raised here."""
+        for other, candidate in self.candidates.items():
+            if other != key:
+                candidate.cancel()
+        candidate = self.candidates.get(key)
+        if candidate is None:
+            return None
+        candidate.changes_ready.wait()
+        if candidate.file_changes != file_changes:
+            # The diff moved while the prompt was open
+            candidate.cancel()
+            return None
+        candidate.attach(on_token)
+        candidate.done.wait()
+        if candidate.error is not None:
+            raise candidate.error
+        return candidate.result
+    
+    def cancel(self) -> None:
+        for candidate in self.candidates.values():
+            candidate.cancel()
@@ -0,0 +1,316 @@
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .blob_store import BlobStore
+from .storage import MessageStorage, canonical_repo_root, load_file_changes, store_files
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    repo_path TEXT NOT NULL,
+    message TEXT NOT NULL,
+    provider TEXT,
+    model TEXT,
+    file_changes TEXT,
+    files TEXT
+);
+CREATE INDEX IF NOT EXISTS messages_repo_time ON messages (repo_path, timestamp);
+CREATE INDEX IF NOT EXISTS messages_time ON messages (timestamp);
+CREATE TABLE IF NOT EXISTS message_files (
+    message_id INTEGER NOT NULL REFERENCES messages (id) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    blob TEXT
+);
+CREATE INDEX IF NOT EXISTS message_files_path ON message_files (path);
+CREATE INDEX IF NOT EXISTS message_files_message ON message_files (message_id, path);
+"""
+
+
+def _glob_escape(text: str) -> str:
+    return "".join(f"[{c}]" if c in "*?[" else c for c in text)
+
+
+class SQLiteMessageStorage:
+    """Message history in ~/.gitme/history.db
+
+    Entries are indexed by (repo_path, timestamp), file names by path, and
+    message text by trigrams through an FTS5 table when the sqlite build
+    has it. Same interface and results as MessageStorage: repository paths
+    are stored as their canonical root, and grep is a case-insensitive
+    substring match on the message, and each repository keeps its newest
+    max_entries entries. An existing JSON Lines history is imported on
+    first use, in full.
+    
+    Diffs go to the same blob store as the JSON Lines history; rows keep the
+    file list with blob keys and line counts. Rows written by older versions
+    still carry their diffs in the file_changes column.
+    """
+    
+    # Above this many entries touching a path, scan entries newest first
+    # rather than collecting every match up front
+    COMMON_FILE_MATCHES = 2000
+    
+    def __init__(self, storage_dir: Optional[Path] = None, max_entries: int = 100):
+        self.storage_dir = Path(storage_dir) if storage_dir else Path.home() / ".gitme"
+        self.db_file = self.storage_dir / "history.db"
+        self.max_entries = max_entries
+        self.blobs = BlobStore(self.storage_dir / "blobs")
+        self.storage_dir.mkdir(exist_ok=True)
+        self.conn = sqlite3.connect(self.db_file, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        # The same test as MessageStorage, so both backends match alike
+        self.conn.create_function("gitme_contains", 2, lambda text, needle: needle in (text or "").lower(),
+                                  deterministic=True)
+        self._upgrade_schema()
+        try:
+            with self.conn:
+                self._create_search_index()
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            # sqlite built without FTS5 or its trigram tokenizer; --grep scans
+            self.has_fts = False
+        self._import_log()
+    
+    def close(self) -> None:
+        self.conn.close()
+    
+    def save_message(self, message: str, repo_path: str, file_changes: Dict, provider: str = "anthropic", model: str = None) -> None:
+        from datetime import datetime
+        
+        entry = {
+            "timestamp": datetime.now().isoformat(),
+            "repo_path": canonical_repo_root(repo_path),
+            "message": message,
+            "files": store_files(self.blobs, file_changes),
+            "provider": provider,
+            "model": model
+        }
+        with self.conn:
+            self._insert([entry])
+            self._prune(entry["repo_path"])
+    
+    def import_messages(self, messages: Iterable[Dict]) -> None:
+        """Insert existing entries in one transaction, oldest first"""
+        messages = list(messages)
+        with self.conn:
+            self._insert(messages)
+            for repo_path in {m["repo_path"] for m in messages}:
+                self._prune(repo_path)
+    
+    def get_messages(self, repo_path: Optional[str] = None, limit: int = 10,
+                     grep: Optional[str] = None, file: Optional[str] = None, offset: int = 0,
+                     since: Optional[str] = None, until: Optional[str] = None) -> List[Dict]:
+        sql, params = self._select(repo_path, grep, file, since, until, paged=True)
+        rows = self.conn.execute(sql + " LIMIT ? OFFSET ?", params + [limit, offset]).fetchall()
+        return [self._entry(row) for row in reversed(rows)]
+    
+    def iter_messages(self, repo_path: Optional[str] = None, grep: Optional[str] = None,
+                      file: Optional[str] = None, since: Optional[str] = None,
+                      until: Optional[str] = None) -> Iterator[Dict]:
+        """Entries newest first, fetched from the cursor as they are consumed"""
+        sql, params = self._select(repo_path, grep, file, since, until, paged=False)
+        for row in self.conn.execute(sql, params):
+            yield self._entry(row)
+    
+    def _select(self, repo_path: Optional[str], grep: Optional[str], file: Optional[str],
+                since: Optional[str], until: Optional[str], paged: bool):
+        """Query for matching entries newest first, and its parameters; a
+        streamed (not paged) query always walks entries in time order"""
+        where = []
+        params: List = []
+        if repo_path:
+            where.append("repo_path = ?")
+            params.append(canonical_repo_root(repo_path))
+        if since:
+            where.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            where.append("timestamp < ?")
+            params.append(until)
+        if file:
+            file = file.rstrip("/")
+            file_params = [file, _glob_escape(file) + "/*"]
+            common = not paged or self.conn.execute(
+                "SELECT count(*) FROM (SELECT 1 FROM message_files WHERE path = ? OR path GLOB ? LIMIT ?)",
+                file_params + [self.COMMON_FILE_MATCHES]
+            ).fetchone()[0] >= self.COMMON_FILE_MATCHES
+            if common:
+                # Walking entries newest first stops as soon as enough are found
+                where.append("EXISTS (SELECT 1 FROM message_files WHERE message_id = messages.id "
+                             "AND (path = ? OR path GLOB ?))")
+            else:
+                # Few matches: look them up through the path index instead
+                where.append("id IN (SELECT message_id FROM message_files WHERE path = ? OR path GLOB ?)")
+            params += file_params
+        if grep:
+            needle = grep.lower()
+            if self.has_fts and len(needle) >= 3 and needle.isascii():
+                # Trigrams narrow the candidates; the exact test below decides.
+                # Shorter or non-ASCII needles are only checked by the scan
+                where.append("id IN (SELECT rowid FROM messages_search WHERE messages_search MATCH ?)")
+                params.append('"' + needle.replace('"', '""') + '"')
+            where.append("gitme_contains(message, ?)")
+            params.append(needle)
+        
+        sql = "SELECT timestamp, repo_path, message, provider, model, files, file_changes FROM messages"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return sql + " ORDER BY timestamp DESC, id DESC", params
+    
+    @staticmethod
+    def _entry(row) -> Dict:
+        timestamp, repo, text, provider, model, files, file_changes = row
+        entry = {"timestamp": timestamp, "repo_path": repo, "message": text}
+        if files is not None or not file_changes:
+            entry["files"] = json.loads(files) if files else []
+        else:
+            entry["file_changes"] = json.loads(file_changes)
+        # Entries imported from old history may have no provider/model
+        if provider is not None:
+            entry["provider"] = provider
+        if model is not None:
+            entry["model"] = model
+        return entry
+    
+    def clear_messages(self, repo_path: Optional[str] = None) -> None:
+        with self.conn:
+            if not repo_path:
+                self.conn.execute("DELETE FROM messages")
+                if self.has_fts:
+                    self.conn.execute("DELETE FROM messages_search")
+                self.blobs.collect_garbage([])
+                return
+            repo_path = canonical_repo_root(repo_path)
+            blobs = self._blobs_where("repo_path = ?", (repo_path,))
+            if self.has_fts:
+                self.conn.execute(
+                    "DELETE FROM messages_search WHERE rowid IN (SELECT id FROM messages WHERE repo_path = ?)",
+                    (repo_path,)
+                )
+            self.conn.execute("DELETE FROM messages WHERE repo_path = ?", (repo_path,))
+            self._drop_unreferenced(blobs)
+    
+    def load_file_changes(self, entry: Dict) -> Dict[str, str]:
+        return load_file_changes(self.blobs, entry)
+    
+    def _upgrade_schema(self) -> None:
+        """Add the blob columns to a database created by an older version"""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(messages)")}
+        if "files" not in columns:
+            self.conn.execute("ALTER TABLE messages ADD COLUMN files TEXT")
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(message_files)")}
+        if "blob" not in columns:
+            self.conn.execute("ALTER TABLE message_files ADD COLUMN blob TEXT")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS message_files_blob ON message_files (blob)")
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+            # Older versions stored repository paths as given
+            with self.conn:
+                for path, in self.conn.execute("SELECT DISTINCT repo_path FROM messages").fetchall():
+                    root = canonical_repo_root(path)
+                    if root != path:
+                        self.conn.execute("UPDATE messages SET repo_path = ? WHERE repo_path = ?", (root, path))
+                self.conn.execute("PRAGMA user_version = 1")
+    
+    def _create_search_index(self) -> None:
+        """Trigram index of message text, filled from the messages table when
+        it is new; replaces the word index of messages and file names that
+        older versions kept"""
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'messages_search'"
+        ).fetchone() is not None
+        self.conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS messages_search USING fts5(message, tokenize='trigram')")
+        if not exists:
+            self.conn.execute("DROP TABLE IF EXISTS messages_fts")
+            self.conn.execute("INSERT INTO messages_search (rowid, message) SELECT id, message FROM messages")
+    
+    def _insert(self, messages: Iterable[Dict]) -> None:
+        for m in messages:
+            files = m.get("files")
+            if files is None:
+                files = store_files(self.blobs, m.get("file_changes") or {})
+            cursor = self.conn.execute(
+                "INSERT INTO messages (timestamp, repo_path, message, provider, model, files) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (m["timestamp"], m["repo_path"], m["message"], m.get("provider"), m.get("model"),
+                 json.dumps(files))
+            )
+            self.conn.executemany(
+                "INSERT INTO message_files (message_id, path, blob) VALUES (?, ?, ?)",
+                [(cursor.lastrowid, f["path"], f["blob"]) for f in files]
+            )
+            if self.has_fts:
+                self.conn.execute(
+                    "INSERT INTO messages_search (rowid, message) VALUES (?, ?)", (cursor.lastrowid, m["message"])
+                )
+    
+    def _prune(self, repo_path: str) -> None:
+        """Drop a repository's oldest entries beyond max_entries (0 keeps
+        everything), as MessageStorage does per shard"""
+        if not self.max_entries:
+            return
+        row = self.conn.execute(
+            "SELECT id FROM messages WHERE repo_path = ? ORDER BY id DESC LIMIT 1 OFFSET ?",
+            (repo_path, self.max_entries)
+        ).fetchone()
+        if row is None:
+            return
+        params = (repo_path, row[0])
+        blobs = self._blobs_where("repo_path = ? AND id <= ?", params)
+        if self.has_fts:
+            self.conn.execute(
+                "DELETE FROM messages_search WHERE rowid IN (SELECT id FROM messages WHERE repo_path = ? AND id <= ?)",
+                params
+            )
+        self.conn.execute("DELETE FROM messages WHERE repo_path = ? AND id <= ?", params)
+        self._drop_unreferenced(blobs)
+    
+    def _blobs_where(self, condition: str, params) -> List[str]:
+        """Blob keys of the entries matching condition, before they are deleted"""
+        return [key for key, in self.conn.execute(
+            "SELECT DISTINCT blob FROM message_files WHERE blob IS NOT NULL AND message_id IN "
+            f"(SELECT id FROM messages WHERE {condition})", params
+        )]
+    
+    def _drop_unreferenced(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            if self.conn.execute("SELECT 1 FROM message_files WHERE blob = ? LIMIT 1", (key,)).fetchone() is None:
+                self.blobs.delete(key)
+    
+    def _import_log(self) -> None:
+        """Move an existing JSON Lines history into the database once"""
+        log = MessageStorage(self.storage_dir, max_entries=0)
+        if not log.shards_dir.exists():
+            return
+        messages = []
+        for key in log._read_index():
+            shard = log._shard(key)
+            for m in shard._load_messages():
+                # Left behind by an import that could not move the log away
+                if self.conn.execute(
+                    "SELECT 1 FROM messages WHERE repo_path = ? AND timestamp = ? AND message = ? LIMIT 1",
+                    (m["repo_path"], m["timestamp"], m["message"])
+                ).fetchone() is not None:
+                    continue
+                # The database keeps its own blobs
+                m = dict(m, file_changes=shard.load_file_changes(m))
+                m.pop("files", None)
+                messages.append(m)
+        messages.sort(key=lambda m: m["timestamp"])
+        # Not pruned: the log may hold up to twice max_entries per repository
+        # between compactions, and the next save trims its repository anyway
+        with self.conn:
+            self._insert(messages)
+        # An earlier switch back and forth may have left a .migrated log
+        target = log.shards_dir.with_name(log.shards_dir.name + ".migrated")
+        suffix = 1
+        while target.exists():
+            target = log.shards_dir.with_name(f"{log.shards_dir.name}.migrated.{suffix}")
+            suffix += 1
+        os.replace(log.shards_dir, target)
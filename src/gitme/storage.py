@@ -1,66 +1,599 @@
+import hashlib
+import heapq
 import json
 import os
-from datetime import datetime
+import threading
+import time
+from contextlib import contextmanager
+from itertools import islice
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional
 
+from .blob_store import BlobStore
 
-class MessageStorage:
-    def __init__(self):
-        self.storage_dir = Path.home() / ".gitme"
-        self.storage_file = self.storage_dir / "messages.json"
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks on Windows; saves are still single appends
+    fcntl = None
+
+
+def diff_stats(diff: str) -> Dict[str, int]:
+    """Added and removed line counts of a unified diff"""
+    added = removed = 0
+    for line in diff.splitlines():
+        if line.startswith("+") and not line.startswith("+++"):
+            added += 1
+        elif line.startswith("-") and not line.startswith("---"):
+            removed += 1
+    return {"added": added, "removed": removed}
+
+
+def store_files(blobs: BlobStore, file_changes: Dict[str, str]) -> List[Dict]:
+    """Move diffs into blobs, returning the per-file metadata kept in history"""
+    return [dict(path=path, blob=blobs.put(diff), **diff_stats(diff)) for path, diff in file_changes.items()]
+
+
+def entry_paths(entry: Dict) -> List[str]:
+    """Changed paths of an entry, old (inline diffs) or new (blob references)"""
+    if "files" in entry:
+        return [f["path"] for f in entry["files"]]
+    return list(entry.get("file_changes") or {})
+
+
+def externalize(blobs: BlobStore, entry: Dict) -> Dict:
+    """Entry with inline file_changes replaced by blob-backed metadata"""
+    if "file_changes" not in entry:
+        return entry
+    entry = dict(entry)
+    entry["files"] = store_files(blobs, entry.pop("file_changes") or {})
+    return entry
+
+
+def load_file_changes(blobs: BlobStore, entry: Dict) -> Dict[str, str]:
+    """Diffs of an entry by path, read from the blob store on demand"""
+    if "files" not in entry:
+        return entry.get("file_changes") or {}
+    return {f["path"]: blobs.get(f["blob"]) or "" for f in entry["files"]}
+
+
+def matches_file(paths, file: str) -> bool:
+    """Whether any of paths is file or lies under the directory file"""
+    file = file.rstrip("/")
+    return any(path == file or path.startswith(file + "/") for path in paths)
+
+
+@contextmanager
+def file_lock(lock_file: Path):
+    """Exclusive fcntl lock on lock_file; yields the seconds spent waiting"""
+    fd = os.open(lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        waited = 0.0
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                start = time.perf_counter()
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                waited = time.perf_counter() - start
+        yield waited
+    finally:
+        # Closing the descriptor releases the lock
+        os.close(fd)
+
+
+def canonical_repo_root(path: str) -> str:
+    """Top of the work tree containing path, with symlinks resolved; path
+    itself when it is not inside a repository"""
+    path = os.path.realpath(path)
+    current = path
+    while True:
+        if os.path.exists(os.path.join(current, ".git")):
+            return current
+        parent = os.path.dirname(current)
+        if parent == current:
+            return path
+        current = parent
+
+
+def repo_key(repo_root: str) -> str:
+    return hashlib.sha256(repo_root.encode("utf-8", errors="surrogateescape")).hexdigest()[:16]
+
+
+class HistoryLog:
+    """One append-only JSON Lines history log with its meta file, lock and blobs
+
+    Saving appends one line and fsyncs it, so earlier entries are never
+    rewritten by a save. Once the log holds twice max_entries, it is
+    compacted down to the newest max_entries (0 keeps everything).
+    
+    Diffs are not kept in the log: each entry lists its files with a blob
+    reference and line counts, and load_file_changes reads the diffs back.
+    
+    Several gitme processes can save at once: every change to the log, its
+    meta file and the blobs happens under an exclusive fcntl lock on
+    history.lock, and rewrites go through a temp file and rename. Lines that
+    cannot be parsed are moved to history.jsonl.corrupt instead of being
+    dropped by a rewrite.
+    """
+    
+    def __init__(self, storage_dir: Optional[Path] = None, max_entries: int = 100):
+        self.storage_dir = Path(storage_dir) if storage_dir else Path.home() / ".gitme"
+        self.history_file = self.storage_dir / "history.jsonl"
+        self.meta_file = self.storage_dir / "history_meta.json"
+        self.lock_file = self.storage_dir / "history.lock"
+        self.corrupt_file = self.storage_dir / "history.jsonl.corrupt"
+        # Whole-file JSON history written by older versions
+        self.legacy_file = self.storage_dir / "messages.json"
+        self.max_entries = max_entries
+        self.blobs = BlobStore(self.storage_dir / "blobs")
+        # Lock-wait metrics not yet folded into the totals in the meta file
+        self.lock_acquisitions = 0
+        self.lock_contended = 0
+        self.lock_wait_seconds = 0.0
+        self.lock_wait_max = 0.0
+        self._lock_depth = 0
+        self._thread_lock = threading.RLock()
         self._ensure_storage_dir()
+        self._migrate_legacy()
     
     def _ensure_storage_dir(self):
         self.storage_dir.mkdir(exist_ok=True)
     
-    def save_message(self, message: str, repo_path: str, file_changes: Dict, provider: str = "anthropic", model: str = None) -> None:
-        messages = self._load_messages()
+    def save_message(self, message: str, repo_path: str, file_changes: Dict, provider: str = "anthropic", model: str = None) -> Dict:
+        from datetime import datetime
         
-        entry = {
-            "timestamp": datetime.now().isoformat(),
-            "repo_path": repo_path,
-            "message": message,
-            "file_changes": file_changes,
-            "provider": provider,
-            "model": model
+        with self._locked():
+            entry = {
+                "timestamp": datetime.now().isoformat(),
+                "repo_path": repo_path,
+                "message": message,
+                "files": store_files(self.blobs, file_changes),
+                "provider": provider,
+                "model": model
+            }
+            
+            self._append_lines([json.dumps(entry) + "\n"])
+            
+            count = self._read_meta().get("entries", 0) + 1
+            if self.max_entries and count > 2 * self.max_entries:
+                self.compact()
+            else:
+                self._write_meta(count)
+        return entry
+    
+    def get_messages(self, repo_path: Optional[str] = None, limit: int = 10,
+                     grep: Optional[str] = None, file: Optional[str] = None, offset: int = 0,
+                     since: Optional[str] = None, until: Optional[str] = None) -> List[Dict]:
+        """Newest limit entries after skipping the newest offset, oldest first;
+        see iter_messages for the filters"""
+        return list(islice(self.iter_messages(repo_path, grep, file, since, until), offset, offset + limit))[::-1]
+    
+    def iter_messages(self, repo_path: Optional[str] = None, grep: Optional[str] = None,
+                      file: Optional[str] = None, since: Optional[str] = None,
+                      until: Optional[str] = None) -> Iterator[Dict]:
+        """Entries newest first, read from the end of the log as they are
+        consumed. grep matches message text (case-insensitive), file a
+        changed path or directory; since and until are ISO timestamps
+        bounding the entries to since <= timestamp < until."""
+        needle = grep.lower() if grep else None
+        for m in self._iter_reverse():
+            if since and m["timestamp"] < since:
+                # Entries are in save order, so the rest are older still
+                return
+            if until and m["timestamp"] >= until:
+                continue
+            if repo_path and m["repo_path"] != repo_path:
+                continue
+            if needle and needle not in m["message"].lower():
+                continue
+            if file and not matches_file(entry_paths(m), file):
+                continue
+            yield m
+    
+    def clear_messages(self, repo_path: Optional[str] = None) -> None:
+        with self._locked():
+            if not repo_path:
+                # Clear all messages
+                for path in (self.history_file, self.meta_file):
+                    if path.exists():
+                        path.unlink()
+                self.blobs.collect_garbage([])
+            else:
+                # Clear messages for specific repo
+                messages = self._load_for_rewrite()
+                self._rewrite([m for m in messages if m["repo_path"] != repo_path])
+                self._collect_garbage()
+    
+    def load_file_changes(self, entry: Dict) -> Dict[str, str]:
+        return load_file_changes(self.blobs, entry)
+    
+    def compact(self) -> None:
+        """Rewrite the log keeping only the newest max_entries entries"""
+        with self._locked():
+            messages = self._load_for_rewrite()
+            if self.max_entries:
+                messages = messages[-self.max_entries:]
+            self._rewrite(messages)
+            self._collect_garbage()
+    
+    def lock_stats(self) -> Dict[str, float]:
+        """Lock-wait totals over every process that has used this history"""
+        stats = dict(self._read_meta().get("lock", {}))
+        for name, value in self._pending_lock_stats().items():
+            stats[name] = max(stats.get(name, 0), value) if name == "max_wait_ms" else stats.get(name, 0) + value
+        return stats
+    
+    @contextmanager
+    def _locked(self):
+        """Hold the history lock; re-entrant within this instance"""
+        with self._thread_lock:
+            if self._lock_depth:
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                return
+            
+            with file_lock(self.lock_file) as waited:
+                if waited:
+                    self._record_wait(waited)
+                self.lock_acquisitions += 1
+                self._lock_depth = 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth = 0
+    
+    def _record_wait(self, seconds: float) -> None:
+        self.lock_contended += 1
+        self.lock_wait_seconds += seconds
+        self.lock_wait_max = max(self.lock_wait_max, seconds)
+    
+    def _pending_lock_stats(self) -> Dict[str, float]:
+        return {
+            "acquisitions": self.lock_acquisitions,
+            "contended": self.lock_contended,
+            "wait_ms": round(self.lock_wait_seconds * 1000, 3),
+            "max_wait_ms": round(self.lock_wait_max * 1000, 3),
         }
-        
-        messages.append(entry)
-        
-        # Keep only last 100 messages
-        if len(messages) > 100:
-            messages = messages[-100:]
-        
-        with open(self.storage_file, 'w') as f:
-            json.dump(messages, f, indent=2)
     
-    def get_messages(self, repo_path: Optional[str] = None, limit: int = 10) -> List[Dict]:
-        messages = self._load_messages()
+    def _collect_garbage(self) -> None:
+        """Drop blobs no remaining entry refers to"""
+        self.blobs.collect_garbage(
+            f["blob"] for m in self._load_messages() for f in m.get("files", [])
+        )
+    
+    def _append_lines(self, lines: List[str]) -> None:
+        data = "".join(lines).encode("utf-8")
+        fd = os.open(self.history_file, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            # Terminate a torn line left by an interrupted save so it cannot
+            # swallow this entry
+            size = os.fstat(fd).st_size
+            if size and os.pread(fd, 1, size - 1) != b"\n":
+                data = b"\n" + data
+            # One write per save so concurrent appends never interleave
+            written = os.write(fd, data)
+            while written < len(data):
+                written += os.write(fd, data[written:])
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    
+    def _rewrite(self, messages: List[Dict]) -> None:
+        tmp_file = self.history_file.with_name(self.history_file.name + f".{os.getpid()}.tmp")
+        with open(tmp_file, "w") as f:
+            for m in messages:
+                # Entries from older versions still carry their diffs inline
+                f.write(json.dumps(externalize(self.blobs, m)) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.history_file)
+        self._write_meta(len(messages))
+    
+    def _read_meta(self) -> Dict:
+        try:
+            with open(self.meta_file, "r") as f:
+                meta = json.load(f)
+            return meta if isinstance(meta, dict) else {}
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+    
+    def _write_meta(self, entries: int) -> None:
+        """Record the entry count and fold this instance's lock waits into
+        the stored totals; called with the lock held"""
+        meta = {"entries": entries, "lock": self.lock_stats()}
+        self.lock_acquisitions = self.lock_contended = 0
+        self.lock_wait_seconds = self.lock_wait_max = 0.0
+        tmp_file = self.meta_file.with_name(self.meta_file.name + f".{os.getpid()}.tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_file, self.meta_file)
+    
+    def _migrate_legacy(self) -> None:
+        """Move entries from messages.json into the log, keeping the old file
+        as messages.json.migrated"""
+        if not self.legacy_file.exists():
+            return
+        with self._locked():
+            # Another process may have migrated it while we waited
+            if not self.legacy_file.exists():
+                return
+            try:
+                with open(self.legacy_file, "r") as f:
+                    legacy = json.load(f)
+            except (json.JSONDecodeError, IOError):
+                # Leave an unreadable file alone rather than lose what is in it
+                return
+            if not isinstance(legacy, list):
+                return
+            
+            messages = [m for m in legacy if isinstance(m, dict)] + self._load_for_rewrite()
+            self._rewrite(messages)
+            os.replace(self.legacy_file, self.legacy_file.with_name(self.legacy_file.name + ".migrated"))
+    
+    def _load_for_rewrite(self) -> List[Dict]:
+        """Entries to carry into a rewrite; unreadable lines are kept aside
+        in history.jsonl.corrupt rather than lost"""
+        messages, bad_lines = self._read_log()
+        if bad_lines:
+            with open(self.corrupt_file, "a") as f:
+                f.writelines(line if line.endswith("\n") else line + "\n" for line in bad_lines)
+                f.flush()
+                os.fsync(f.fileno())
+        return messages
+    
+    def _load_messages(self) -> List[Dict]:
+        return self._read_log()[0]
+    
+    def _iter_reverse(self, block_size: int = 64 * 1024) -> Iterator[Dict]:
+        """Parsed entries from the last line of the log backwards"""
+        try:
+            f = open(self.history_file, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            pos = f.seek(0, os.SEEK_END)
+            tail = b""
+            while pos > 0:
+                size = min(block_size, pos)
+                pos -= size
+                f.seek(pos)
+                lines = (f.read(size) + tail).split(b"\n")
+                # The first piece may be the end of a line that starts in
+                # the previous block
+                tail = lines.pop(0)
+                for line in reversed(lines):
+                    entry = self._parse_line(line)
+                    if entry is not None:
+                        yield entry
+            entry = self._parse_line(tail)
+            if entry is not None:
+                yield entry
+    
+    @staticmethod
+    def _parse_line(line: bytes) -> Optional[Dict]:
+        if not line.strip():
+            return None
+        try:
+            entry = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            # A torn line from an interrupted save, or damage
+            return None
+        return entry if isinstance(entry, dict) else None
+    
+    def _read_log(self):
+        """Parsed entries and the raw lines that could not be parsed"""
+        messages, bad_lines = [], []
+        if not self.history_file.exists():
+            return messages, bad_lines
         
+        with open(self.history_file, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from an interrupted save, or damage
+                    bad_lines.append(line)
+                    continue
+                if isinstance(entry, dict):
+                    messages.append(entry)
+                else:
+                    bad_lines.append(line)
+        return messages, bad_lines
+
+
+class _NewestFirst:
+    """Heap item for merging shards: later timestamps pop first"""
+    
+    __slots__ = ("timestamp", "order", "source", "entry")
+    
+    def __init__(self, timestamp: str, order: int, source, entry: Optional[Dict]):
+        self.timestamp = timestamp
+        self.order = order
+        self.source = source
+        self.entry = entry
+    
+    def __lt__(self, other: "_NewestFirst") -> bool:
+        return (self.timestamp, other.order) > (other.timestamp, self.order)
+
+
+class MessageStorage:
+    """Message history sharded per repository under ~/.gitme/history
+
+    Each repository gets its own HistoryLog in history/<key>/, where key is
+    a hash of the canonical repository root (so a subdirectory or a symlinked
+    path lands in the same shard), and reads and writes for one repository
+    only touch that shard. history/index.json records every shard's
+    repository and newest timestamp; `show -r` uses it to visit shards
+    newest first and open a shard only once its entries could be next.
+    
+    A single history.jsonl (or messages.json) from an older version is split
+    into shards on first use and kept as history.jsonl.migrated.
+    """
+    
+    def __init__(self, storage_dir: Optional[Path] = None, max_entries: int = 100):
+        self.storage_dir = Path(storage_dir) if storage_dir else Path.home() / ".gitme"
+        self.shards_dir = self.storage_dir / "history"
+        self.index_file = self.shards_dir / "index.json"
+        self.index_lock_file = self.shards_dir / "index.lock"
+        self.max_entries = max_entries
+        self.storage_dir.mkdir(exist_ok=True)
+        self._migrate_global_log()
+    
+    def shard(self, repo_path: str) -> HistoryLog:
+        """History log of the repository containing repo_path"""
+        return self._shard(repo_key(canonical_repo_root(repo_path)))
+    
+    def save_message(self, message: str, repo_path: str, file_changes: Dict, provider: str = "anthropic", model: str = None) -> None:
+        repo_root = canonical_repo_root(repo_path)
+        key = repo_key(repo_root)
+        entry = self._shard(key).save_message(message, repo_root, file_changes, provider, model)
+        with self._index_locked() as index:
+            info = index.setdefault(key, {"repo_path": repo_root, "last_timestamp": ""})
+            info["last_timestamp"] = max(info["last_timestamp"], entry["timestamp"])
+    
+    def get_messages(self, repo_path: Optional[str] = None, limit: int = 10,
+                     grep: Optional[str] = None, file: Optional[str] = None, offset: int = 0,
+                     since: Optional[str] = None, until: Optional[str] = None) -> List[Dict]:
+        """Newest limit entries after skipping the newest offset, oldest first;
+        see HistoryLog.iter_messages for the filters"""
+        return list(islice(self.iter_messages(repo_path, grep, file, since, until), offset, offset + limit))[::-1]
+    
+    def iter_messages(self, repo_path: Optional[str] = None, grep: Optional[str] = None,
+                      file: Optional[str] = None, since: Optional[str] = None,
+                      until: Optional[str] = None) -> Iterator[Dict]:
+        """Entries newest first; without repo_path, merged across shards"""
+        if not self.shards_dir.exists():
+            return
         if repo_path:
-            messages = [m for m in messages if m["repo_path"] == repo_path]
+            yield from self.shard(repo_path).iter_messages(grep=grep, file=file, since=since, until=until)
+            return
         
-        return messages[-limit:]
+        # Unopened shards wait in the heap under their newest timestamp from
+        # the index, so a shard is only read once its entries could be next
+        heap = [_NewestFirst(info["last_timestamp"], order, key, None)
+                for order, (key, info) in enumerate(self._read_index().items())]
+        heapq.heapify(heap)
+        while heap:
+            item = heapq.heappop(heap)
+            if item.entry is not None:
+                yield item.entry
+                source = item.source
+            else:
+                source = self._shard(item.source).iter_messages(grep=grep, file=file, since=since, until=until)
+            entry = next(source, None)
+            if entry is not None:
+                heapq.heappush(heap, _NewestFirst(entry["timestamp"], item.order, source, entry))
     
     def clear_messages(self, repo_path: Optional[str] = None) -> None:
-        if not repo_path:
-            # Clear all messages
-            if self.storage_file.exists():
-                self.storage_file.unlink()
-        else:
-            # Clear messages for specific repo
-            messages = self._load_messages()
-            messages = [m for m in messages if m["repo_path"] != repo_path]
-            with open(self.storage_file, 'w') as f:
-                json.dump(messages, f, indent=2)
+        if not self.shards_dir.exists():
+            return
+        with self._index_locked() as index:
+            if repo_path:
+                key = repo_key(canonical_repo_root(repo_path))
+                self._shard(key).clear_messages()
+                index.pop(key, None)
+                return
+            for key in list(index):
+                self._shard(key).clear_messages()
+            index.clear()
     
-    def _load_messages(self) -> List[Dict]:
-        if not self.storage_file.exists():
-            return []
-        
+    def load_file_changes(self, entry: Dict) -> Dict[str, str]:
+        return self.shard(entry["repo_path"]).load_file_changes(entry)
+    
+    def compact(self) -> None:
+        for key in self._read_index():
+            self._shard(key).compact()
+    
+    def lock_stats(self) -> Dict[str, float]:
+        """Lock-wait totals summed over every shard"""
+        totals: Dict[str, float] = {}
+        for key in self._read_index():
+            for name, value in self._shard(key).lock_stats().items():
+                totals[name] = max(totals.get(name, 0), value) if name == "max_wait_ms" else totals.get(name, 0) + value
+        return totals
+    
+    def rebuild_index(self) -> Dict[str, Dict]:
+        """Recreate index.json from the shard directories"""
+        with self._index_locked() as index:
+            index.clear()
+            for shard_dir in self.shards_dir.iterdir():
+                if not shard_dir.is_dir():
+                    continue
+                messages = HistoryLog(shard_dir, max_entries=0).get_messages(limit=1)
+                if messages:
+                    index[shard_dir.name] = {"repo_path": messages[-1]["repo_path"],
+                                             "last_timestamp": messages[-1]["timestamp"]}
+            return dict(index)
+    
+    def _shard(self, key: str) -> HistoryLog:
+        self.shards_dir.mkdir(exist_ok=True)
+        return HistoryLog(self.shards_dir / key, self.max_entries)
+    
+    def _read_index(self) -> Dict[str, Dict]:
+        if not self.shards_dir.exists():
+            return {}
         try:
-            with open(self.storage_file, 'r') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            return []
\ No newline at end of file
+            with open(self.index_file, "r") as f:
+                index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            # Lost or damaged: the shards themselves are the source of truth
+            return self.rebuild_index()
+        return index if isinstance(index, dict) else self.rebuild_index()
+    
+    @contextmanager
+    def _index_locked(self):
+        """Yield the index for changing under the index lock; written back on exit"""
+        self.shards_dir.mkdir(exist_ok=True)
+        with file_lock(self.index_lock_file):
+            try:
+                with open(self.index_file, "r") as f:
+                    index = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                index = {}
+            if not isinstance(index, dict):
+                index = {}
+            yield index
+            tmp_file = self.index_file.with_name(self.index_file.name + f".{os.getpid()}.tmp")
+            with open(tmp_file, "w") as f:
+                json.dump(index, f)
+            os.replace(tmp_file, self.index_file)
+    
+    def _migrate_global_log(self) -> None:
+        """Split the single history log of older versions into shards"""
+        if not (self.storage_dir / "history.jsonl").exists() and not (self.storage_dir / "messages.json").exists():
+            return
+        # HistoryLog folds messages.json into history.jsonl first
+        log = HistoryLog(self.storage_dir, max_entries=0)
+        if not log.history_file.exists():
+            return
+        with log._locked():
+            if not log.history_file.exists():
+                return
+            by_shard: Dict[str, List[Dict]] = {}
+            for m in log._load_for_rewrite():
+                m = dict(m, repo_path=canonical_repo_root(m["repo_path"]))
+                if "files" in m:
+                    # Shards keep their own blobs, so carry the diffs inline
+                    # until the shard rewrite stores them again
+                    m["file_changes"] = log.load_file_changes(m)
+                    del m["files"]
+                by_shard.setdefault(repo_key(m["repo_path"]), []).append(m)
+            
+            with self._index_locked() as index:
+                for key, messages in by_shard.items():
+                    shard = self._shard(key)
+                    with shard._locked():
+                        shard._rewrite(shard._load_for_rewrite() + messages)
+                    info = index.setdefault(key, {"repo_path": messages[-1]["repo_path"], "last_timestamp": ""})
+                    info["last_timestamp"] = max([info["last_timestamp"]] + [m["timestamp"] for m in messages])
+            
+            os.replace(log.history_file, log.history_file.with_name(log.history_file.name + ".migrated"))
+            if log.meta_file.exists():
+                log.meta_file.unlink()
+            log.blobs.collect_garbage([])
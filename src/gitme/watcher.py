@@ -0,0 +1,324 @@
+"""Watch a worktree with inotify and keep its per-file diffs computed.
+
+Linux only: other platforms have no inotify, and Inotify() raises
+WatcherUnavailable there so callers can carry on without a watcher.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WORKTREE_EVENTS = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+                   | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR)
+
+# Files under .git whose change means the staged view or HEAD moved
+GIT_STATE_FILES = {"index", "HEAD", "packed-refs", "ORIG_HEAD", "MERGE_HEAD"}
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class WatcherUnavailable(Exception):
+    """inotify cannot be used here"""
+
+
+class Inotify:
+    """Minimal ctypes binding of the Linux inotify calls"""
+    
+    def __init__(self):
+        name = ctypes.util.find_library("c")
+        try:
+            libc = ctypes.CDLL(name, use_errno=True)
+            self._add_watch = libc.inotify_add_watch
+            self._rm_watch = libc.inotify_rm_watch
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        except (OSError, AttributeError, TypeError):
+            raise WatcherUnavailable("inotify is not available on this platform")
+        if fd < 0:
+            raise WatcherUnavailable(os.strerror(ctypes.get_errno()))
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = fd
+    
+    def add_watch(self, path: str, mask: int) -> int:
+        """Watch descriptor for path, or -1 if it cannot be watched (gone,
+        not a directory, or out of watches)"""
+        return self._add_watch(self.fd, os.fsencode(path), mask)
+    
+    def rm_watch(self, wd: int) -> None:
+        self._rm_watch(self.fd, wd)
+    
+    def wait(self, timeout: Optional[float]) -> bool:
+        """Whether events are queued within timeout seconds"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        return bool(ready)
+    
+    def read_events(self, timeout: Optional[float]) -> List[Tuple[int, int, str]]:
+        """(watch descriptor, mask, name) for events within timeout seconds"""
+        if not self.wait(timeout):
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        pos = 0
+        while pos + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, pos)
+            pos += _EVENT_HEADER.size
+            name = os.fsdecode(data[pos:pos + length].rstrip(b"\0"))
+            pos += length
+            events.append((wd, mask, name))
+        return events
+    
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class DiffWatcher:
+    """Keeps a worktree's staged and unstaged per-file diffs computed
+
+    Watches every directory of the worktree that the ignore rules do not
+    exclude, plus the index and refs under .git. Events on ignored paths
+    are dropped with the same rules get_untracked_files uses (tracked files
+    always count). A burst of events is debounced: diffs are recomputed once
+    the worktree has been quiet for `debounce` seconds, or `max_delay`
+    seconds after the first event at the latest. Recomputing goes through
+    the analyzer, so its DiffCache is filled as well.
+    """
+    
+    def __init__(self, analyzer, worktree: str, debounce: float = 0.3, max_delay: float = 3.0,
+                 on_update: Optional[Callable[[], None]] = None, lock: Optional[threading.Lock] = None):
+        self.analyzer = analyzer
+        self.worktree = os.path.realpath(worktree)
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.on_update = on_update
+        self.events = 0
+        self.ignored_events = 0
+        self.recomputes = 0
+        self.last_duration = 0.0
+        self._inotify = Inotify()
+        self._watches: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        # Held while reading and applying events, so a request can drain
+        # the queue itself without racing the watcher thread
+        self._events_lock = threading.Lock()
+        # Debounce window: first and latest relevant event not yet recomputed
+        self._first: Optional[float] = None
+        self._last: Optional[float] = None
+        # Held while recomputing, for an analyzer that others use too
+        self._analyzer_lock = lock or threading.Lock()
+        self._results: Dict[str, object] = {}
+        # Bumped by every relevant event; results are only valid for the
+        # generation they were computed in
+        self._generation = 0
+        self._computed_generation = -1
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._ignore = self._open_ignore_matcher()
+        self._tracked = self._load_tracked()
+    
+    def _open_ignore_matcher(self):
+        from .git_objects import IgnoreMatcher, open_repository
+        repository = open_repository(self.worktree)
+        return IgnoreMatcher(repository) if repository is not None else None
+    
+    def _load_tracked(self) -> set:
+        """Tracked paths and the directories holding them; ignore rules do
+        not apply to either"""
+        if self._ignore is None:
+            return set()
+        from .git_objects import GitObjectError
+        try:
+            index = self._ignore.repository.index()
+        except (GitObjectError, OSError):
+            return set()
+        tracked = set(index)
+        for path in index:
+            parts = path.split("/")
+            for depth in range(1, len(parts)):
+                tracked.add("/".join(parts[:depth]))
+        return tracked
+    
+    def _is_ignored(self, path: str, is_dir: bool) -> bool:
+        if path in self._tracked:
+            return False
+        if self._ignore is None:
+            # Without an in-process reader only .git itself is skipped
+            return path == ".git" or path.startswith(".git/")
+        return self._ignore.is_ignored(path, is_dir)
+    
+    def start(self) -> "DiffWatcher":
+        self._watch_tree(self.worktree, "")
+        git_dir = os.path.join(self.worktree, ".git")
+        if os.path.isdir(git_dir):
+            self._add(git_dir, ".git")
+            refs = os.path.join(git_dir, "refs", "heads")
+            for directory, _dirs, _files in os.walk(refs):
+                self._add(directory, ".git/" + os.path.relpath(directory, git_dir).replace(os.sep, "/"))
+        self._thread = threading.Thread(target=self._run, name="gitme-watcher", daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self) -> None:
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._inotify.close()
+    
+    def wait_stopped(self) -> None:
+        """Block until stop() is called"""
+        while not self._stop.wait(1.0):
+            pass
+    
+    def snapshot(self, kind: str):
+        """Precomputed result for kind ("staged", "all" or "untracked"), or
+        None when something changed since it was computed"""
+        with self._lock:
+            if self._computed_generation != self._generation:
+                return None
+            return self._results.get(kind)
+    
+    def wait_until_fresh(self, timeout: float) -> bool:
+        """Block until the diffs reflect every event queued so far, including
+        ones the watcher thread has not read yet; False on timeout"""
+        deadline = time.monotonic() + timeout
+        self._drain()
+        while time.monotonic() < deadline:
+            with self._lock:
+                if self._computed_generation == self._generation:
+                    return True
+            time.sleep(0.01)
+        return False
+    
+    def _add(self, path: str, relative: str) -> None:
+        wd = self._inotify.add_watch(path, WORKTREE_EVENTS)
+        if wd >= 0:
+            self._watches[wd] = relative
+    
+    def _watch_tree(self, path: str, relative: str) -> None:
+        self._add(path, relative)
+        try:
+            with os.scandir(path) as it:
+                children = [entry for entry in it if entry.is_dir(follow_symlinks=False)]
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            return
+        for child in children:
+            child_relative = f"{relative}/{child.name}" if relative else child.name
+            if child.name == ".git" or self._is_ignored(child_relative, True):
+                continue
+            self._watch_tree(child.path, child_relative)
+    
+    def _handle(self, wd: int, mask: int, name: str) -> bool:
+        """Apply one event; True when it can change what gitme sees"""
+        if mask & IN_Q_OVERFLOW:
+            # Events were lost, so assume anything changed
+            return True
+        directory = self._watches.get(wd)
+        if directory is None:
+            return False
+        if mask & IN_IGNORED:
+            del self._watches[wd]
+            return False
+        if directory == ".git" or directory.startswith(".git/"):
+            if directory == ".git" and name not in GIT_STATE_FILES:
+                return False
+            if name.endswith(".lock"):
+                return False
+            if name == "index":
+                self._tracked = self._load_tracked()
+            return True
+        path = f"{directory}/{name}" if directory and name else (name or directory)
+        is_dir = bool(mask & IN_ISDIR)
+        if name == ".gitignore" and self._ignore is not None:
+            self._ignore.invalidate()
+        if self._is_ignored(path, is_dir):
+            return False
+        if is_dir and mask & (IN_CREATE | IN_MOVED_TO):
+            self._watch_tree(os.path.join(self.worktree, path), path)
+        return True
+    
+    def _drain(self) -> None:
+        """Apply every queued event and mark the diffs stale if one mattered"""
+        with self._events_lock:
+            relevant = False
+            while True:
+                events = self._inotify.read_events(0)
+                if not events:
+                    break
+                for wd, mask, name in events:
+                    self.events += 1
+                    if self._handle(wd, mask, name):
+                        relevant = True
+                    else:
+                        self.ignored_events += 1
+            if relevant:
+                with self._lock:
+                    self._generation += 1
+                self._last = time.monotonic()
+                if self._first is None:
+                    self._first = self._last
+    
+    def _due(self) -> Optional[float]:
+        """When the pending recompute is due, or None if nothing is pending"""
+        if self._first is None:
+            return None
+        return min(self._last + self.debounce, self._first + self.max_delay)
+    
+    def _run(self) -> None:
+        # Compute once up front so the first gitme run is already served
+        self._recompute()
+        while not self._stop.is_set():
+            with self._events_lock:
+                due = self._due()
+            self._inotify.wait(0.5 if due is None else max(0.0, due - time.monotonic()))
+            self._drain()
+            with self._events_lock:
+                due = self._due()
+                if due is not None and time.monotonic() >= due:
+                    self._first = self._last = None
+                else:
+                    due = None
+            if due is not None:
+                self._recompute()
+    
+    def _recompute(self) -> None:
+        with self._lock:
+            generation = self._generation
+        start = time.monotonic()
+        with self._analyzer_lock:
+            # The event may be younger than the analyzer's status snapshot
+            self.analyzer.invalidate_status()
+            results = {
+                "staged": self.analyzer.get_file_changes(staged_only=True, single_pass=True),
+                "all": self.analyzer.get_file_changes(staged_only=False, single_pass=True),
+                "untracked": self.analyzer.get_untracked_files(),
+            }
+        self.last_duration = time.monotonic() - start
+        self.recomputes += 1
+        with self._lock:
+            self._results = results
+            self._computed_generation = generation
+        if self.on_update is not None:
+            self.on_update()
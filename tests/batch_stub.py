@@ -0,0 +1,166 @@
+"""Local stand-in for the Anthropic Message Batches and OpenAI Batch endpoints.
+
+Point a client at it with base_url (or ANTHROPIC_BASE_URL / OPENAI_BASE_URL
+for the whole CLI). Every job ends after `polls` status checks, and each
+prompt is answered by `reply`, where None makes that request fail.
+
+    python -m tests.batch_stub 8765
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+
+def default_reply(prompt: str) -> Optional[str]:
+    """'Update <files>' from the File: lines of a commit message prompt"""
+    files = re.findall(r"^File: (.+)$", prompt, re.MULTILINE)
+    return "Update " + ", ".join(files) if files else "Update files"
+
+
+class BatchStubServer:
+    """Serves both providers' batch endpoints on a local port"""
+    
+    def __init__(self, reply: Callable[[str], Optional[str]] = default_reply, polls: int = 2, port: int = 0):
+        self.reply = reply
+        self.polls = polls
+        self.batches: Dict[str, Dict] = {}
+        self.files: Dict[str, str] = {}
+        self.cancelled = []
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+    
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+    
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def _handler(self):
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+            
+            def _send(self, payload, content_type="application/json"):
+                body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def _body(self) -> bytes:
+                return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            
+            def do_POST(self):
+                body = self._body()
+                if self.path == "/v1/messages/batches":
+                    self._send(stub._create_anthropic(json.loads(body)["requests"]))
+                elif self.path == "/v1/files":
+                    self._send(stub._upload(body))
+                elif self.path == "/v1/batches":
+                    self._send(stub._create_openai(json.loads(body)))
+                elif self.path.endswith("/cancel"):
+                    batch_id = self.path.split("/")[-2]
+                    stub.cancelled.append(batch_id)
+                    self._send(stub._status(batch_id, poll=False))
+                else:
+                    self.send_error(404)
+            
+            def do_GET(self):
+                parts = self.path.strip("/").split("/")
+                if parts[:3] == ["v1", "messages", "batches"] and len(parts) == 4:
+                    self._send(stub._status(parts[3]))
+                elif parts[:3] == ["v1", "messages", "batches"] and parts[-1] == "results":
+                    self._send(stub.batches[parts[3]]["results"].encode(), "application/binary")
+                elif parts[:2] == ["v1", "batches"] and len(parts) == 3:
+                    self._send(stub._status(parts[2]))
+                elif parts[:2] == ["v1", "files"] and parts[-1] == "content":
+                    self._send(stub.files[parts[2]].encode(), "application/jsonl")
+                else:
+                    self.send_error(404)
+        
+        return Handler
+    
+    def _create_anthropic(self, requests) -> Dict:
+        batch_id = f"msgbatch_{len(self.batches) + 1}"
+        lines = []
+        for request in requests:
+            text = self.reply(request["params"]["messages"][0]["content"])
+            if text is None:
+                result = {"type": "errored", "error": {"type": "error", "error": {
+                    "type": "overloaded_error", "message": "Overloaded"}}}
+            else:
+                result = {"type": "succeeded", "message": {
+                    "id": "msg_stub", "type": "message", "role": "assistant", "model": request["params"]["model"],
+                    "content": [{"type": "text", "text": text}], "stop_reason": "end_turn",
+                    "stop_sequence": None, "usage": {"input_tokens": 1, "output_tokens": 1}}}
+            lines.append(json.dumps({"custom_id": request["custom_id"], "result": result}))
+        self.batches[batch_id] = {"provider": "anthropic", "requests": requests, "polls": 0,
+                                  "results": "\n".join(lines) + "\n"}
+        return self._status(batch_id, poll=False)
+    
+    def _upload(self, body: bytes) -> Dict:
+        # The JSONL file is the only part of the multipart body made of JSON lines
+        content = "\n".join(line for line in body.decode().splitlines() if line.startswith("{"))
+        file_id = f"file-{len(self.files) + 1}"
+        self.files[file_id] = content
+        return {"id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                "filename": "batch.jsonl", "purpose": "batch", "status": "processed"}
+    
+    def _create_openai(self, params) -> Dict:
+        batch_id = f"batch_{len(self.batches) + 1}"
+        requests = [json.loads(line) for line in self.files[params["input_file_id"]].splitlines()]
+        output, errors = [], []
+        for request in requests:
+            text = self.reply(request["body"]["messages"][0]["content"])
+            if text is None:
+                errors.append(json.dumps({"custom_id": request["custom_id"], "response": {
+                    "status_code": 429, "body": {"error": {"message": "Rate limit reached"}}}, "error": None}))
+            else:
+                output.append(json.dumps({"custom_id": request["custom_id"], "response": {
+                    "status_code": 200, "body": {"choices": [{"index": 0, "message": {
+                        "role": "assistant", "content": text}}]}}, "error": None}))
+        batch = {"provider": "openai", "requests": requests, "polls": 0, "params": params}
+        for kind, lines in (("output", output), ("error", errors)):
+            if lines:
+                file_id = f"file-{len(self.files) + 1}"
+                self.files[file_id] = "\n".join(lines) + "\n"
+                batch[f"{kind}_file_id"] = file_id
+        self.batches[batch_id] = batch
+        return self._status(batch_id, poll=False)
+    
+    def _status(self, batch_id: str, poll: bool = True) -> Dict:
+        batch = self.batches[batch_id]
+        if poll:
+            batch["polls"] += 1
+        ended = batch["polls"] >= self.polls
+        total = len(batch["requests"])
+        if batch["provider"] == "anthropic":
+            return {"id": batch_id, "type": "message_batch", "processing_status": "ended" if ended else "in_progress",
+                    "request_counts": {"processing": 0 if ended else total, "succeeded": total if ended else 0,
+                                       "errored": 0, "canceled": 0, "expired": 0},
+                    "created_at": "2025-01-01T00:00:00Z", "expires_at": "2025-01-02T00:00:00Z",
+                    "ended_at": "2025-01-01T00:01:00Z" if ended else None, "cancel_initiated_at": None,
+                    "archived_at": None,
+                    "results_url": f"{self.url}/v1/messages/batches/{batch_id}/results" if ended else None}
+        return {"id": batch_id, "object": "batch", "endpoint": "/v1/chat/completions", "errors": None,
+                "input_file_id": batch["params"]["input_file_id"], "completion_window": "24h",
+                "status": "completed" if ended else "in_progress",
+                "output_file_id": batch.get("output_file_id") if ended else None,
+                "error_file_id": batch.get("error_file_id") if ended else None,
+                "created_at": int(time.time()),
+                "request_counts": {"total": total, "completed": total if ended else 0, "failed": 0}}
+
+
+if __name__ == "__main__":
+    import sys
+    with BatchStubServer(port=int(sys.argv[1]) if len(sys.argv) > 1 else 8765) as server:
+        print(f"Batch stub listening on {server.url}")
+        threading.Event().wait()
@@ -0,0 +1,32 @@
+import shutil
+import subprocess
+import pytest
+
+
+requires_git = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+
+def git(cwd, *args):
+    return subprocess.run(["git"] + list(args), cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+@pytest.fixture(autouse=True)
+def home(tmp_path_factory, monkeypatch):
+    """A fresh HOME for every test, so nothing reaches the real ~/.gitme or
+    the user's git config"""
+    home = tmp_path_factory.mktemp("home")
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+    return home
+
+
+@pytest.fixture
+def init_repo():
+    """Turns a directory into an empty repository with a committer set"""
+    def init(path, *args):
+        path.mkdir(parents=True, exist_ok=True)
+        git(path, "init", "-q", *args)
+        git(path, "config", "user.email", "test@example.com")
+        git(path, "config", "user.name", "Test")
+        return path
+    return init
@@ -0,0 +1,155 @@
+import asyncio
+import os
+import pytest
+from unittest.mock import patch, MagicMock
+from click.testing import CliRunner
+
+from gitme.batch import BatchResult, collect_all, find_repositories, format_summary, generate_all, submit_all
+from gitme.cli import batch
+from gitme.config import Config
+from tests.conftest import git, requires_git
+
+
+@pytest.fixture
+def checkouts(tmp_path, init_repo):
+    root = tmp_path / "services"
+    for name in ("billing", "search", "team/auth", "clean"):
+        repo = init_repo(root / name)
+        (repo / "requirements.txt").write_text("requests==2.31.0\n")
+        git(repo, "add", "-A")
+        git(repo, "commit", "-q", "-m", "initial")
+        if name != "clean":
+            (repo / "requirements.txt").write_text("requests==2.32.3\n")
+    (root / "node_modules" / "pkg" / ".git").mkdir(parents=True)
+    (root / "docs").mkdir()
+    return root
+
+
+class FakeGenerator:
+    """Async generator that records how many generations overlap"""
+    
+    def __init__(self):
+        self.pool = MagicMock()
+        self.pool.aclose = MagicMock(side_effect=lambda: asyncio.sleep(0))
+        self.in_flight = 0
+        self.peak = 0
+    
+    async def agenerate_commit_message(self, file_changes, raise_errors=False):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return "Bump " + ", ".join(sorted(file_changes))
+
+
+@requires_git
+class TestBatch:
+    def test_find_repositories(self, checkouts):
+        repos = find_repositories(str(checkouts))
+        
+        assert [os.path.relpath(repo, checkouts) for repo in repos] == ["billing", "clean", "search", "team/auth"]
+        assert find_repositories(str(checkouts), max_depth=1) == repos[:3]
+    
+    def test_collect_all_in_processes(self, checkouts):
+        repos = find_repositories(str(checkouts))
+        
+        results = collect_all(repos, staged_only=False, config=Config(), jobs=2)
+        
+        assert [sorted(result.file_changes) for result in results] == [["requirements.txt"], [],
+                                                                       ["requirements.txt"], ["requirements.txt"]]
+        assert "+requests==2.32.3" in results[0].file_changes["requirements.txt"]
+        assert all(result.error is None and result.collect_seconds > 0 for result in results)
+    
+    def test_staged_only_sees_nothing_unstaged(self, checkouts):
+        results = collect_all(find_repositories(str(checkouts)), staged_only=True, config=Config(), jobs=1)
+        
+        assert [result.status for result in results] == ["no changes"] * 4
+    
+    def test_commit_each_repository(self, checkouts):
+        generator = FakeGenerator()
+        with patch('gitme.cli.CommitMessageGenerator', return_value=generator), \
+                patch('gitme.cli.MessageStorage') as mock_storage:
+            result = CliRunner().invoke(batch, [str(checkouts), '--commit', '-j', '2'])
+        
+        assert result.exit_code == 0, result.output
+        assert "Bump requirements.txt" in result.output
+        assert "3 committed, 1 no changes" in result.output
+        for name in ("billing", "search", "team/auth"):
+            assert git(checkouts / name, "log", "-1", "--format=%s").strip() == "Bump requirements.txt"
+            assert git(checkouts / name, "status", "--porcelain") == ""
+        assert mock_storage.return_value.save_message.call_count == 3
+
+
+class TestGenerateAll:
+    def test_bounded_in_flight(self):
+        results = []
+        for i in range(10):
+            result = BatchResult(f"/repos/r{i}")
+            result.file_changes = {f"f{i}.py": "diff"}
+            results.append(result)
+        skipped = BatchResult("/repos/clean")
+        generator = FakeGenerator()
+        done = []
+        
+        asyncio.run(generate_all(results + [skipped], generator, max_in_flight=3, on_done=done.append))
+        
+        assert generator.peak == 3
+        assert len(done) == 10
+        assert results[4].message == "Bump f4.py"
+        assert skipped.message is None
+        generator.pool.aclose.assert_called_once()
+    
+    @patch('gitme.llm_client.AsyncAnthropic')
+    def test_failed_generation_is_an_error(self, mock_async_class, capsys):
+        from unittest.mock import AsyncMock
+        from gitme.llm_client import ClientPool, CommitMessageGenerator
+        mock_async_class.return_value.messages.create = AsyncMock(side_effect=RuntimeError("401 invalid x-api-key"))
+        mock_async_class.return_value.close = AsyncMock()
+        generator = CommitMessageGenerator(api_key='key', pool=ClientPool())
+        result = BatchResult("/repos/a")
+        result.file_changes = {"a.py": "diff"}
+        
+        asyncio.run(generate_all([result], generator))
+        
+        assert result.status == "error"
+        assert result.message is None
+        assert "401 invalid x-api-key" in result.error
+        assert "Update files" not in capsys.readouterr().out
+    
+    def test_submit_all_as_one_batch_job(self):
+        results = [BatchResult("/repos/a"), BatchResult("/repos/b"), BatchResult("/repos/clean")]
+        results[0].file_changes = {"a.py": "diff"}
+        results[1].file_changes = {"b.py": "diff"}
+        generator = MagicMock()
+        generator.generate_batch.return_value = ({"/repos/a": "Bump a.py"}, {"/repos/b": "overloaded_error: Overloaded"})
+        
+        submit_all(results, generator)
+        
+        changesets = generator.generate_batch.call_args[0][0]
+        assert changesets == {"/repos/a": {"a.py": "diff"}, "/repos/b": {"b.py": "diff"}}
+        assert [result.status for result in results] == ["generated", "error", "no changes"]
+    
+    def test_submit_all_failed_job(self):
+        from gitme.llm_client import BatchJobError
+        result = BatchResult("/repos/a")
+        result.file_changes = {"a.py": "diff"}
+        generator = MagicMock()
+        generator.generate_batch.side_effect = BatchJobError("batch msgbatch_1 expired")
+        
+        submit_all([result], generator)
+        
+        assert result.error == "batch msgbatch_1 expired"
+    
+    def test_summary_table(self):
+        ok = BatchResult("/repos/billing")
+        ok.file_changes = {"a": "diff"}
+        ok.message = "Bump"
+        ok.collect_seconds, ok.generate_seconds = 0.05, 1.25
+        failed = BatchResult("/repos/team/auth")
+        failed.error = "not a git work tree"
+        
+        lines = format_summary([ok, failed], "/repos")
+        
+        assert lines[0].split() == ["Repository", "Files", "Collect", "Generate", "Result"]
+        assert lines[2].split() == ["billing", "1", "0.05s", "1.25s", "generated"]
+        assert lines[3].endswith("error: not a git work tree")
@@ -0,0 +1,40 @@
+import zlib
+from unittest.mock import patch
+
+from gitme import blob_store
+from gitme.blob_store import BlobStore
+
+
+class TestBlobStore:
+    """Test the compressed content-addressed blob store."""
+    
+    def test_roundtrip_and_dedup(self, tmp_path):
+        store = BlobStore(tmp_path)
+        text = "diff --git a/x b/x\n" + "+line\n" * 100
+        
+        key = store.put(text)
+        
+        assert key == BlobStore.key(text)
+        assert store.put(text) == key
+        assert list(store.keys()) == [key]
+        assert store.get(key) == text
+    
+    def test_zlib_when_zstandard_missing(self, tmp_path):
+        store = BlobStore(tmp_path)
+        with patch.object(blob_store, "_zstd", return_value=None):
+            key = store.put("+hello\n" * 50)
+        
+        path = tmp_path / key[:2] / (key[2:] + ".z")
+        assert zlib.decompress(path.read_bytes()) == b"+hello\n" * 50
+        assert path.stat().st_size < 50 * 7
+    
+    def test_missing_blob(self, tmp_path):
+        assert BlobStore(tmp_path).get("0" * 64) is None
+    
+    def test_collect_garbage(self, tmp_path):
+        store = BlobStore(tmp_path)
+        keep = store.put("keep")
+        store.put("drop")
+        
+        assert store.collect_garbage([keep]) == 1
+        assert list(store.keys()) == [keep]
@@ -1,6 +1,8 @@
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, ANY
 import os
+import subprocess
+import sys
 from click.testing import CliRunner
 from gitme.cli import cli, generate
 
@@ -11,6 +13,12 @@ class TestCLI:
     def setup_method(self):
         """Set up test fixtures."""
         self.runner = CliRunner()
+        # Never hand the work to a daemon that happens to be running
+        self.no_daemon = patch('gitme.cli.connect_daemon', return_value=None)
+        self.no_daemon.start()
+    
+    def teardown_method(self):
+        self.no_daemon.stop()
     
     def test_cli_version(self):
         """Test version flag."""
@@ -57,6 +65,31 @@ class TestCLI:
             mock_generator_class.assert_called_once()
             mock_generator.generate_commit_message.assert_called_once()
     
+    @patch('gitme.cli.GitDiffAnalyzer')
+    @patch('gitme.cli.CommitMessageGenerator')
+    @patch('gitme.cli.MessageStorage')
+    def test_generate_streams_tokens(self, mock_storage, mock_generator_class, mock_analyzer_class):
+        """Test streamed tokens are printed once, without repeating the message."""
+        mock_analyzer = MagicMock()
+        mock_analyzer.git_available = True
+        mock_analyzer.in_git_repo = True
+        mock_analyzer.get_untracked_files.return_value = []
+        mock_analyzer.get_file_changes.return_value = {'test.py': 'diff content'}
+        mock_analyzer_class.return_value = mock_analyzer
+        
+        def fake_generate(file_changes, on_token=None):
+            for token in ["Streamed ", "commit ", "message"]:
+                on_token(token)
+            return "Streamed commit message"
+        mock_generator_class.return_value.generate_commit_message.side_effect = fake_generate
+        
+        with patch.dict(os.environ, {'ANTHROPIC_API_KEY': 'test-key'}):
+            result = self.runner.invoke(generate, ['--no-cache'])
+            
+            assert result.exit_code == 0
+            assert result.output.count('Generated commit message:') == 1
+            assert result.output.count('Streamed commit message') == 1
+    
     @patch('gitme.cli.GitDiffAnalyzer')
     @patch('gitme.cli.CommitMessageGenerator')
     @patch('gitme.cli.MessageStorage')
@@ -85,7 +118,10 @@ class TestCLI:
             # Verify OpenAI class method was used
             mock_generator_class.generate_commit_message_openai.assert_called_once_with(
                 file_changes={'test.py': 'diff content'},
-                model='gpt-4o-mini'  # Default should switch to OpenAI model
+                model='gpt-4o-mini',  # Default should switch to OpenAI model
+                cache=ANY,
+                on_token=ANY,
+                config=ANY
             )
     
     @patch('gitme.cli.GitDiffAnalyzer')
@@ -115,7 +151,10 @@ class TestCLI:
             # Verify custom model was used
             mock_generator_class.generate_commit_message_openai.assert_called_once_with(
                 file_changes={'test.py': 'diff content'},
-                model='gpt-4'
+                model='gpt-4',
+                cache=ANY,
+                on_token=ANY,
+                config=ANY
             )
     
     @patch('gitme.cli.GitDiffAnalyzer')
@@ -263,4 +302,168 @@ class TestCLI:
             mock_subprocess.assert_called_with(
                 ['git', 'commit', '-a', '-m', 'Auto commit message'],
                 check=True
-            )
\ No newline at end of file
+            )
+    
+    @patch('gitme.cli.GitDiffAnalyzer')
+    @patch('gitme.cli.CommitMessageGenerator')
+    @patch('gitme.cli.MessageStorage')
+    @pytest.mark.parametrize('answer, expected', [('y', 'Add new module'), ('n', 'Fix test')])
+    def test_generate_speculates_on_untracked_prompt(self, mock_storage, mock_generator_class, mock_analyzer_class,
+                                                     answer, expected):
+        """Test both answers to the untracked prompt are generated up front."""
+        without = {'test.py': 'diff content'}
+        with_new = {'test.py': 'diff content', 'new.py': 'new file'}
+        mock_analyzer = MagicMock()
+        mock_analyzer.git_available = True
+        mock_analyzer.in_git_repo = True
+        mock_analyzer.get_untracked_files.return_value = ['new.py']
+        mock_analyzer.get_file_changes.return_value = without
+        mock_analyzer.get_file_changes_with_untracked.return_value = with_new
+        mock_analyzer_class.return_value = mock_analyzer
+        mock_generator_class.return_value.generate_commit_message.side_effect = \
+            lambda changes, on_token=None: 'Add new module' if 'new.py' in changes else 'Fix test'
+        
+        def git_add(args, check):
+            mock_analyzer.get_file_changes.return_value = with_new
+        
+        with patch('subprocess.run', side_effect=git_add) as mock_run, \
+                patch.dict(os.environ, {'ANTHROPIC_API_KEY': 'test-key'}):
+            result = self.runner.invoke(generate, input=answer + '\n')
+        
+        assert result.exit_code == 0
+        assert expected in result.output
+        # At most one generation per possible answer, none after the prompt
+        assert mock_generator_class.return_value.generate_commit_message.call_count <= 2
+        mock_analyzer.get_file_changes_with_untracked.assert_called_once_with(['new.py'], True)
+        assert mock_run.called == (answer == 'y')
+    
+    @patch('gitme.cli.GitDiffAnalyzer')
+    @patch('gitme.cli.CommitMessageGenerator')
+    @patch('gitme.cli.MessageStorage')
+    def test_generate_through_daemon(self, mock_storage, mock_generator_class, mock_analyzer_class):
+        """Test a running daemon does the diffing and generation."""
+        client = MagicMock()
+        client.request.side_effect = lambda op, **params: {
+            'probe': {'git_available': True, 'in_git_repo': True},
+            'untracked': {'files': []},
+            'file_changes': {'file_changes': {'test.py': 'diff content'}},
+        }[op]
+        client.generate.return_value = ('Daemon message', True)
+        
+        with patch('gitme.cli.connect_daemon', return_value=client):
+            result = self.runner.invoke(generate, ['--no-cache'])
+        
+        assert result.exit_code == 0
+        assert 'Daemon message' in result.output
+        assert 'Reused a cached message' in result.output
+        client.generate.assert_called_once_with(
+            {'test.py': 'diff content'}, 'anthropic', 'claude-haiku-4-5', use_cache=False, on_token=ANY
+        )
+        mock_analyzer_class.assert_not_called()
+        mock_generator_class.assert_not_called()
+    
+    @patch('gitme.cli.GitDiffAnalyzer')
+    @patch('gitme.cli.CommitMessageGenerator')
+    @patch('gitme.cli.MessageStorage')
+    def test_generate_falls_back_when_daemon_stops(self, mock_storage, mock_generator_class, mock_analyzer_class):
+        """Test generation moves in-process if the daemon drops mid-run."""
+        from gitme.daemon import DaemonError
+        client = MagicMock()
+        client.request.side_effect = lambda op, **params: {
+            'probe': {'git_available': True, 'in_git_repo': True},
+            'untracked': {'files': []},
+            'file_changes': {'file_changes': {'test.py': 'diff content'}},
+        }[op]
+        client.generate.side_effect = DaemonError('gone')
+        mock_generator_class.return_value.generate_commit_message.return_value = 'Local message'
+        
+        with patch('gitme.cli.connect_daemon', return_value=client), \
+                patch.dict(os.environ, {'ANTHROPIC_API_KEY': 'test-key'}):
+            result = self.runner.invoke(generate)
+        
+        assert result.exit_code == 0
+        assert 'Local message' in result.output
+        mock_generator_class.assert_called_once()
+    
+    @patch('gitme.cli.MessageStorage')
+    def test_show_grep_and_file(self, mock_storage):
+        """Test show passes search filters to the history store."""
+        mock_storage.return_value.get_messages.return_value = [{
+            'timestamp': '2024-01-01T12:00:00',
+            'repo_path': '/repo',
+            'message': 'Fix auth bug',
+            'file_changes': {'auth.py': 'diff'},
+            'provider': 'anthropic',
+            'model': 'claude-haiku-4-5'
+        }]
+        
+        result = self.runner.invoke(cli, ['show', '-r', '--grep', 'auth', '--file', 'auth.py'])
+        
+        assert result.exit_code == 0
+        assert 'Fix auth bug' in result.output
+        mock_storage.return_value.get_messages.assert_called_once_with(
+            None, 10, grep='auth', file='auth.py', offset=0, since=None, until=None
+        )
+    
+    @patch('gitme.cli.MessageStorage')
+    def test_show_page_and_dates(self, mock_storage):
+        """Test --page/--offset become an offset and dates become ISO bounds."""
+        mock_storage.return_value.get_messages.return_value = [{
+            'timestamp': '2024-01-05T12:00:00',
+            'repo_path': '/repo',
+            'message': 'Older change',
+            'files': [{'path': 'a.py', 'blob': 'x', 'added': 1, 'removed': 0}],
+        }]
+        
+        result = self.runner.invoke(cli, ['show', '-r', '-n', '5', '--page', '3', '--offset', '1',
+                                          '--since', '2024-01-01', '--until', '2024-01-31'])
+        
+        assert result.exit_code == 0
+        assert '[12]' in result.output
+        assert 'Files changed:' in result.output
+        mock_storage.return_value.get_messages.assert_called_once_with(
+            None, 5, grep=None, file=None, offset=11,
+            since='2024-01-01T00:00:00', until='2024-02-01T00:00:00'
+        )
+    
+    @patch('gitme.cli.MessageStorage')
+    def test_show_rejects_bad_date(self, mock_storage, tmp_path, monkeypatch):
+        # Default config, so show opens the patched JSON Lines store
+        monkeypatch.setenv('HOME', str(tmp_path))
+        result = self.runner.invoke(cli, ['show', '--since', 'last week'])
+        
+        assert result.exit_code != 0
+        assert 'expected a date' in result.output
+    
+    @patch('gitme.cli.MessageStorage')
+    def test_show_pager_streams_entries(self, mock_storage):
+        """Test --pager renders entries lazily from iter_messages."""
+        entries = ({'timestamp': f'2024-01-01T12:00:{59 - i:02d}', 'repo_path': '/repo', 'message': f'm{i}'}
+                   for i in range(50))
+        mock_storage.return_value.iter_messages.return_value = entries
+        
+        result = self.runner.invoke(cli, ['show', '--pager', '--offset', '2'])
+        
+        assert result.exit_code == 0
+        assert '[3]' in result.output and 'm2' in result.output
+        assert '[50]' in result.output and 'm49' in result.output
+        assert 'm1\n' not in result.output
+        mock_storage.return_value.get_messages.assert_not_called()
+
+class TestStartupImports:
+    """The provider SDKs must only load when a message is generated."""
+    
+    def test_cli_import_skips_heavy_modules(self):
+        code = (
+            "import sys, gitme.cli; "
+            "print(' '.join(m for m in ('anthropic', 'openai', 'asyncio', 'gitme.git_objects') if m in sys.modules))"
+        )
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        
+        assert result.stdout.strip() == ""
+    
+    def test_sdk_loads_on_first_use(self):
+        code = "import sys, gitme.llm_client as m; m.Anthropic; print('anthropic' in sys.modules)"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        
+        assert result.stdout.strip() == "True"
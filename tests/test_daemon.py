@@ -0,0 +1,185 @@
+import pytest
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+from gitme.daemon import DaemonClient, DaemonError, GitmeDaemon, RemoteAnalyzer
+from tests.conftest import git, requires_git
+
+
+@pytest.fixture
+def repo(tmp_path, init_repo):
+    init_repo(tmp_path)
+    (tmp_path / "a.txt").write_text("one\n")
+    git(tmp_path, "add", "a.txt")
+    git(tmp_path, "commit", "-q", "-m", "first")
+    (tmp_path / "a.txt").write_text("one\ntwo\n")
+    git(tmp_path, "add", "a.txt")
+    (tmp_path / "new.txt").write_text("new\n")
+    return tmp_path
+
+
+@pytest.fixture
+def daemon():
+    # The daemon reads its config and keeps its DiffCache under ~/.gitme,
+    # which the home fixture points at a temporary directory
+    # Unix socket paths are limited to ~100 bytes, so keep this one short
+    socket_dir = tempfile.mkdtemp(prefix="gitme")
+    server = GitmeDaemon(Path(socket_dir) / "d.sock")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    with patch("gitme.daemon.GitmeDaemon._warm_up"):
+        thread.start()
+        client = DaemonClient(server.path, timeout=10)
+        for _ in range(200):
+            if server.path.exists() and client.alive():
+                break
+            threading.Event().wait(0.01)
+        yield server, client
+        if client.alive():
+            client.shutdown()
+        thread.join(5)
+    shutil.rmtree(socket_dir, ignore_errors=True)
+
+
+class TestDaemon:
+    def test_ping_and_status(self, daemon):
+        server, client = daemon
+        
+        assert client.request("ping")["version"]
+        status = client.status()
+        assert status["requests"] >= 2
+        assert status["repositories"] == []
+    
+    @requires_git
+    def test_serves_git_state_from_a_warm_analyzer(self, daemon, repo):
+        server, client = daemon
+        
+        probe = client.request("probe", cwd=str(repo))
+        untracked = client.request("untracked", cwd=str(repo))
+        changes = client.request("file_changes", cwd=str(repo), staged_only=True)
+        client.request("file_changes", cwd=str(repo), staged_only=True)
+        
+        assert probe == {"git_available": True, "in_git_repo": True}
+        assert untracked["files"] == ["new.txt"]
+        assert list(changes["file_changes"]) == ["a.txt"]
+        assert "+two" in changes["file_changes"]["a.txt"]
+        # One analyzer for the directory, probed once
+        assert len(server._analyzers) == 1
+        assert client.status()["repositories"] == [str(repo.resolve())]
+    
+    @requires_git
+    def test_file_changes_with_untracked(self, daemon, repo):
+        server, client = daemon
+        
+        changes = client.request("file_changes", cwd=str(repo), staged_only=True, untracked=["new.txt"])
+        
+        assert sorted(changes["file_changes"]) == ["a.txt", "new.txt"]
+        assert client.request("untracked", cwd=str(repo))["files"] == ["new.txt"]
+    
+    @requires_git
+    def test_watched_repository_is_answered_from_the_snapshot(self, daemon, repo):
+        server, client = daemon
+        config = MagicMock()
+        config.get.side_effect = lambda key, default=None: {"watch": True, "watch_debounce": 0.05}.get(key, default)
+        
+        with patch("gitme.daemon.Config", return_value=config):
+            client.request("probe", cwd=str(repo))
+            watcher = next(iter(server._watchers.values()))
+            if watcher is None:
+                pytest.skip("inotify is not available")
+            assert watcher.wait_until_fresh(5)
+            analyzer = next(iter(server._analyzers.values()))[0]
+            with patch.object(analyzer, "get_file_changes", side_effect=AssertionError("recomputed")):
+                changes = client.request("file_changes", cwd=str(repo), staged_only=True)
+            
+            assert list(changes["file_changes"]) == ["a.txt"]
+            assert client.status()["watched"][0]["recomputes"] >= 1
+    
+    @requires_git
+    def test_watched_repository_sees_a_change_staged_just_before(self, daemon, repo):
+        server, client = daemon
+        config = MagicMock()
+        config.get.side_effect = lambda key, default=None: {"watch": True, "watch_debounce": 0.05}.get(key, default)
+        
+        with patch("gitme.daemon.Config", return_value=config):
+            client.request("probe", cwd=str(repo))
+            watcher = next(iter(server._watchers.values()))
+            if watcher is None:
+                pytest.skip("inotify is not available")
+            assert watcher.wait_until_fresh(5)
+            (repo / "b.txt").write_text("b\n")
+            git(repo, "add", "b.txt")
+            changes = client.request("file_changes", cwd=str(repo), staged_only=True)
+        
+        assert sorted(changes["file_changes"]) == ["a.txt", "b.txt"]
+    
+    def test_generate_streams_tokens(self, daemon):
+        server, client = daemon
+        generator = MagicMock()
+        
+        def generate(file_changes, on_token=None):
+            for token in ("Add ", "feature"):
+                on_token(token)
+            return "Add feature"
+        generator.generate_commit_message.side_effect = generate
+        tokens = []
+        
+        with patch("gitme.llm_client.CommitMessageGenerator", return_value=generator) as generator_class:
+            message, cache_hit = client.generate({"a.py": "+x"}, "anthropic", "claude-haiku-4-5",
+                                                 use_cache=False, on_token=tokens.append)
+        
+        assert message == "Add feature"
+        assert tokens == ["Add ", "feature"]
+        assert cache_hit is False
+        assert generator_class.call_args.kwargs["model"] == "claude-haiku-4-5"
+        assert generator_class.call_args.kwargs["cache"] is None
+    
+    def test_missing_api_key_is_raised_as_value_error(self, daemon):
+        server, client = daemon
+        
+        with patch("gitme.llm_client.CommitMessageGenerator", side_effect=ValueError("API key is required")):
+            with pytest.raises(ValueError, match="API key is required"):
+                client.generate({"a.py": "+x"})
+    
+    def test_refuses_to_replace_a_running_daemon(self, daemon):
+        server, client = daemon
+        
+        with pytest.raises(RuntimeError):
+            GitmeDaemon(server.path)._claim_socket()
+    
+    def test_stale_socket_is_replaced(self, tmp_path):
+        path = Path(tempfile.mkdtemp(prefix="gitme")) / "d.sock"
+        path.write_text("")
+        
+        GitmeDaemon(path)._claim_socket()
+        
+        assert not path.exists()
+
+
+class TestClient:
+    def test_connect_without_daemon(self, tmp_path):
+        config = MagicMock()
+        config.get.return_value = str(tmp_path / "missing.sock")
+        
+        assert DaemonClient.connect(config) is None
+    
+    def test_unreachable_daemon_raises_daemon_error(self, tmp_path):
+        with pytest.raises(DaemonError):
+            DaemonClient(tmp_path / "missing.sock").request("ping")
+    
+    def test_remote_analyzer_falls_back_to_local(self):
+        client = MagicMock()
+        client.request.side_effect = [{"git_available": True, "in_git_repo": True}, DaemonError("gone")]
+        local = MagicMock()
+        local.get_untracked_files.return_value = ["x.py"]
+        local.get_file_changes.return_value = {"a.py": "diff"}
+        
+        analyzer = RemoteAnalyzer(client, "/repo", lambda: local)
+        
+        assert analyzer.in_git_repo is True
+        assert analyzer.get_untracked_files() == ["x.py"]
+        assert analyzer.get_file_changes(staged_only=False) == {"a.py": "diff"}
+        local.get_file_changes.assert_called_once_with(False, False)
+        assert client.request.call_count == 2
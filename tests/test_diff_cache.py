@@ -0,0 +1,106 @@
+import os
+import pytest
+from unittest.mock import patch
+
+from gitme.diff_cache import DiffCache
+from gitme.git_diff import GitDiffAnalyzer
+from tests.conftest import git, requires_git
+
+
+class TestDiffCache:
+    def test_get_put_and_counters(self, tmp_path):
+        cache = DiffCache(tmp_path)
+        key = cache.key("a" * 40, "b" * 40, "100644", "100644", "f.py", "f.py")
+        
+        assert cache.get(key) is None
+        cache.put(key, "diff --git a/f.py b/f.py")
+        assert cache.get(key) == "diff --git a/f.py b/f.py"
+        assert (cache.hits, cache.misses) == (1, 1)
+    
+    def test_key_depends_on_blobs_and_options(self, tmp_path):
+        cache = DiffCache(tmp_path)
+        base = cache.key("a" * 40, "b" * 40, "100644", "100644", "f.py", "f.py", "x")
+        
+        assert base != cache.key("a" * 40, "c" * 40, "100644", "100644", "f.py", "f.py", "x")
+        assert base != cache.key("a" * 40, "b" * 40, "100644", "100755", "f.py", "f.py", "x")
+        assert base != cache.key("a" * 40, "b" * 40, "100644", "100644", "f.py", "f.py", "y")
+    
+    def test_evicts_least_recently_used(self, tmp_path):
+        cache = DiffCache(tmp_path, max_bytes=250)
+        keys = [cache.key(str(i), "", "", "", "", "") for i in range(3)]
+        for i, key in enumerate(keys):
+            cache.put(key, "x" * 100)
+            path = cache._path(key)
+            os.utime(path, ns=(i * 10**9, i * 10**9))
+        # Reading the oldest entry makes it the most recently used one
+        cache.get(keys[0])
+        
+        cache.evict()
+        
+        assert cache.get(keys[0]) is not None
+        assert cache.get(keys[1]) is None
+        assert cache.get(keys[2]) is not None
+        assert cache.size() == 200
+    
+    def test_flush_accumulates_stats(self, tmp_path):
+        cache = DiffCache(tmp_path)
+        cache.get("0" * 64)
+        assert cache.flush() == {"hits": 0, "misses": 1}
+        
+        cache = DiffCache(tmp_path)
+        cache.put("1" * 64, "patch")
+        cache.get("1" * 64)
+        assert cache.flush() == {"hits": 1, "misses": 1}
+    
+    def test_concurrent_puts_of_one_key(self, tmp_path):
+        from concurrent.futures import ThreadPoolExecutor
+        cache = DiffCache(tmp_path)
+        
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(lambda i: cache.put("2" * 64, "patch"), range(100)))
+        
+        assert cache.get("2" * 64) == "patch"
+        assert cache.size() == 5
+
+
+@requires_git
+class TestCachedFileChanges:
+    @pytest.fixture
+    def repo(self, tmp_path, monkeypatch, init_repo):
+        init_repo(tmp_path)
+        for name in ("a.txt", "b.txt", "c.txt"):
+            (tmp_path / name).write_text(f"{name}\n")
+        git(tmp_path, "add", "-A")
+        git(tmp_path, "commit", "-q", "-m", "initial")
+        (tmp_path / "a.txt").write_text("changed a\n")
+        (tmp_path / "b.txt").write_text("changed b\n")
+        git(tmp_path, "add", "a.txt")
+        monkeypatch.chdir(tmp_path)
+        return tmp_path
+    
+    @pytest.mark.parametrize("staged_only", [True, False])
+    def test_matches_uncached_diff(self, repo, tmp_path_factory, staged_only):
+        cache = DiffCache(tmp_path_factory.mktemp("cache"))
+        expected = GitDiffAnalyzer().get_file_changes(staged_only, single_pass=True)
+        
+        for _ in range(2):
+            analyzer = GitDiffAnalyzer(diff_cache=cache)
+            assert analyzer.get_file_changes(staged_only) == expected
+    
+    def test_only_new_blob_pairs_are_diffed(self, repo, tmp_path_factory):
+        cache = DiffCache(tmp_path_factory.mktemp("cache"))
+        GitDiffAnalyzer(diff_cache=cache).get_file_changes(staged_only=False)
+        
+        analyzer = GitDiffAnalyzer(diff_cache=cache)
+        with patch.object(analyzer, '_get_file_changes_single_pass') as mock_diff:
+            result = analyzer.get_file_changes(staged_only=False)
+            mock_diff.assert_not_called()
+        assert sorted(result) == ["a.txt", "b.txt"]
+        
+        (repo / "c.txt").write_text("changed c\n")
+        analyzer = GitDiffAnalyzer(diff_cache=cache)
+        with patch.object(analyzer, '_get_file_changes_single_pass', wraps=analyzer._get_file_changes_single_pass) as mock_diff:
+            result = analyzer.get_file_changes(staged_only=False)
+            mock_diff.assert_called_once_with(False, ["c.txt"])
+        assert sorted(result) == ["a.txt", "b.txt", "c.txt"]
+        assert cache.total_stats() == {"hits": 4, "misses": 3}
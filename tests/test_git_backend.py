@@ -0,0 +1,63 @@
+import pytest
+import subprocess
+from unittest.mock import patch, MagicMock
+
+from gitme.git_backend import SubprocessBackend
+from tests.conftest import git, requires_git
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch, init_repo):
+    init_repo(tmp_path)
+    (tmp_path / "a.txt").write_text("one\n")
+    git(tmp_path, "add", "a.txt")
+    git(tmp_path, "commit", "-q", "-m", "first")
+    (tmp_path / "a.txt").write_text("one\ntwo\n")
+    (tmp_path / "b.txt").write_text("bee\n")
+    git(tmp_path, "add", "a.txt", "b.txt")
+    git(tmp_path, "commit", "-q", "-m", "second")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+class TestSubprocessBackend:
+    def test_counts_forks(self):
+        backend = SubprocessBackend()
+        mock_result = MagicMock()
+        mock_result.stdout = "output\n"
+        
+        with patch('subprocess.run', return_value=mock_result):
+            backend.check_git()
+            backend.check_repo()
+            assert backend.run(["status"]) == "output"
+        
+        assert backend.forks == 3
+    
+    @requires_git
+    def test_diff_commits_matches_diff_commit(self, repo):
+        backend = SubprocessBackend()
+        head = backend.run(["rev-parse", "HEAD"])
+        first = backend.run(["rev-parse", "HEAD~1"])
+        
+        patches = list(backend.diff_commits([(first, None), (head, first)]))
+        
+        assert patches == [(first, backend.diff_commit(first)), (head, backend.diff_commit(head))]
+        # Two rev-parses, one diff-tree for the pair, two diff_commit calls
+        assert backend.forks == 5
+
+
+@requires_git
+class TestStream:
+    def test_stream_kills_git_when_consumer_stops(self, repo):
+        (repo / "a.txt").write_text("x" * 200000 + "\n" + "line\n" * 100000)
+        backend = SubprocessBackend()
+        stream = backend.stream(["diff"], chunk_size=1024)
+        
+        first = next(stream)
+        second = next(stream)
+        with patch('builtins.print') as mock_print:
+            stream.close()
+        
+        assert first.startswith("diff --git")
+        assert len(second) <= 1024
+        mock_print.assert_not_called()
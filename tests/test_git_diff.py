@@ -2,7 +2,9 @@ import pytest
 from unittest.mock import patch, MagicMock, call
 import subprocess
 import json
-from gitme.git_diff import GitDiffAnalyzer
+from gitme.diff_cache import DiffCache
+from gitme.git_diff import GitDiffAnalyzer, StatusSnapshot, TRUNCATED_MARKER, iter_file_patches
+from tests.conftest import git, requires_git
 
 
 class TestGitDiffAnalyzer:
@@ -89,6 +91,7 @@ class TestGitDiffAnalyzer:
                 ["git", "status"],
                 capture_output=True,
                 text=True,
+                errors="replace",
                 check=True
             )
     
@@ -236,4 +239,259 @@ class TestGitDiffAnalyzer:
         
         with patch.object(analyzer, 'get_file_changes', return_value={}):
             result = analyzer.format_changes_json()
-            assert result == "{}"
\ No newline at end of file
+            assert result == "{}"
+    
+    def test_get_file_changes_single_pass(self):
+        analyzer = GitDiffAnalyzer()
+        diff_lines = [
+            "diff --git a/file1.py b/file1.py\n",
+            "index 1111111..2222222 100644\n",
+            "--- a/file1.py\n",
+            "+++ b/file1.py\n",
+            "@@ -1 +1 @@\n",
+            "-old\n",
+            "+new\n",
+            "diff --git a/file2.py b/file2.py\n",
+            "new file mode 100644\n",
+            "index 0000000..3333333\n",
+            "--- /dev/null\n",
+            "+++ b/file2.py\n",
+            "@@ -0,0 +1 @@\n",
+            "+added\n",
+        ]
+        
+        with patch.object(analyzer, '_stream_git_command', return_value=iter(diff_lines)) as mock_stream:
+            result = analyzer.get_file_changes(staged_only=True, single_pass=True)
+            
+            mock_stream.assert_called_once_with(["-c", "core.quotePath=false", "diff", "--staged"])
+            assert list(result) == ["file1.py", "file2.py"]
+            assert result["file1.py"].startswith("diff --git a/file1.py b/file1.py")
+            assert result["file1.py"].endswith("+new")
+            assert result["file2.py"].endswith("+added")
+    
+    def test_iter_file_patches_special_headers(self):
+        diff_lines = [
+            "diff --git a/old.py b/new.py\n",
+            "similarity index 100%\n",
+            "rename from old.py\n",
+            "rename to new.py\n",
+            "diff --git a/gone.py b/gone.py\n",
+            "deleted file mode 100644\n",
+            "--- a/gone.py\n",
+            "+++ /dev/null\n",
+            "@@ -1 +0,0 @@\n",
+            "-bye\n",
+            "diff --git a/my file.bin b/my file.bin\n",
+            "index 4444444..5555555 100644\n",
+            "Binary files a/my file.bin and b/my file.bin differ\n",
+            "diff --git \"a/tab\\tname\" \"b/tab\\tname\"\n",
+            "old mode 100644\n",
+            "new mode 100755\n",
+        ]
+        
+        names = [name for name, _ in iter_file_patches(diff_lines)]
+        assert names == ["new.py", "gone.py", "my file.bin", "tab\tname"]
+    
+    def test_iter_file_patches_per_file_budget(self):
+        diff_lines = [
+            "diff --git a/big.txt b/big.txt\n",
+            "--- a/big.txt\n",
+            "+++ b/big.txt\n",
+            "@@ -1,3 +1,3 @@\n",
+        ] + [f"+line {i}\n" for i in range(100)] + [
+            "diff --git a/small.txt b/small.txt\n",
+            "--- a/small.txt\n",
+            "+++ b/small.txt\n",
+            "@@ -1 +1 @@\n",
+            "+tiny\n",
+        ]
+        
+        result = dict(iter_file_patches(diff_lines, max_file_bytes=40))
+        
+        assert result["big.txt"].endswith("+line 2\n" + TRUNCATED_MARKER)
+        assert "+line 3" not in result["big.txt"]
+        assert result["small.txt"].endswith("+tiny")
+    
+    def test_iter_file_patches_total_budget_stops_reading(self):
+        consumed = []
+        
+        def lines():
+            for i in range(3):
+                for line in [f"diff --git a/f{i} b/f{i}\n", f"--- a/f{i}\n", f"+++ b/f{i}\n",
+                             "@@ -1 +1 @@\n", "+" + "x" * 50 + "\n"]:
+                    consumed.append(line)
+                    yield line
+        
+        result = dict(iter_file_patches(lines(), max_total_bytes=160))
+        
+        assert list(result) == ["f0", "f1"]
+        assert result["f1"].endswith(TRUNCATED_MARKER)
+        assert len(consumed) == 10
+    
+    def test_iter_file_patches_long_line_chunks(self):
+        chunks = [
+            "diff --git a/min.js b/min.js\n",
+            "@@ -1 +1 @@\n",
+            "+" + "a" * 10,
+            "diff --git not a header",
+            "\n",
+        ]
+        
+        result = dict(iter_file_patches(chunks))
+        
+        assert list(result) == ["min.js"]
+        assert result["min.js"].endswith("diff --git not a header")
+    
+    def test_single_pass_closes_stream_when_budget_runs_out(self):
+        analyzer = GitDiffAnalyzer(max_total_bytes=10)
+        stream = MagicMock()
+        stream.__iter__.return_value = iter([
+            "diff --git a/f b/f\n", "@@ -1 +1 @@\n", "+" + "x" * 100 + "\n",
+        ])
+        
+        with patch.object(analyzer, '_stream_git_command', return_value=stream):
+            result = analyzer.get_file_changes(single_pass=True)
+        
+        assert result["f"].endswith(TRUNCATED_MARKER)
+        stream.close.assert_called_once()
+
+
+@requires_git
+class TestFileChangesWithUntracked:
+    def test_matches_changes_after_git_add(self, tmp_path, init_repo):
+        init_repo(tmp_path)
+        (tmp_path / "a.txt").write_text("one\n")
+        git(tmp_path, "add", "a.txt")
+        git(tmp_path, "commit", "-q", "-m", "first")
+        (tmp_path / "a.txt").write_text("one\ntwo\n")
+        git(tmp_path, "add", "a.txt")
+        (tmp_path / "new.py").write_text("print('new')\n")
+        (tmp_path / "pkg").mkdir()
+        (tmp_path / "pkg" / "mod.py").write_text("x = 1\n")
+        analyzer = GitDiffAnalyzer(cwd=str(tmp_path))
+        untracked = analyzer.get_untracked_files()
+        
+        staged = analyzer.get_file_changes_with_untracked(untracked, staged_only=True)
+        everything = analyzer.get_file_changes_with_untracked(untracked, staged_only=False)
+        
+        # The real index is untouched
+        assert analyzer.get_untracked_files() == untracked
+        git(tmp_path, "add", "--", *untracked)
+        assert staged == analyzer.get_file_changes(staged_only=True, single_pass=True)
+        assert everything == analyzer.get_file_changes(staged_only=False, single_pass=True)
+        assert sorted(staged) == ["a.txt", "new.py", "pkg/mod.py"]
+
+
+class TestStatusSnapshot:
+    OUTPUT = "\0".join([
+        "1 M. N... 100644 100644 100644 " + "a" * 40 + " " + "b" * 40 + " staged.py",
+        "1 .M N... 100644 100644 100644 " + "c" * 40 + " " + "c" * 40 + " edited.py",
+        "2 RM N... 100644 100644 100644 " + "d" * 40 + " " + "d" * 40 + " R100 new name.py",
+        "old name.py",
+        "1 A. N... 000000 100644 100644 " + "0" * 40 + " " + "e" * 40 + " added.py",
+        "1 AD N... 000000 100644 000000 " + "0" * 40 + " " + "f" * 40 + " gone.py",
+        "? docs/notes.md",
+        "",
+    ])
+    
+    def test_parse(self):
+        snapshot = StatusSnapshot.parse(self.OUTPUT)
+        
+        assert [entry.path for entry in snapshot.entries] == ["staged.py", "edited.py", "new name.py",
+                                                              "added.py", "gone.py"]
+        assert snapshot.entries[2].orig_path == "old name.py"
+        assert [entry.staged for entry in snapshot.entries] == [True, False, True, True, True]
+        assert snapshot.untracked == ["docs/notes.md"]
+        assert snapshot.unmerged == []
+    
+    def test_raw_changes(self):
+        snapshot = StatusSnapshot.parse(self.OUTPUT)
+        
+        staged = {change.new_path: change for change in snapshot.raw_changes(staged_only=True)}
+        assert sorted(staged) == ["added.py", "gone.py", "new name.py", "staged.py"]
+        assert (staged["staged.py"].old_oid, staged["staged.py"].new_oid) == ("a" * 40, "b" * 40)
+        assert (staged["new name.py"].status, staged["new name.py"].old_path) == ("R100", "old name.py")
+        assert staged["added.py"].status == "A"
+        
+        everything = {change.new_path: change for change in snapshot.raw_changes(staged_only=False)}
+        # Added, then deleted again: nothing against HEAD
+        assert sorted(everything) == ["added.py", "edited.py", "new name.py", "staged.py"]
+        assert everything["staged.py"].new_oid == "b" * 40
+        assert everything["edited.py"].new_oid == "0" * 40
+    
+    def test_unmerged_paths_defer_to_git_diff(self):
+        snapshot = StatusSnapshot.parse("u UU N... 100644 100644 100644 100644 " + " ".join(["a" * 40] * 3)
+                                        + " conflict.py\0")
+        
+        assert snapshot.unmerged == ["conflict.py"]
+        assert snapshot.has_changes(staged_only=True)
+        assert snapshot.raw_changes() is None
+
+
+@requires_git
+class TestStatusSnapshotRepository:
+    @pytest.fixture
+    def repo(self, tmp_path, init_repo):
+        init_repo(tmp_path)
+        (tmp_path / "sub").mkdir()
+        for name in ("a.txt", "b.txt", "move.txt", "sub/c.txt"):
+            (tmp_path / name).write_text(f"{name}\n" * 5)
+        git(tmp_path, "add", "-A")
+        git(tmp_path, "commit", "-q", "-m", "initial")
+        (tmp_path / "a.txt").write_text("changed a\n")
+        git(tmp_path, "add", "a.txt")
+        (tmp_path / "b.txt").write_text("changed b\n")
+        git(tmp_path, "mv", "move.txt", "moved.txt")
+        (tmp_path / "sub" / "c.txt").unlink()
+        (tmp_path / "top.txt").write_text("untracked\n")
+        (tmp_path / "sub" / "d.txt").write_text("untracked\n")
+        return tmp_path
+    
+    @pytest.mark.parametrize("subdir", ["", "sub"])
+    def test_matches_separate_git_commands(self, repo, tmp_path_factory, subdir):
+        cwd = str(repo / subdir)
+        plain = GitDiffAnalyzer(cwd=cwd)
+        snapshot = GitDiffAnalyzer(cwd=cwd, use_status=True)
+        cached = GitDiffAnalyzer(cwd=cwd, use_status=True, diff_cache=DiffCache(tmp_path_factory.mktemp("cache")))
+        
+        assert snapshot.get_untracked_files() == plain.get_untracked_files()
+        for staged_only in (True, False):
+            expected = plain.get_file_changes(staged_only, single_pass=True)
+            assert snapshot.get_file_changes(staged_only, single_pass=True) == expected
+            assert cached.get_file_changes(staged_only) == expected
+    
+    def test_one_status_serves_a_run(self, repo):
+        plain = GitDiffAnalyzer(cwd=str(repo))
+        plain.get_untracked_files()
+        plain.get_file_changes(staged_only=True, single_pass=True)
+        
+        analyzer = GitDiffAnalyzer(cwd=str(repo), use_status=True)
+        analyzer.get_untracked_files()
+        analyzer.get_file_changes(staged_only=True, single_pass=True)
+        
+        # rev-parse, status and diff instead of --version, rev-parse, ls-files and diff
+        assert analyzer.backend.forks == 3
+        assert plain.backend.forks == 4
+    
+    def test_clean_tree_skips_git_diff(self, repo):
+        subprocess.run(["git", "reset", "-q", "--hard"], cwd=repo, check=True)
+        analyzer = GitDiffAnalyzer(cwd=str(repo), use_status=True)
+        
+        with patch.object(analyzer, '_stream_git_command') as mock_stream:
+            assert analyzer.get_file_changes(staged_only=False, single_pass=True) == {}
+            mock_stream.assert_not_called()
+    
+    def test_index_change_takes_new_snapshot(self, repo):
+        analyzer = GitDiffAnalyzer(cwd=str(repo), use_status=True)
+        assert analyzer.get_untracked_files() == ["sub/d.txt", "top.txt"]
+        
+        subprocess.run(["git", "add", "top.txt"], cwd=repo, check=True)
+        
+        assert analyzer.get_untracked_files() == ["sub/d.txt"]
+        assert "top.txt" in analyzer.get_file_changes(staged_only=True, single_pass=True)
+    
+    def test_outside_a_repository(self, tmp_path):
+        analyzer = GitDiffAnalyzer(cwd=str(tmp_path), use_status=True)
+        
+        assert analyzer.git_available is True
+        assert analyzer.in_git_repo is False
@@ -0,0 +1,259 @@
+import os
+import subprocess
+import pytest
+from unittest.mock import patch
+
+from gitme.git_diff import GitDiffAnalyzer
+from gitme.git_objects import (
+    GitObjectError, IgnoreMatcher, IgnoreRules, Repository, UnsupportedRepository, _apply_delta,
+    open_repository
+)
+from tests.conftest import git, requires_git
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch, init_repo):
+    root = init_repo(tmp_path / "repo")
+    (root / "src").mkdir()
+    (root / "src" / "app.py").write_text("import os\n\n\ndef main():\n    a = 1\n    b = 2\n    c = 3\n    return a\n")
+    (root / "notes.txt").write_text("first\nsecond")
+    (root / "old name.txt").write_text("moving\n")
+    (root / "data.bin").write_bytes(b"\x00\x01")
+    (root / ".gitignore").write_text("*.log\nbuild/\n!keep.log\n")
+    git(root, "add", "-A")
+    git(root, "commit", "-q", "-m", "initial")
+    monkeypatch.chdir(root)
+    return root
+
+
+@requires_git
+class TestRepository:
+    def assert_matches_git(self):
+        analyzer = GitDiffAnalyzer()
+        repository = Repository.open()
+        for staged_only in (True, False):
+            expected = analyzer.get_file_changes(staged_only, single_pass=True)
+            assert repository.file_changes(staged_only) == expected
+        assert repository.untracked_files() == analyzer.get_untracked_files()
+    
+    def test_matches_git_for_loose_objects(self, repo):
+        (repo / "src" / "app.py").write_text("import os\n\n\ndef main():\n    a = 1\n    b = 22\n    c = 3\n    return a\n")
+        (repo / "notes.txt").write_text("first\nsecond\n")
+        (repo / "data.bin").write_bytes(b"\x00\x02")
+        (repo / "new.txt").write_text("new\n")
+        git(repo, "mv", "old name.txt", "new name.txt")
+        git(repo, "add", "src/app.py", "new.txt")
+        os.chmod(repo / "notes.txt", 0o755)
+        (repo / "debug.log").write_text("ignored")
+        (repo / "keep.log").write_text("kept")
+        (repo / "build").mkdir()
+        (repo / "build" / "out.o").write_text("ignored")
+        (repo / "docs").mkdir()
+        (repo / "docs" / "guide.md").write_text("untracked")
+        
+        self.assert_matches_git()
+    
+    def test_matches_git_for_packed_objects(self, repo):
+        for i in range(5):
+            with open(repo / "src" / "app.py", "a") as f:
+                f.write(f"# revision {i}\n")
+            git(repo, "commit", "-q", "-a", "-m", f"revision {i}")
+        git(repo, "gc", "-q", "--aggressive")
+        assert os.listdir(repo / ".git" / "objects" / "pack")
+        
+        (repo / "src" / "app.py").write_text("rewritten\n")
+        git(repo, "add", "src/app.py")
+        (repo / "notes.txt").write_text("changed in worktree\n")
+        
+        self.assert_matches_git()
+    
+    def test_reads_every_object(self, repo):
+        git(repo, "gc", "-q")
+        repository = Repository.open()
+        for oid in git(repo, "rev-list", "--objects", "--all").split():
+            if len(oid) == 40:
+                kind, data = repository.objects.read(oid)
+                assert git(repo, "cat-file", "-t", oid).strip() == kind
+    
+    def test_untracked_files_from_subdirectory(self, repo, monkeypatch):
+        (repo / "src" / "extra.py").write_text("x\n")
+        (repo / "top.txt").write_text("y\n")
+        monkeypatch.chdir(repo / "src")
+        
+        assert Repository.open().untracked_files() == ["extra.py"]
+    
+    def test_unsupported_config(self, repo):
+        git(repo, "config", "core.autocrlf", "true")
+        with pytest.raises(UnsupportedRepository):
+            Repository.open()
+        assert open_repository() is None
+    
+    def test_inexact_rename_falls_back(self, repo):
+        os.remove(repo / "notes.txt")
+        (repo / "notes2.txt").write_text("first\nsecond\nthird")
+        git(repo, "add", "-A")
+        
+        with pytest.raises(UnsupportedRepository):
+            Repository.open().file_changes(staged_only=True)
+    
+    def test_analyzer_in_process_falls_back_to_git(self, repo):
+        os.remove(repo / "notes.txt")
+        (repo / "notes2.txt").write_text("first\nsecond\nthird")
+        git(repo, "add", "-A")
+        
+        analyzer = GitDiffAnalyzer(in_process=True)
+        assert analyzer.repository is not None
+        assert analyzer.in_git_repo is True
+        assert analyzer.get_file_changes(staged_only=True) == \
+            GitDiffAnalyzer().get_file_changes(staged_only=True, single_pass=True)
+    
+    def test_edits_match_git_diff(self, repo):
+        body = "".join(f"value_{i} = {i}\n" for i in range(40))
+        for name in ("append", "prepend", "middle", "delete", "spread", "tail"):
+            (repo / f"{name}.py").write_text("def run():\n" + body)
+        git(repo, "add", "-A")
+        git(repo, "commit", "-q", "-m", "shapes")
+        (repo / "append.py").write_text("def run():\n" + body + "extra = 1\n")
+        (repo / "prepend.py").write_text("import sys\ndef run():\n" + body)
+        (repo / "middle.py").write_text("def run():\n" + body.replace("value_20 = 20", "value_20 = -20"))
+        (repo / "delete.py").write_text("def run():\n" + body.replace("value_7 = 7\n", ""))
+        (repo / "spread.py").write_text("def run():\n" + body.replace("= 3\n", "= 33\n").replace("= 35\n", "= 0\n"))
+        (repo / "tail.py").write_text("def run():\n" + body.rstrip("\n"))
+        
+        repository = Repository.open()
+        for staged_only in (False, True):
+            expected = GitDiffAnalyzer().get_file_changes(staged_only, single_pass=True)
+            assert repository.file_changes(staged_only) == expected
+            git(repo, "add", "-A")
+        assert len(expected) == 6
+    
+    def test_ambiguous_edit_falls_back(self, repo):
+        # The added block could start at either blank line, and git shifts
+        # such blocks differently from difflib
+        (repo / "src" / "app.py").write_text("import os\n\n\ndef main():\n    a = 1\n    b = 2\n    c = 3\n"
+                                           "    return a\n\n\ndef other():\n    return 1\n")
+        
+        with pytest.raises(UnsupportedRepository):
+            Repository.open().file_changes(staged_only=False)
+        assert GitDiffAnalyzer(in_process=True).get_file_changes(staged_only=False) == \
+            GitDiffAnalyzer().get_file_changes(staged_only=False, single_pass=True)
+    
+    def test_non_utf8_paths_fall_back(self, repo):
+        with open(os.path.join(os.fsencode(repo), b"caf\xe9.txt"), "w") as f:
+            f.write("latin-1 name\n")
+        with open(os.path.join(os.fsencode(repo), b"r\xe9sum\xe9.txt"), "w") as f:
+            f.write("untracked\n")
+        git(repo, "add", os.fsdecode(b"caf\xe9.txt"))
+        
+        with pytest.raises(UnsupportedRepository):
+            Repository.open().file_changes(staged_only=True)
+        analyzer = GitDiffAnalyzer(in_process=True)
+        expected = GitDiffAnalyzer().get_file_changes(staged_only=True, single_pass=True)
+        assert analyzer.get_file_changes(staged_only=True, single_pass=True) == expected
+        assert len(expected) == 1
+        
+        git(repo, "commit", "-q", "-m", "latin-1 name")
+        (repo / "notes.txt").write_text("changed\n")
+        with pytest.raises(UnsupportedRepository):
+            Repository.open().file_changes(staged_only=False)
+        with pytest.raises(UnsupportedRepository):
+            Repository.open().untracked_files()
+        assert analyzer.get_untracked_files() == GitDiffAnalyzer().get_untracked_files()
+    
+    def test_corrupt_tree_falls_back(self, repo):
+        (repo / "notes.txt").write_text("changed\n")
+        git(repo, "add", "notes.txt")
+        tree = git(repo, "rev-parse", "HEAD^{tree}").strip()
+        analyzer = GitDiffAnalyzer(in_process=True)
+        read = analyzer.repository.objects.read
+        
+        def corrupt(oid):
+            return ("tree", b"100644 truncated") if oid == tree else read(oid)
+        
+        with patch.object(analyzer.repository.objects, "read", side_effect=corrupt):
+            with pytest.raises(GitObjectError):
+                analyzer.repository.file_changes(staged_only=True)
+            assert analyzer.get_file_changes(staged_only=True) == \
+                GitDiffAnalyzer().get_file_changes(staged_only=True, single_pass=True)
+    
+    def test_corrupt_object_header_falls_back(self, repo):
+        (repo / "notes.txt").write_text("changed\n")
+        analyzer = GitDiffAnalyzer(in_process=True)
+        
+        with patch.object(analyzer.repository.objects, "size", side_effect=ValueError("bad size")):
+            with pytest.raises(GitObjectError):
+                analyzer.repository.file_changes(staged_only=False, max_blob_bytes=100)
+            assert analyzer.get_file_changes(staged_only=False) == \
+                GitDiffAnalyzer().get_file_changes(staged_only=False, single_pass=True)
+    
+    def test_in_process_probes_do_not_fork(self, repo):
+        with patch('subprocess.run') as mock_run:
+            analyzer = GitDiffAnalyzer(in_process=True)
+            analyzer.get_file_changes(staged_only=True)
+            analyzer.get_untracked_files()
+            mock_run.assert_not_called()
+
+
+class TestIgnoreRules:
+    def test_patterns(self, tmp_path):
+        ignore_file = tmp_path / ".gitignore"
+        ignore_file.write_text("*.pyc\n/dist\nlogs/\n!important.pyc\ndocs/**/draft\n\\#hash\n")
+        rules = IgnoreRules()
+        rules.add_file(str(ignore_file))
+        
+        assert rules.is_ignored("a/b/c.pyc", False)
+        assert not rules.is_ignored("a/important.pyc", False)
+        assert rules.is_ignored("dist", True)
+        assert not rules.is_ignored("src/dist", True)
+        assert rules.is_ignored("src/logs", True)
+        assert not rules.is_ignored("src/logs", False)
+        assert rules.is_ignored("docs/draft", False)
+        assert rules.is_ignored("docs/x/y/draft", False)
+        assert rules.is_ignored("#hash", False)
+    
+    def test_nested_rules_take_precedence(self, tmp_path):
+        (tmp_path / "root").write_text("*.txt\n")
+        (tmp_path / "nested").write_text("!keep.txt\n")
+        rules = IgnoreRules()
+        rules.add_file(str(tmp_path / "root"))
+        rules.add_file(str(tmp_path / "nested"), "sub")
+        
+        assert rules.is_ignored("sub/other.txt", False)
+        assert not rules.is_ignored("sub/keep.txt", False)
+        assert rules.is_ignored("keep.txt", False)
+
+
+@requires_git
+class TestIgnoreMatcher:
+    def test_agrees_with_untracked_files(self, repo):
+        (repo / "build").mkdir()
+        (repo / "build" / "out.o").write_text("x")
+        (repo / "src" / "sub").mkdir()
+        (repo / "src" / ".gitignore").write_text("*.tmp\n!keep.tmp\n")
+        for path in ["a.log", "keep.log", "src/x.tmp", "src/keep.tmp", "src/sub/y.tmp", "src/sub/new.py"]:
+            (repo / path).write_text("x")
+        repository = Repository.open()
+        matcher = IgnoreMatcher(repository)
+        untracked = set(repository.untracked_files())
+        
+        for path in ["build/out.o", "a.log", "keep.log", "src/x.tmp", "src/keep.tmp",
+                     "src/sub/y.tmp", "src/sub/new.py", "src/.gitignore"]:
+            assert matcher.is_ignored(path) == (path not in untracked), path
+        assert matcher.is_ignored("build", True)
+        assert matcher.is_ignored(".git/index")
+    
+    def test_invalidate_reloads_rules(self, repo):
+        matcher = IgnoreMatcher(Repository.open())
+        assert not matcher.is_ignored("notes.md")
+        
+        (repo / ".gitignore").write_text("*.md\n")
+        assert not matcher.is_ignored("notes.md")
+        matcher.invalidate()
+        assert matcher.is_ignored("notes.md")
+
+
+def test_apply_delta():
+    base = b"hello world"
+    # sizes 11 -> 17, copy base[0:6], insert "there ", copy base[6:11]
+    delta = bytes([11, 17, 0x90, 6, 6]) + b"there " + bytes([0x91, 6, 5])
+    assert _apply_delta(base, delta) == b"hello there world"
@@ -1,7 +1,9 @@
+import asyncio
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 import os
-from gitme.llm_client import CommitMessageGenerator
+from gitme.llm_client import ClientPool, CommitMessageGenerator
+from gitme.prompt_packer import estimate_tokens
 
 
 class TestCommitMessageGenerator:
@@ -188,4 +190,312 @@ class TestCommitMessageGenerator:
             prompt = generator._create_prompt({})
             
             assert "Analyze the following git diff" in prompt
-            assert "Git diff:" in prompt
\ No newline at end of file
+            assert "Git diff:" in prompt
+
+class TestStreaming:
+    """Test token streaming for both providers."""
+    
+    def test_stream_anthropic(self):
+        with patch.dict(os.environ, {'ANTHROPIC_API_KEY': 'test-key'}):
+            generator = CommitMessageGenerator()
+        generator.client = MagicMock()
+        stream = generator.client.messages.stream.return_value.__enter__.return_value
+        stream.text_stream = iter(["Add ", "feature\n\n", "- a.py\n"])
+        tokens = []
+        
+        result = generator.generate_commit_message({"a.py": "diff"}, on_token=tokens.append)
+        
+        assert tokens == ["Add ", "feature\n\n", "- a.py\n"]
+        assert result == "Add feature\n\n- a.py"
+        generator.client.messages.create.assert_not_called()
+    
+    @patch('gitme.llm_client.OPENAI_AVAILABLE', True)
+    @patch('gitme.llm_client.OpenAI', create=True)
+    def test_stream_openai(self, mock_openai_class):
+        def chunk(text):
+            c = MagicMock()
+            c.choices = [MagicMock()]
+            c.choices[0].delta.content = text
+            return c
+        mock_client = mock_openai_class.return_value
+        mock_client.chat.completions.create.return_value = iter([chunk("Fix "), chunk(None), chunk("bug")])
+        tokens = []
+        
+        with patch.dict(os.environ, {'OPENAI_API_KEY': 'openai-test-key'}):
+            result = CommitMessageGenerator.generate_commit_message_openai({"a.py": "diff"}, on_token=tokens.append)
+        
+        assert tokens == ["Fix ", "bug"]
+        assert result == "Fix bug"
+        assert mock_client.chat.completions.create.call_args.kwargs["stream"] is True
+    
+    def test_stream_error_falls_back(self):
+        with patch.dict(os.environ, {'ANTHROPIC_API_KEY': 'test-key'}):
+            generator = CommitMessageGenerator()
+        generator.client = MagicMock()
+        generator.client.messages.stream.side_effect = Exception("API Error")
+        
+        with patch('builtins.print'):
+            assert generator.generate_commit_message({"a.py": "diff"}, on_token=lambda t: None) == "Update files"
+
+
+class TestMapReduce:
+    """Test hierarchical summarization of large changes."""
+    
+    def _generator(self):
+        with patch.dict(os.environ, {'ANTHROPIC_API_KEY': 'test-key'}):
+            generator = CommitMessageGenerator()
+        generator.client = MagicMock()
+        
+        def create(**kwargs):
+            prompt = kwargs["messages"][0]["content"]
+            response = MagicMock()
+            if prompt.startswith("Summarize"):
+                files = [line[6:] for line in prompt.splitlines() if line.startswith("File: ")]
+                response.content = [MagicMock(text="\n".join(f"- changed {f}" for f in files))]
+            else:
+                response.content = [MagicMock(text="Update many files\n\n- lots")]
+            return response
+        generator.client.messages.create.side_effect = create
+        return generator
+    
+    def test_chunk_respects_budget(self):
+        generator = self._generator()
+        generator.chunk_tokens = 100
+        file_changes = {f"f{i}.py": "x" * 200 for i in range(5)}
+        file_changes["big.py"] = "y" * 10000
+        
+        groups = generator._chunk_file_changes(file_changes)
+        
+        assert [list(g) for g in groups] == [["f0.py", "f1.py"], ["f2.py", "f3.py"], ["f4.py", "big.py"]]
+        assert len(groups[-1]["big.py"]) < 500
+    
+    def test_small_changes_use_single_request(self):
+        generator = self._generator()
+        
+        generator.generate_commit_message({"a.py": "diff"})
+        
+        generator.client.messages.create.assert_called_once()
+    
+    def test_large_changes_are_summarized_then_reduced(self):
+        generator = self._generator()
+        generator.map_reduce_threshold = 500
+        generator.chunk_tokens = 300
+        file_changes = {f"file{i}.py": "+line\n" * 150 for i in range(10)}
+        
+        result = generator.generate_commit_message(file_changes)
+        
+        assert result == "Update many files\n\n- lots"
+        prompts = [c.kwargs["messages"][0]["content"] for c in generator.client.messages.create.call_args_list]
+        summaries = [p for p in prompts if p.startswith("Summarize")]
+        assert len(summaries) == 10
+        reduce_prompt = prompts[-1]
+        assert all(f"- changed file{i}.py" in reduce_prompt for i in range(10))
+    
+    def test_config_overrides_settings(self):
+        config = MagicMock()
+        config.get.side_effect = lambda key, default=None: {"map_reduce_concurrency": 8}.get(key, default)
+        with patch.dict(os.environ, {'ANTHROPIC_API_KEY': 'test-key'}):
+            generator = CommitMessageGenerator(config=config)
+        
+        assert generator.concurrency == 8
+        assert generator.chunk_tokens == CommitMessageGenerator.chunk_tokens
+
+
+class TestClientPool:
+    """Test that generators share pooled SDK clients."""
+    
+    @patch('gitme.llm_client.Anthropic')
+    def test_generators_share_one_client(self, mock_anthropic_class):
+        mock_anthropic_class.side_effect = lambda **kwargs: MagicMock()
+        pool = ClientPool()
+        
+        first = CommitMessageGenerator(api_key='key', pool=pool)
+        second = CommitMessageGenerator(api_key='key', pool=pool)
+        other = CommitMessageGenerator(api_key='other-key', pool=pool)
+        
+        assert first.client is second.client
+        assert other.client is not first.client
+        assert mock_anthropic_class.call_count == 2
+    
+    @patch('gitme.llm_client.Anthropic')
+    def test_base_url_is_passed_through(self, mock_anthropic_class):
+        CommitMessageGenerator(api_key='key', base_url='http://127.0.0.1:9', pool=ClientPool())
+        
+        mock_anthropic_class.assert_called_once_with(api_key='key', base_url='http://127.0.0.1:9')
+    
+    @patch('gitme.llm_client.Anthropic')
+    def test_close_closes_clients(self, mock_anthropic_class):
+        pool = ClientPool()
+        generator = CommitMessageGenerator(api_key='key', pool=pool)
+        
+        pool.close()
+        
+        generator.client.close.assert_called_once()
+        assert CommitMessageGenerator(api_key='key', pool=pool).client is not None
+        assert mock_anthropic_class.call_count == 2
+    
+    @patch('gitme.llm_client.AsyncAnthropic')
+    def test_agenerate_uses_pooled_async_client(self, mock_async_class):
+        response = MagicMock()
+        response.content = [MagicMock(text="Add feature")]
+        mock_async_class.return_value.messages.create = AsyncMock(return_value=response)
+        generator = CommitMessageGenerator(api_key='key', pool=ClientPool())
+        
+        async def run():
+            return [await generator.agenerate_commit_message({"a.py": "diff"}) for _ in range(3)]
+        
+        assert asyncio.run(run()) == ["Add feature"] * 3
+        mock_async_class.assert_called_once_with(api_key='key')
+        assert mock_async_class.return_value.messages.create.await_count == 3
+    
+    @patch('gitme.llm_client.AsyncAnthropic')
+    def test_agenerate_map_reduce(self, mock_async_class):
+        async def create(**kwargs):
+            response = MagicMock()
+            prompt = kwargs["messages"][0]["content"]
+            response.content = [MagicMock(text="- summary" if prompt.startswith("Summarize") else "Update many files")]
+            return response
+        mock_async_class.return_value.messages.create = AsyncMock(side_effect=create)
+        generator = CommitMessageGenerator(api_key='key', pool=ClientPool())
+        generator.map_reduce_threshold = 100
+        generator.chunk_tokens = 100
+        
+        result = asyncio.run(generator.agenerate_commit_message({f"f{i}.py": "+line\n" * 40 for i in range(4)}))
+        
+        assert result == "Update many files"
+        assert mock_async_class.return_value.messages.create.await_count == 5
+    
+    
+    def test_pr_description_condenses_long_branches(self):
+        generator = CommitMessageGenerator(api_key='key', pool=ClientPool())
+        generator.max_prompt_tokens = 50
+        generator.chunk_tokens = 30
+        prompts = []
+        
+        def complete(prompt, on_token=None):
+            prompts.append(prompt)
+            return "- condensed" if prompt.startswith("The following are summaries of consecutive") else "Add it all"
+        
+        with patch.object(generator, '_complete', side_effect=complete):
+            commits = [(f"Commit {i}", "- " + "word " * 20) for i in range(4)]
+            assert generator.generate_pr_description(commits) == "Add it all"
+        
+        assert len(prompts) == 5
+        assert prompts[-1].count("- condensed") == 4
+    
+    def test_pr_description_condenses_until_the_summaries_fit(self):
+        generator = CommitMessageGenerator(api_key='key', pool=ClientPool())
+        generator.max_prompt_tokens = 50
+        generator.chunk_tokens = 30
+        prompts = []
+        
+        def complete(prompt, on_token=None):
+            prompts.append(prompt)
+            if not prompt.startswith("The following are summaries of consecutive"):
+                return "Add it all"
+            # The first round still leaves too much for the final prompt
+            return "- merged " + "text " * 20 if "word" in prompt else "- condensed"
+        
+        with patch.object(generator, '_complete', side_effect=complete):
+            commits = [(f"Commit {i}", "- " + "word " * 20) for i in range(4)]
+            assert generator.generate_pr_description(commits) == "Add it all"
+        
+        # Four condensed commits, then four condensed condensations
+        assert len(prompts) == 9
+        assert prompts[-1].count("- condensed") == 4
+        assert "merged" not in prompts[-1]
+    
+    def test_pr_description_cuts_summaries_that_do_not_shrink(self):
+        generator = CommitMessageGenerator(api_key='key', pool=ClientPool())
+        generator.max_prompt_tokens = 50
+        generator.chunk_tokens = 30
+        prompts = []
+        
+        def complete(prompt, on_token=None):
+            prompts.append(prompt)
+            if prompt.startswith("The following are summaries of consecutive"):
+                return "\n".join(f"- point {i}" for i in range(40))
+            return "Add it all"
+        
+        with patch.object(generator, '_complete', side_effect=complete), \
+                patch.object(generator, '_create_pr_prompt', wraps=generator._create_pr_prompt) as pr_prompt:
+            commits = [(f"Commit {i}", "- " + "word " * 20) for i in range(4)]
+            assert generator.generate_pr_description(commits) == "Add it all"
+        
+        # One round that made things longer, then each entry cut to a quarter
+        assert len(prompts) == 5
+        entries = pr_prompt.call_args.args[0]
+        assert len(entries) == 4
+        assert sum(estimate_tokens(entry) for entry in entries) <= generator.max_prompt_tokens
+        assert all(entry.startswith("- point 0\n") for entry in entries)
+
+
+class TestBatchJobs:
+    """Test provider batch jobs against the local stub server."""
+    
+    @pytest.fixture
+    def stub(self):
+        from tests.batch_stub import BatchStubServer
+        with BatchStubServer(polls=2) as server:
+            yield server
+    
+    def make_generator(self, stub, provider="anthropic", **kwargs):
+        generator = CommitMessageGenerator(api_key='key', provider=provider, base_url=f"{stub.url}/v1"
+                                           if provider == "openai" else stub.url, pool=ClientPool(), **kwargs)
+        generator.batch_poll_interval = 0
+        return generator
+    
+    def test_anthropic_batch_maps_results_back(self, stub):
+        generator = self.make_generator(stub)
+        statuses = []
+        
+        messages, errors = generator.generate_batch(
+            {"repo-a": {"a.py": "+a"}, "repo-b": {"b.py": "+b"}, "clean": {}}, on_status=statuses.append
+        )
+        
+        assert messages == {"repo-a": "Update a.py", "repo-b": "Update b.py", "clean": "No changes to commit"}
+        assert errors == {}
+        assert len(stub.batches) == 1
+        assert len(statuses) == 2
+        assert statuses[-1]["succeeded"] == 2
+    
+    def test_failed_requests_are_reported_per_key(self, stub):
+        stub.reply = lambda prompt: None if "b.py" in prompt else "Update a.py"
+        generator = self.make_generator(stub)
+        
+        messages, errors = generator.generate_batch({"repo-a": {"a.py": "+a"}, "repo-b": {"b.py": "+b"}})
+        
+        assert messages == {"repo-a": "Update a.py"}
+        assert errors == {"repo-b": "overloaded_error: Overloaded"}
+    
+    def test_cached_prompts_are_not_submitted(self, stub, tmp_path):
+        from gitme.response_cache import ResponseCache
+        cache = ResponseCache(cache_file=tmp_path / "cache.json")
+        generator = self.make_generator(stub, cache=cache)
+        generator.generate_batch({"repo-a": {"a.py": "+a"}})
+        
+        messages, _ = generator.generate_batch({"again": {"a.py": "+a"}})
+        
+        assert messages == {"again": "Update a.py"}
+        assert len(stub.batches) == 1
+    
+    def test_timeout_cancels_job(self, stub):
+        from gitme.llm_client import BatchJobError
+        stub.polls = 100
+        generator = self.make_generator(stub)
+        generator.batch_timeout = 0
+        
+        with pytest.raises(BatchJobError, match="did not finish"):
+            generator.generate_batch({"repo-a": {"a.py": "+a"}})
+        assert stub.cancelled == ["msgbatch_1"]
+    
+    def test_openai_batch_maps_results_back(self, stub):
+        pytest.importorskip("openai")
+        stub.reply = lambda prompt: None if "b.py" in prompt else "Update a.py"
+        generator = self.make_generator(stub, provider="openai")
+        
+        messages, errors = generator.generate_batch({"repo-a": {"a.py": "+a"}, "repo-b": {"b.py": "+b"}})
+        
+        assert messages == {"repo-a": "Update a.py"}
+        assert errors == {"repo-b": "Rate limit reached"}
+        assert stub.batches["batch_1"]["params"]["endpoint"] == "/v1/chat/completions"
@@ -0,0 +1,124 @@
+import asyncio
+import pytest
+from unittest.mock import patch, MagicMock
+from click.testing import CliRunner
+
+from gitme.cli import pr
+from gitme.git_diff import GitDiffAnalyzer
+from gitme.pr import PullRequestError, PullRequestWriter, SummaryCache
+from tests.conftest import git, requires_git
+
+
+def add_commit(repo, name):
+    (repo / f"{name}.txt").write_text(f"{name}\n")
+    git(repo, "add", "-A")
+    git(repo, "commit", "-q", "-m", f"Add {name}")
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch, init_repo):
+    repo = init_repo(tmp_path / "repo", "-b", "main")
+    add_commit(repo, "base")
+    git(repo, "checkout", "-q", "-b", "feature")
+    for name in ("alpha", "beta", "gamma"):
+        add_commit(repo, name)
+    monkeypatch.chdir(repo)
+    return repo
+
+
+class FakeGenerator:
+    """Summarizes a commit as its file names and joins summaries"""
+    
+    def __init__(self):
+        self.model = "test-model"
+        self.concurrency = 2
+        self.pool = MagicMock()
+        self.pool.aclose = MagicMock(side_effect=lambda: asyncio.sleep(0))
+        self.summarized = []
+        self.described = []
+    
+    async def asummarize_commit(self, subject, file_changes):
+        self.summarized.append(subject)
+        await asyncio.sleep(0)
+        return "- Adds " + ", ".join(sorted(file_changes))
+    
+    def generate_pr_description(self, commits, on_token=None):
+        self.described.append(commits)
+        return "Add three files\n\n" + "\n".join(summary for _, summary in commits)
+
+
+def run_writer(revision_range, generator, cache):
+    writer = PullRequestWriter(revision_range, GitDiffAnalyzer(), generator, cache=cache)
+    commits = writer.commits()
+    summaries, errors = asyncio.run(writer.summarize(commits))
+    assert errors == {}
+    return writer, writer.describe(commits, summaries)
+
+
+class TestSummaryCache:
+    def test_round_trip_by_commit_and_model(self, tmp_path):
+        cache = SummaryCache(tmp_path / "summaries")
+        cache.put(cache.key("abc", "anthropic", "haiku"), "- Adds a.txt")
+        
+        assert cache.get(cache.key("abc", "anthropic", "haiku")) == "- Adds a.txt"
+        assert cache.get(cache.key("abc", "anthropic", "sonnet")) is None
+        assert (cache.hits, cache.misses) == (1, 1)
+
+
+@requires_git
+class TestPullRequestWriter:
+    def test_describes_range_oldest_first(self, repo, tmp_path):
+        generator = FakeGenerator()
+        
+        writer, description = run_writer("main..HEAD", generator, SummaryCache(tmp_path / "summaries"))
+        
+        assert description == "Add three files\n\n- Adds alpha.txt\n- Adds beta.txt\n- Adds gamma.txt"
+        assert [subject for subject, _ in generator.described[0]] == ["Add alpha", "Add beta", "Add gamma"]
+        assert writer.summarized == 3
+    
+    def test_rerun_only_summarizes_new_commits(self, repo, tmp_path):
+        cache = SummaryCache(tmp_path / "summaries")
+        run_writer("main", FakeGenerator(), cache)
+        add_commit(repo, "delta")
+        add_commit(repo, "epsilon")
+        generator = FakeGenerator()
+        
+        writer, description = run_writer("main", generator, cache)
+        
+        assert sorted(generator.summarized) == ["Add delta", "Add epsilon"]
+        assert writer.summarized == 2
+        assert description.endswith("- Adds epsilon.txt")
+    
+    def test_merge_commits_are_skipped(self, repo, tmp_path):
+        git(repo, "checkout", "-q", "-b", "side", "main")
+        add_commit(repo, "side")
+        git(repo, "checkout", "-q", "feature")
+        git(repo, "merge", "-q", "--no-ff", "-m", "Merge side", "side")
+        generator = FakeGenerator()
+        
+        run_writer("main", generator, SummaryCache(tmp_path / "summaries"))
+        
+        assert "Merge side" not in generator.summarized
+        assert len(generator.summarized) == 4
+    
+    def test_empty_range(self, repo):
+        writer = PullRequestWriter("HEAD..HEAD", GitDiffAnalyzer(), FakeGenerator())
+        
+        with pytest.raises(PullRequestError, match="no commits"):
+            writer.commits()
+
+
+@requires_git
+class TestPrCommand:
+    def test_prints_description_and_reuses_summaries(self, repo):
+        generator = FakeGenerator()
+        with patch('gitme.cli.CommitMessageGenerator', return_value=generator):
+            first = CliRunner().invoke(pr, ["main..HEAD"])
+            second = CliRunner().invoke(pr, ["main..HEAD"])
+        
+        assert first.exit_code == 0, first.output
+        assert "Pull request description" in first.output
+        assert "- Adds gamma.txt" in first.output
+        assert "0 summaries reused, 3 new" in first.output
+        assert "3 summaries reused, 0 new" in second.output
+        assert len(generator.summarized) == 3
@@ -0,0 +1,75 @@
+from gitme.prompt_packer import (
+    GAP_MARKER, allocate_budget, estimate_tokens, file_weight, pack_diff, pack_file_changes
+)
+
+
+DIFF = """diff --git a/app.py b/app.py
+index 1111111..2222222 100644
+--- a/app.py
++++ b/app.py
+@@ -1,8 +1,8 @@ def main():
+ context line one
+ context line two
+ context line three
+-old_value = compute(1)
++new_value = compute(2)
+ context line four
+ context line five
+ context line six
+"""
+
+
+class TestEstimateTokens:
+    def test_counts_words_numbers_and_symbols(self):
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("word") == 1
+        assert estimate_tokens("identifier") == 3
+        assert estimate_tokens("123456") == 2
+        assert estimate_tokens("a = b;") == 6
+    
+    def test_grows_with_text(self):
+        assert estimate_tokens(DIFF * 2) > estimate_tokens(DIFF)
+
+
+class TestPackDiff:
+    def test_small_diff_is_unchanged(self):
+        assert pack_diff(DIFF, 1000) == DIFF.rstrip("\n")
+    
+    def test_keeps_headers_and_changes_before_context(self):
+        packed = pack_diff(DIFF, 100)
+        
+        assert "diff --git a/app.py b/app.py" in packed
+        assert "@@ -1,8 +1,8 @@ def main():" in packed
+        assert "-old_value = compute(1)" in packed
+        assert "+new_value = compute(2)" in packed
+        assert "context line six" not in packed
+        assert GAP_MARKER in packed
+        assert estimate_tokens(packed) <= 100
+    
+    def test_cuts_very_long_lines(self):
+        packed = pack_diff("+" + "x" * 5000, 10000)
+        
+        assert len(packed) < 500
+        assert packed.endswith(GAP_MARKER)
+
+
+class TestAllocation:
+    def test_surplus_goes_to_files_that_need_it(self):
+        assert allocate_budget([10, 1000], [1.0, 1.0], 500) == [10, 490]
+    
+    def test_shares_follow_weights(self):
+        small, large = allocate_budget([1000, 1000], [1.0, 3.0], 400)
+        
+        assert large == 3 * small
+    
+    def test_lockfiles_and_docs_weigh_less(self):
+        assert file_weight("package-lock.json", DIFF) < file_weight("README.md", DIFF) < file_weight("app.py", DIFF)
+    
+    def test_pack_file_changes_fits_budget(self):
+        file_changes = {"app.py": DIFF * 20, "package-lock.json": DIFF * 20, "tiny.py": "+x"}
+        
+        packed = pack_file_changes(file_changes, 600)
+        
+        assert packed["tiny.py"] == "+x"
+        assert sum(estimate_tokens(diff) for diff in packed.values()) <= 600
+        assert estimate_tokens(packed["app.py"]) > 5 * estimate_tokens(packed["package-lock.json"])
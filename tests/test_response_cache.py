@@ -0,0 +1,125 @@
+import os
+import pytest
+from unittest.mock import patch, MagicMock
+
+from gitme.llm_client import CommitMessageGenerator
+from gitme.response_cache import ResponseCache
+
+
+class TestResponseCache:
+    def test_get_put_and_counters(self, tmp_path):
+        cache = ResponseCache(tmp_path / "responses.json")
+        key = cache.key("anthropic", "claude", 0.3, "prompt")
+        
+        assert cache.get(key) is None
+        cache.put(key, "Add feature")
+        assert cache.get(key) == "Add feature"
+        assert (cache.hits, cache.misses) == (1, 1)
+    
+    def test_key_normalizes_whitespace(self, tmp_path):
+        cache = ResponseCache(tmp_path / "responses.json")
+        
+        assert cache.key("openai", "gpt", 0.3, "a  \nb\n\n") == cache.key("openai", "gpt", 0.3, "a\nb")
+        assert cache.key("openai", "gpt", 0.3, "a b") != cache.key("openai", "gpt", 0.3, "a  b")
+    
+    def test_key_depends_on_provider_model_and_temperature(self, tmp_path):
+        cache = ResponseCache(tmp_path / "responses.json")
+        base = cache.key("openai", "gpt", 0.3, "p")
+        
+        assert base != cache.key("anthropic", "gpt", 0.3, "p")
+        assert base != cache.key("openai", "gpt-4", 0.3, "p")
+        assert base != cache.key("openai", "gpt", 0.7, "p")
+    
+    def test_expired_entries_miss(self, tmp_path):
+        cache = ResponseCache(tmp_path / "responses.json", ttl=60)
+        with patch("gitme.response_cache.time.time", return_value=1000):
+            cache.put("k", "old")
+        with patch("gitme.response_cache.time.time", return_value=1061):
+            assert cache.get("k") is None
+    
+    def test_keeps_newest_entries(self, tmp_path):
+        cache = ResponseCache(tmp_path / "responses.json", max_entries=2)
+        for i in range(3):
+            with patch("gitme.response_cache.time.time", return_value=1000 + i):
+                cache.put(f"k{i}", f"v{i}")
+        
+        with patch("gitme.response_cache.time.time", return_value=1003):
+            assert cache.get("k0") is None
+            assert cache.get("k1") == "v1"
+            assert cache.get("k2") == "v2"
+    
+    def test_corrupt_file_is_ignored(self, tmp_path):
+        cache_file = tmp_path / "responses.json"
+        cache_file.write_text("not json")
+        cache = ResponseCache(cache_file)
+        
+        assert cache.get("k") is None
+        cache.put("k", "v")
+        assert cache.get("k") == "v"
+    
+    def test_concurrent_puts_keep_every_entry(self, tmp_path):
+        from concurrent.futures import ThreadPoolExecutor
+        cache = ResponseCache(tmp_path / "responses.json", max_entries=1000)
+        
+        def put_many(thread):
+            for i in range(50):
+                cache.put(f"{thread}-{i}", "v")
+        
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(put_many, range(4)))
+        
+        assert len(cache._load_entries()) == 200
+        assert not list(tmp_path.glob("*.tmp"))
+
+
+class TestGeneratorCache:
+    def _generator(self, cache):
+        with patch.dict(os.environ, {'ANTHROPIC_API_KEY': 'test-key'}):
+            generator = CommitMessageGenerator(cache=cache)
+        generator.client = MagicMock()
+        response = MagicMock()
+        response.content = [MagicMock(text="Add feature")]
+        generator.client.messages.create.return_value = response
+        return generator
+    
+    def test_second_call_is_served_from_cache(self, tmp_path):
+        generator = self._generator(ResponseCache(tmp_path / "responses.json"))
+        
+        assert generator.generate_commit_message({"a.py": "diff"}) == "Add feature"
+        assert generator.generate_commit_message({"a.py": "diff"}) == "Add feature"
+        generator.client.messages.create.assert_called_once()
+        assert generator.cache.hits == 1
+    
+    def test_model_change_misses(self, tmp_path):
+        generator = self._generator(ResponseCache(tmp_path / "responses.json"))
+        
+        generator.generate_commit_message({"a.py": "diff"})
+        generator.model = "other-model"
+        generator.generate_commit_message({"a.py": "diff"})
+        assert generator.client.messages.create.call_count == 2
+    
+    def test_errors_are_not_cached(self, tmp_path):
+        generator = self._generator(ResponseCache(tmp_path / "responses.json"))
+        generator.client.messages.create.side_effect = Exception("API Error")
+        
+        with patch('builtins.print'):
+            assert generator.generate_commit_message({"a.py": "diff"}) == "Update files"
+        assert not (tmp_path / "responses.json").exists()
+    
+    def test_last_hit_reflects_the_final_prompt(self, tmp_path):
+        generator = self._generator(ResponseCache(tmp_path / "responses.json"))
+        generator.map_reduce_threshold = 500
+        generator.chunk_tokens = 300
+        file_changes = {f"file{i}.py": "+line\n" * 150 for i in range(4)}
+        
+        generator.generate_commit_message(file_changes)
+        assert not generator.cache.last_hit
+        
+        # Earlier groups are summarized from the cache, the message is new
+        file_changes["file4.py"] = "+line\n" * 150
+        generator.generate_commit_message(file_changes)
+        assert generator.cache.hits == 4
+        assert not generator.cache.last_hit
+        
+        generator.generate_commit_message(file_changes)
+        assert generator.cache.last_hit
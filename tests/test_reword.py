@@ -0,0 +1,197 @@
+import asyncio
+import json
+import os
+import pytest
+from unittest.mock import patch, MagicMock
+from click.testing import CliRunner
+
+from gitme.cli import reword
+from gitme.git_diff import GitDiffAnalyzer
+from gitme.reword import CHECKPOINT_NAME, Reworder, RewordError
+from tests.conftest import git, requires_git
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch, init_repo):
+    repo = init_repo(tmp_path / "repo", "-b", "main")
+    for name in ("base", "alpha", "beta", "gamma"):
+        (repo / f"{name}.txt").write_text(f"{name}\n")
+        git(repo, "add", "-A")
+        git(repo, "commit", "-q", "-m", f"wip {name}", "--author", "Ada <ada@example.com>",
+            "--date", "2024-01-02T03:04:05Z")
+    monkeypatch.chdir(repo)
+    return repo
+
+
+class FakeGenerator:
+    """Async generator naming the files it was given, failing on request"""
+    
+    def __init__(self, fail_on=()):
+        self.pool = MagicMock()
+        self.pool.aclose = MagicMock(side_effect=lambda: asyncio.sleep(0))
+        self.fail_on = set(fail_on)
+        self.calls = []
+        self.in_flight = 0
+        self.peak = 0
+    
+    async def agenerate_commit_message(self, file_changes, raise_errors=False):
+        self.calls.append(sorted(file_changes))
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        if self.fail_on & set(file_changes):
+            raise RuntimeError("rate limited")
+        return "Add " + ", ".join(sorted(file_changes))
+    
+    def generate_batch(self, changesets, on_status=None):
+        messages, errors = {}, {}
+        for key, file_changes in changesets.items():
+            self.calls.append(sorted(file_changes))
+            if self.fail_on & set(file_changes):
+                errors[key] = "overloaded_error: Overloaded"
+            else:
+                messages[key] = "Add " + ", ".join(sorted(file_changes))
+        return messages, errors
+
+
+def make_reworder(revision_range):
+    return Reworder(revision_range, GitDiffAnalyzer(), model="test-model")
+
+
+@requires_git
+class TestReworder:
+    def test_plan_lists_range_oldest_first(self, repo):
+        commits = make_reworder("HEAD~3").plan()
+        
+        assert [commit.subject for commit in commits] == ["wip alpha", "wip beta", "wip gamma"]
+        assert commits[0].parents == [git(repo, "rev-parse", "HEAD~3")]
+        assert commits[0].author_name == "Ada"
+    
+    def test_plan_rejects_tip_other_than_head(self, repo):
+        with pytest.raises(RewordError, match="not HEAD"):
+            make_reworder("HEAD~3..HEAD~1").plan()
+    
+    def test_rewrites_messages_keeping_trees_and_authors(self, repo):
+        old_head = git(repo, "rev-parse", "HEAD")
+        old_trees = git(repo, "log", "--format=%T %an %ae %ad", "--date=raw")
+        reworder = make_reworder("HEAD~3..HEAD")
+        commits = reworder.plan()
+        generator = FakeGenerator()
+        
+        messages, errors = asyncio.run(reworder.generate(commits, generator, concurrency=2))
+        new_head = reworder.rewrite(commits, messages)
+        
+        assert errors == {}
+        assert generator.peak == 2
+        assert git(repo, "rev-parse", "main") == new_head
+        assert git(repo, "rev-parse", "ORIG_HEAD") == old_head
+        assert git(repo, "log", "--format=%s") == "Add gamma.txt\nAdd beta.txt\nAdd alpha.txt\nwip base"
+        assert git(repo, "log", "--format=%T %an %ae %ad", "--date=raw") == old_trees
+        assert git(repo, "status", "--porcelain") == ""
+        assert not os.path.exists(reworder.checkpoint_path)
+    
+    def test_failed_run_resumes_from_checkpoint(self, repo):
+        reworder = make_reworder("HEAD~3")
+        commits = reworder.plan()
+        
+        messages, errors = asyncio.run(reworder.generate(commits, FakeGenerator(fail_on={"beta.txt"})))
+        
+        assert list(errors) == [commits[1].oid]
+        with open(reworder.checkpoint_path) as f:
+            assert set(json.load(f)["messages"]) == {commits[0].oid, commits[2].oid}
+        
+        generator = FakeGenerator()
+        messages, errors = asyncio.run(reworder.generate(commits, generator))
+        
+        assert errors == {}
+        assert generator.calls == [["beta.txt"]]
+        assert len(messages) == 3
+    
+    def test_batch_job_checkpoints_and_resumes(self, repo):
+        reworder = make_reworder("HEAD~3")
+        commits = reworder.plan()
+        
+        messages, errors = reworder.generate_batch(commits, FakeGenerator(fail_on={"beta.txt"}))
+        
+        assert list(errors) == [commits[1].oid]
+        generator = FakeGenerator()
+        messages, errors = reworder.generate_batch(commits, generator)
+        assert generator.calls == [["beta.txt"]]
+        assert messages[commits[1].oid] == "Add beta.txt"
+    
+    def test_checkpoint_from_other_model_is_ignored(self, repo):
+        reworder = make_reworder("HEAD~1")
+        commits = reworder.plan()
+        asyncio.run(reworder.generate(commits, FakeGenerator()))
+        
+        other = Reworder("HEAD~1", GitDiffAnalyzer(), model="other-model")
+        other.plan()
+        
+        assert other.load_checkpoint() == {}
+    
+    def test_empty_commit_keeps_its_message(self, repo):
+        git(repo, "commit", "-q", "--allow-empty", "-m", "Tag release\n\nNo code changes")
+        reworder = make_reworder("HEAD~1")
+        commits = reworder.plan()
+        generator = FakeGenerator()
+        
+        messages, errors = asyncio.run(reworder.generate(commits, generator))
+        
+        assert generator.calls == []
+        assert messages[commits[0].oid] == "Tag release\n\nNo code changes"
+    
+    def test_rewrite_refuses_when_branch_moved(self, repo):
+        reworder = make_reworder("HEAD~1")
+        commits = reworder.plan()
+        messages, _ = asyncio.run(reworder.generate(commits, FakeGenerator()))
+        (repo / "late.txt").write_text("late\n")
+        git(repo, "add", "-A")
+        git(repo, "commit", "-q", "-m", "late")
+        
+        with patch('builtins.print'):
+            with pytest.raises(RewordError):
+                reworder.rewrite(commits, messages)
+        assert git(repo, "log", "-1", "--format=%s") == "late"
+
+
+@requires_git
+class TestRewordCommand:
+    def test_dry_run_leaves_history_alone(self, repo):
+        old_head = git(repo, "rev-parse", "HEAD")
+        
+        with patch('gitme.cli.CommitMessageGenerator', return_value=FakeGenerator()):
+            result = CliRunner().invoke(reword, ["HEAD~2", "--dry-run"])
+        
+        assert result.exit_code == 0, result.output
+        assert "Add gamma.txt" in result.output
+        assert "Dry run" in result.output
+        assert git(repo, "rev-parse", "HEAD") == old_head
+        assert os.path.exists(repo / ".git" / CHECKPOINT_NAME)
+    
+    def test_rewrites_after_confirmation(self, repo):
+        with patch('gitme.cli.CommitMessageGenerator', return_value=FakeGenerator()):
+            result = CliRunner().invoke(reword, ["HEAD~2"], input="y\n")
+        
+        assert result.exit_code == 0, result.output
+        assert "Rewrote 2 commits" in result.output
+        assert git(repo, "log", "-2", "--format=%s") == "Add gamma.txt\nAdd beta.txt"
+    
+    def test_batch_api_flag(self, repo):
+        generator = FakeGenerator()
+        with patch('gitme.cli.CommitMessageGenerator', return_value=generator):
+            result = CliRunner().invoke(reword, ["HEAD~2", "--batch-api", "--yes"])
+        
+        assert result.exit_code == 0, result.output
+        assert generator.peak == 0
+        assert git(repo, "log", "-2", "--format=%s") == "Add gamma.txt\nAdd beta.txt"
+    
+    def test_failures_abort_rewrite(self, repo):
+        old_head = git(repo, "rev-parse", "HEAD")
+        
+        with patch('gitme.cli.CommitMessageGenerator', return_value=FakeGenerator(fail_on={"gamma.txt"})):
+            result = CliRunner().invoke(reword, ["HEAD~2", "--yes"])
+        
+        assert result.exit_code == 0
+        assert "1 of 2 messages failed" in result.output
+        assert git(repo, "rev-parse", "HEAD") == old_head
@@ -0,0 +1,102 @@
+import threading
+import pytest
+from unittest.mock import patch
+
+from gitme.speculative import GenerationCancelled, SpeculativeGeneration
+
+
+def streaming_generator(release: threading.Event, stopped: list):
+    """generate() that streams one token per word of the first file's diff,
+    holding the rest back until release is set"""
+    def generate(file_changes, on_token):
+        words = next(iter(file_changes.values())).split()
+        try:
+            on_token(words[0])
+            release.wait(5)
+            for word in words[1:]:
+                on_token(" " + word)
+        except GenerationCancelled:
+            stopped.append(next(iter(file_changes)))
+            raise
+        return " ".join(words), False
+    return generate
+
+
+class TestSpeculativeGeneration:
+    def test_takes_matching_outcome_and_cancels_the_other(self):
+        release = threading.Event()
+        stopped = []
+        speculation = SpeculativeGeneration(streaming_generator(release, stopped))
+        speculation.start("without", lambda: {"a.py": "fix the parser"})
+        speculation.start("with", lambda: {"b.py": "add the docs"})
+        speculation.wait_for_changes()
+        
+        tokens = []
+        threading.Timer(0.05, release.set).start()
+        result = speculation.take("with", {"b.py": "add the docs"}, tokens.append)
+        
+        assert result == ("add the docs", False)
+        # Tokens from before the answer are replayed, then streamed live
+        assert "".join(tokens) == "add the docs"
+        assert stopped == ["a.py"]
+    
+    def test_changed_diff_is_not_used(self):
+        release = threading.Event()
+        release.set()
+        speculation = SpeculativeGeneration(streaming_generator(release, []))
+        speculation.start("without", lambda: {"a.py": "old diff"})
+        
+        assert speculation.take("without", {"a.py": "edited since"}) is None
+    
+    def test_errors_surface_for_the_chosen_outcome(self):
+        def generate(file_changes, on_token):
+            raise ValueError("API key not found")
+        
+        speculation = SpeculativeGeneration(generate)
+        speculation.start("without", lambda: {"a.py": "diff"})
+        
+        with pytest.raises(ValueError, match="API key"):
+            speculation.take("without", {"a.py": "diff"})
+    
+    def test_failed_diff_falls_back(self):
+        def broken():
+            raise OSError("index locked")
+        
+        speculation = SpeculativeGeneration(lambda changes, on_token: ("unused", False))
+        speculation.start("with", broken)
+        
+        assert speculation.take("with", {"a.py": "diff"}) is None
+    
+    def test_unknown_outcome(self):
+        speculation = SpeculativeGeneration(lambda changes, on_token: ("unused", False))
+        
+        assert speculation.take("with", {"a.py": "diff"}) is None
+    
+    @patch('gitme.llm_client.Anthropic')
+    def test_cancelled_generator_stream_unwinds_quietly(self, mock_anthropic_class, capsys):
+        from gitme.llm_client import ClientPool, CommitMessageGenerator
+        first_token, release = threading.Event(), threading.Event()
+        
+        def text_stream():
+            yield "Add"
+            first_token.set()
+            release.wait(5)
+            yield " more"
+        
+        stream = mock_anthropic_class.return_value.messages.stream.return_value.__enter__.return_value
+        stream.text_stream = text_stream()
+        generator = CommitMessageGenerator(api_key='key', pool=ClientPool())
+        speculation = SpeculativeGeneration(
+            lambda changes, on_token: (generator.generate_commit_message(changes, on_token=on_token), False)
+        )
+        speculation.start("without", lambda: {"a.py": "diff"})
+        assert first_token.wait(5)
+        
+        assert speculation.take("with", {"a.py": "diff", "new.py": "diff"}) is None
+        release.set()
+        candidate = speculation.candidates["without"]
+        assert candidate.done.wait(5)
+        
+        assert isinstance(candidate.error, GenerationCancelled)
+        assert candidate.result is None
+        assert "Error generating commit message" not in capsys.readouterr().out
@@ -0,0 +1,233 @@
+import json
+import pytest
+
+from gitme.sqlite_storage import SQLiteMessageStorage
+from gitme.storage import MessageStorage
+
+
+def entry(i, repo="/repo", message=None, files=None):
+    return {
+        "timestamp": f"2024-01-01T00:{i // 60:02d}:{i % 60:02d}",
+        "repo_path": repo,
+        "message": message or f"message {i}",
+        "file_changes": {path: "diff" for path in (files or [f"file{i}.py"])},
+        "provider": "anthropic",
+        "model": "claude",
+    }
+
+
+@pytest.fixture
+def storage(tmp_path):
+    store = SQLiteMessageStorage(tmp_path, max_entries=0)
+    yield store
+    store.close()
+
+
+class TestSQLiteMessageStorage:
+    def test_save_and_get(self, storage):
+        storage.save_message("Add feature", "/repo", {"a.py": "diff"}, "openai", "gpt-4o-mini")
+        storage.save_message("Other repo", "/other", {"b.py": "diff"})
+        
+        messages = storage.get_messages("/repo")
+        
+        assert len(messages) == 1
+        assert messages[0]["message"] == "Add feature"
+        assert [f["path"] for f in messages[0]["files"]] == ["a.py"]
+        assert storage.load_file_changes(messages[0]) == {"a.py": "diff"}
+        assert messages[0]["provider"] == "openai"
+        assert messages[0]["model"] == "gpt-4o-mini"
+        assert len(storage.get_messages()) == 2
+    
+    def test_limit_returns_newest_oldest_first(self, storage):
+        storage.import_messages(entry(i) for i in range(20))
+        
+        assert [m["message"] for m in storage.get_messages(limit=3)] == ["message 17", "message 18", "message 19"]
+    
+    def test_pages_and_time_bounds(self, storage):
+        storage.import_messages(entry(i) for i in range(20))
+        
+        assert [m["message"] for m in storage.get_messages(limit=3, offset=2)] == ["message 15", "message 16", "message 17"]
+        assert [m["message"] for m in storage.get_messages(since="2024-01-01T00:00:18")] == ["message 18", "message 19"]
+        assert [m["message"] for m in storage.get_messages(limit=2, until="2024-01-01T00:00:05")] == ["message 3", "message 4"]
+        stream = storage.iter_messages(file="file7.py")
+        assert [m["message"] for m in stream] == ["message 7"]
+    
+    def test_grep(self, storage):
+        storage.import_messages([
+            entry(1, message="Fix authentication bug"),
+            entry(2, message="Update README"),
+            entry(3, repo="/other", message="Refactor auth module"),
+        ])
+        
+        assert [m["message"] for m in storage.get_messages(grep="auth")] == [
+            "Fix authentication bug", "Refactor auth module"
+        ]
+        assert [m["message"] for m in storage.get_messages("/repo", grep="auth")] == ["Fix authentication bug"]
+        assert storage.get_messages(grep='quote " inside') == []
+    
+    def test_file(self, storage):
+        storage.import_messages([
+            entry(1, files=["src/gitme/cli.py"]),
+            entry(2, files=["src/gitme/storage.py", "README.md"]),
+            entry(3, files=["src/gitme_extra.py"]),
+        ])
+        
+        assert [m["message"] for m in storage.get_messages(file="README.md")] == ["message 2"]
+        assert [m["message"] for m in storage.get_messages(file="src/gitme/")] == ["message 1", "message 2"]
+        assert storage.get_messages(file="src/gitme/*") == []
+    
+    def test_retention(self, tmp_path):
+        store = SQLiteMessageStorage(tmp_path, max_entries=3)
+        for i in range(5):
+            store.save_message(f"m{i}", "/repo", {f"f{i}.py": "diff"})
+        
+        assert [m["message"] for m in store.get_messages(limit=10)] == ["m2", "m3", "m4"]
+        assert store.get_messages(file="f0.py") == []
+        assert store.get_messages(grep="m0") == []
+        store.close()
+    
+    def test_retention_is_per_repository(self, tmp_path):
+        store = SQLiteMessageStorage(tmp_path, max_entries=3)
+        for i in range(5):
+            store.save_message(f"a{i}", "/a", {"a.py": "diff"})
+        store.save_message("b0", "/b", {"b.py": "diff"})
+        store.import_messages(entry(i, repo="/c") for i in range(5))
+        
+        assert [m["message"] for m in store.get_messages("/a")] == ["a2", "a3", "a4"]
+        assert [m["message"] for m in store.get_messages("/b")] == ["b0"]
+        assert [m["message"] for m in store.get_messages("/c")] == ["message 2", "message 3", "message 4"]
+        store.close()
+    
+    def test_pruned_entries_release_their_blobs(self, tmp_path):
+        storage = SQLiteMessageStorage(tmp_path, max_entries=2)
+        storage.save_message("one", "/repo", {"a.py": "+shared\n", "b.py": "+only one\n"})
+        storage.save_message("two", "/repo", {"a.py": "+shared\n"})
+        storage.save_message("three", "/repo", {"c.py": "+three\n"})
+        
+        keys = set(storage.blobs.keys())
+        
+        assert keys == {storage.blobs.key("+shared\n"), storage.blobs.key("+three\n")}
+        storage.clear_messages("/repo")
+        assert list(storage.blobs.keys()) == []
+        storage.close()
+    
+    def test_reads_rows_with_inline_diffs(self, tmp_path):
+        storage = SQLiteMessageStorage(tmp_path, max_entries=0)
+        with storage.conn:
+            storage.conn.execute(
+                "INSERT INTO messages (timestamp, repo_path, message, file_changes) VALUES (?, ?, ?, ?)",
+                ("2024-01-01T00:00:00", "/repo", "old", json.dumps({"old.py": "diff"}))
+            )
+        
+        message, = storage.get_messages()
+        
+        assert storage.load_file_changes(message) == {"old.py": "diff"}
+        storage.close()
+    
+    def test_clear(self, storage):
+        storage.import_messages([entry(1, message="keep me", repo="/a"), entry(2, message="drop me", repo="/b")])
+        
+        storage.clear_messages("/b")
+        assert [m["message"] for m in storage.get_messages(grep="me")] == ["keep me"]
+        storage.clear_messages()
+        assert storage.get_messages() == []
+    
+    def test_imports_jsonl_history(self, tmp_path):
+        log = MessageStorage(tmp_path)
+        log.save_message("from the log", "/repo", {"a.py": "diff"})
+        
+        store = SQLiteMessageStorage(tmp_path)
+        
+        assert [m["message"] for m in store.get_messages()] == ["from the log"]
+        assert not log.shards_dir.exists()
+        store.close()
+        assert [m["message"] for m in SQLiteMessageStorage(tmp_path).get_messages()] == ["from the log"]
+    
+    def test_import_keeps_every_repository(self, tmp_path):
+        log = MessageStorage(tmp_path, max_entries=100)
+        for r in range(3):
+            for i in range(80):
+                log.save_message(f"r{r} m{i}", f"/r{r}", {"a.py": f"+{i}\n"})
+        
+        store = SQLiteMessageStorage(tmp_path, max_entries=100)
+        
+        for r in range(3):
+            assert len(store.get_messages(f"/r{r}", limit=1000)) == 80
+        store.save_message("r0 new", "/r0", {"a.py": "diff"})
+        assert len(store.get_messages("/r0", limit=1000)) == 81
+        assert len(store.get_messages(limit=1000)) == 241
+        store.close()
+    
+    def test_reimport_after_switching_back(self, tmp_path):
+        MessageStorage(tmp_path).save_message("first", "/repo", {"a.py": "diff"})
+        SQLiteMessageStorage(tmp_path).close()
+        MessageStorage(tmp_path).save_message("second", "/repo", {"b.py": "diff"})
+        
+        store = SQLiteMessageStorage(tmp_path)
+        
+        assert [m["message"] for m in store.get_messages()] == ["first", "second"]
+        assert (tmp_path / "history.migrated").exists()
+        assert (tmp_path / "history.migrated.1").exists()
+        store.close()
+    
+    def test_import_left_behind_is_not_repeated(self, tmp_path):
+        log = MessageStorage(tmp_path)
+        log.save_message("once", "/repo", {"a.py": "diff"})
+        store = SQLiteMessageStorage(tmp_path)
+        store.close()
+        # As if the move after the import had failed
+        (tmp_path / "history.migrated").rename(tmp_path / "history")
+        
+        store = SQLiteMessageStorage(tmp_path)
+        
+        assert [m["message"] for m in store.get_messages()] == ["once"]
+        store.close()
+    
+    def test_matches_jsonl_backend(self, tmp_path):
+        repo = tmp_path / "repo"
+        (repo / ".git").mkdir(parents=True)
+        (repo / "src").mkdir()
+        jsonl = MessageStorage(tmp_path / "jsonl")
+        store = SQLiteMessageStorage(tmp_path / "sqlite")
+        for backend in (jsonl, store):
+            backend.save_message("Fix Authentication bug", str(repo / "src"), {"auth/login.py": "diff"})
+            backend.save_message("Update README", str(repo), {"README.md": "diff"})
+            backend.save_message("Préparer la sortie", str(repo), {"notes.txt": "diff"})
+        
+        for grep in ("authentication", "THENT", "login", "ME", "PRÉP", "bug"):
+            assert ([m["message"] for m in store.get_messages(str(repo), grep=grep)]
+                    == [m["message"] for m in jsonl.get_messages(str(repo), grep=grep)]), grep
+        assert store.get_messages(grep="login") == []
+        assert {m["repo_path"] for m in store.get_messages()} == {str(repo.resolve())}
+        store.clear_messages(str(repo / "src"))
+        assert store.get_messages() == []
+        store.close()
+    
+    def test_upgrades_word_index_and_raw_paths(self, tmp_path):
+        import sqlite3
+        repo = tmp_path / "repo"
+        (repo / ".git").mkdir(parents=True)
+        (repo / "src").mkdir()
+        conn = sqlite3.connect(tmp_path / "history.db")
+        conn.execute("CREATE TABLE messages (id INTEGER PRIMARY KEY, timestamp TEXT NOT NULL, repo_path TEXT NOT NULL, "
+                     "message TEXT NOT NULL, provider TEXT, model TEXT, file_changes TEXT)")
+        conn.execute("CREATE VIRTUAL TABLE messages_fts USING fts5(message, files)")
+        conn.execute("INSERT INTO messages (timestamp, repo_path, message) VALUES (?, ?, ?)",
+                     ("2024-01-01T00:00:00", str(repo / "src"), "Reauthorize tokens"))
+        conn.commit()
+        conn.close()
+        
+        store = SQLiteMessageStorage(tmp_path)
+        
+        assert [m["message"] for m in store.get_messages(str(repo), grep="auth")] == ["Reauthorize tokens"]
+        assert store.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'").fetchone() is None
+        store.close()
+    
+    def test_queries_use_indexes(self, storage):
+        plan = " ".join(row[-1] for row in storage.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM messages WHERE repo_path = ? ORDER BY timestamp DESC, id DESC LIMIT 10",
+            ("/repo",)
+        ))
+        
+        assert "messages_repo_time" in plan
+        assert "TEMP B-TREE" not in plan
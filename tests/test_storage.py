@@ -1,11 +1,21 @@
 import pytest
+import fcntl
 import json
+import multiprocessing
+import os
 import tempfile
+import threading
+import time
 from pathlib import Path
 from unittest.mock import patch
 from datetime import datetime
 
-from gitme.storage import MessageStorage
+from gitme.storage import HistoryLog, MessageStorage, canonical_repo_root
+
+
+def read_log(storage_file):
+    with open(storage_file, 'r') as f:
+        return [json.loads(line) for line in f]
 
 
 class TestMessageStorage:
@@ -15,159 +25,131 @@ class TestMessageStorage:
         """Test saving message with provider and model metadata."""
         with tempfile.TemporaryDirectory() as temp_dir:
             storage_dir = Path(temp_dir) / ".gitme"
-            storage_file = storage_dir / "messages.json"
+            storage = MessageStorage(storage_dir)
+            storage_file = storage.shard("/test/repo").history_file
+            file_changes = {"test.py": "diff content"}
+            
+            # Test with Anthropic provider
+            storage.save_message(
+                message="Test commit message",
+                repo_path="/test/repo",
+                file_changes=file_changes,
+                provider="anthropic",
+                model="claude-3-7-sonnet-20250219"
+            )
             
-            with patch.object(MessageStorage, 'storage_dir', storage_dir), \
-                 patch.object(MessageStorage, 'storage_file', storage_file):
-                
-                storage = MessageStorage()
-                file_changes = {"test.py": "diff content"}
-                
-                # Test with Anthropic provider
-                storage.save_message(
-                    message="Test commit message",
-                    repo_path="/test/repo",
-                    file_changes=file_changes,
-                    provider="anthropic",
-                    model="claude-3-7-sonnet-20250219"
-                )
-                
-                # Verify the file was created and contains metadata
-                assert storage_file.exists()
-                
-                with open(storage_file, 'r') as f:
-                    data = json.load(f)
-                
-                assert len(data) == 1
-                entry = data[0]
-                
-                assert entry["message"] == "Test commit message"
-                assert entry["repo_path"] == "/test/repo"
-                assert entry["file_changes"] == file_changes
-                assert entry["provider"] == "anthropic"
-                assert entry["model"] == "claude-3-7-sonnet-20250219"
-                assert "timestamp" in entry
+            # Verify the file was created and contains metadata
+            assert storage_file.exists()
+            
+            data = read_log(storage_file)
+            
+            assert len(data) == 1
+            entry = data[0]
+            
+            assert entry["message"] == "Test commit message"
+            assert entry["repo_path"] == "/test/repo"
+            assert [f["path"] for f in entry["files"]] == ["test.py"]
+            assert "file_changes" not in entry
+            assert storage.load_file_changes(entry) == file_changes
+            assert storage.shard("/test/repo").history_file.parent.parent == storage_dir / "history"
+            assert entry["provider"] == "anthropic"
+            assert entry["model"] == "claude-3-7-sonnet-20250219"
+            assert "timestamp" in entry
     
     def test_save_message_with_openai_provider(self):
         """Test saving message with OpenAI provider metadata."""
         with tempfile.TemporaryDirectory() as temp_dir:
             storage_dir = Path(temp_dir) / ".gitme"
-            storage_file = storage_dir / "messages.json"
             
-            with patch.object(MessageStorage, 'storage_dir', storage_dir), \
-                 patch.object(MessageStorage, 'storage_file', storage_file):
-                
-                storage = MessageStorage()
-                file_changes = {"auth.py": "authentication changes"}
-                
-                # Test with OpenAI provider
-                storage.save_message(
-                    message="Fix authentication bug",
-                    repo_path="/test/auth-repo",
-                    file_changes=file_changes,
-                    provider="openai",
-                    model="gpt-4o-mini"
-                )
-                
-                with open(storage_file, 'r') as f:
-                    data = json.load(f)
-                
-                entry = data[0]
-                assert entry["provider"] == "openai"
-                assert entry["model"] == "gpt-4o-mini"
+            storage = MessageStorage(storage_dir)
+            file_changes = {"auth.py": "authentication changes"}
+            
+            # Test with OpenAI provider
+            storage.save_message(
+                message="Fix authentication bug",
+                repo_path="/test/auth-repo",
+                file_changes=file_changes,
+                provider="openai",
+                model="gpt-4o-mini"
+            )
+            
+            entry = read_log(storage.shard("/test/auth-repo").history_file)[0]
+            assert entry["provider"] == "openai"
+            assert entry["model"] == "gpt-4o-mini"
     
     def test_save_message_with_defaults(self):
         """Test saving message with default provider values."""
         with tempfile.TemporaryDirectory() as temp_dir:
             storage_dir = Path(temp_dir) / ".gitme"
-            storage_file = storage_dir / "messages.json"
             
-            with patch.object(MessageStorage, 'storage_dir', storage_dir), \
-                 patch.object(MessageStorage, 'storage_file', storage_file):
-                
-                storage = MessageStorage()
-                
-                # Test with default parameters (should default to anthropic)
-                storage.save_message(
-                    message="Default provider test",
-                    repo_path="/test/repo",
-                    file_changes={"test.py": "changes"}
-                )
-                
-                with open(storage_file, 'r') as f:
-                    data = json.load(f)
-                
-                entry = data[0]
-                assert entry["provider"] == "anthropic"  # default
-                assert entry["model"] is None  # default
+            storage = MessageStorage(storage_dir)
+            
+            # Test with default parameters (should default to anthropic)
+            storage.save_message(
+                message="Default provider test",
+                repo_path="/test/repo",
+                file_changes={"test.py": "changes"}
+            )
+            
+            entry = read_log(storage.shard("/test/repo").history_file)[0]
+            assert entry["provider"] == "anthropic"  # default
+            assert entry["model"] is None  # default
     
     def test_multiple_providers_in_history(self):
         """Test storing messages from different providers."""
         with tempfile.TemporaryDirectory() as temp_dir:
-            storage_dir = Path(temp_dir) / ".gitme"
-            storage_file = storage_dir / "messages.json"
+            storage = MessageStorage(Path(temp_dir) / ".gitme")
+            
+            # Save message with Anthropic
+            storage.save_message(
+                message="Anthropic message",
+                repo_path="/test/repo",
+                file_changes={"file1.py": "changes"},
+                provider="anthropic",
+                model="claude-3-haiku-20240307"
+            )
             
-            with patch.object(MessageStorage, 'storage_dir', storage_dir), \
-                 patch.object(MessageStorage, 'storage_file', storage_file):
-                
-                storage = MessageStorage()
-                
-                # Save message with Anthropic
-                storage.save_message(
-                    message="Anthropic message",
-                    repo_path="/test/repo",
-                    file_changes={"file1.py": "changes"},
-                    provider="anthropic",
-                    model="claude-3-haiku-20240307"
-                )
-                
-                # Save message with OpenAI
-                storage.save_message(
-                    message="OpenAI message",
-                    repo_path="/test/repo", 
-                    file_changes={"file2.py": "changes"},
-                    provider="openai",
-                    model="gpt-4"
-                )
-                
-                messages = storage.get_messages("/test/repo")
-                assert len(messages) == 2
-                
-                # Verify both providers are stored
-                providers = [msg["provider"] for msg in messages]
-                models = [msg["model"] for msg in messages]
-                
-                assert "anthropic" in providers
-                assert "openai" in providers
-                assert "claude-3-haiku-20240307" in models
-                assert "gpt-4" in models
+            # Save message with OpenAI
+            storage.save_message(
+                message="OpenAI message",
+                repo_path="/test/repo", 
+                file_changes={"file2.py": "changes"},
+                provider="openai",
+                model="gpt-4"
+            )
+            
+            messages = storage.get_messages("/test/repo")
+            assert len(messages) == 2
+            
+            # Verify both providers are stored
+            providers = [msg["provider"] for msg in messages]
+            models = [msg["model"] for msg in messages]
+            
+            assert "anthropic" in providers
+            assert "openai" in providers
+            assert "claude-3-haiku-20240307" in models
+            assert "gpt-4" in models
     
     def test_get_messages_includes_metadata(self):
         """Test that retrieved messages include provider metadata."""
         with tempfile.TemporaryDirectory() as temp_dir:
-            storage_dir = Path(temp_dir) / ".gitme"
-            storage_file = storage_dir / "messages.json"
+            storage = MessageStorage(Path(temp_dir) / ".gitme")
+            
+            storage.save_message(
+                message="Test message",
+                repo_path="/test/repo",
+                file_changes={"test.py": "content"},
+                provider="openai",
+                model="gpt-4o-mini"
+            )
             
-            with patch.object(MessageStorage, 'storage_dir', storage_dir), \
-                 patch.object(MessageStorage, 'storage_file', storage_file):
-                
-                storage = MessageStorage()
-                
-                storage.save_message(
-                    message="Test message",
-                    repo_path="/test/repo",
-                    file_changes={"test.py": "content"},
-                    provider="openai",
-                    model="gpt-4o-mini"
-                )
-                
-                messages = storage.get_messages("/test/repo")
-                assert len(messages) == 1
-                
-                message = messages[0]
-                assert message["provider"] == "openai"
-                assert message["model"] == "gpt-4o-mini"
-                assert message["message"] == "Test message"
+            messages = storage.get_messages("/test/repo")
+            assert len(messages) == 1
+            
+            message = messages[0]
+            assert message["provider"] == "openai"
+            assert message["model"] == "gpt-4o-mini"
+            assert message["message"] == "Test message"
     
     def test_backward_compatibility(self):
         """Test that old messages without metadata still work."""
@@ -188,15 +170,357 @@ class TestMessageStorage:
             with open(storage_file, 'w') as f:
                 json.dump([old_message], f)
             
-            with patch.object(MessageStorage, 'storage_dir', storage_dir), \
-                 patch.object(MessageStorage, 'storage_file', storage_file):
-                
-                storage = MessageStorage()
-                messages = storage.get_messages("/test/repo")
-                
-                assert len(messages) == 1
-                message = messages[0]
-                assert message["message"] == "Old format message"
-                # These should not exist in old format
-                assert "provider" not in message
-                assert "model" not in message
\ No newline at end of file
+            storage = MessageStorage(storage_dir)
+            messages = storage.get_messages("/test/repo")
+            
+            assert len(messages) == 1
+            message = messages[0]
+            assert message["message"] == "Old format message"
+            # These should not exist in old format
+            assert "provider" not in message
+            assert "model" not in message
+
+
+class TestAppendOnlyLog:
+    """Test the JSON Lines log: appends, compaction and migration."""
+    
+    def test_save_only_appends(self, tmp_path):
+        storage = HistoryLog(tmp_path)
+        storage.save_message("first", "/repo", {})
+        before = storage.history_file.read_bytes()
+        
+        storage.save_message("second", "/repo", {})
+        after = storage.history_file.read_bytes()
+        
+        assert after.startswith(before)
+        assert after.count(b"\n") == 2
+    
+    def test_compacts_past_threshold(self, tmp_path):
+        storage = HistoryLog(tmp_path, max_entries=3)
+        for i in range(6):
+            storage.save_message(f"m{i}", "/repo", {})
+        assert len(read_log(storage.history_file)) == 6
+        
+        storage.save_message("m6", "/repo", {})
+        
+        assert [m["message"] for m in read_log(storage.history_file)] == ["m4", "m5", "m6"]
+        assert [m["message"] for m in storage.get_messages(limit=10)] == ["m4", "m5", "m6"]
+    
+    def test_torn_line_is_skipped_and_does_not_swallow_next_save(self, tmp_path):
+        storage = HistoryLog(tmp_path)
+        storage.save_message("kept", "/repo", {})
+        with open(storage.history_file, "a") as f:
+            f.write('{"timestamp": "2024-01-01T00:00:00", "repo_')
+        
+        storage.save_message("after", "/repo", {})
+        
+        assert [m["message"] for m in storage.get_messages()] == ["kept", "after"]
+    
+    def test_migrates_legacy_file(self, tmp_path):
+        legacy = [{"timestamp": "2024-01-0%dT00:00:00" % i, "repo_path": "/repo",
+                   "message": f"old{i}", "file_changes": {}} for i in range(1, 4)]
+        (tmp_path / "messages.json").write_text(json.dumps(legacy, indent=2))
+        
+        storage = HistoryLog(tmp_path)
+        storage.save_message("new", "/repo", {})
+        
+        assert [m["message"] for m in storage.get_messages()] == ["old1", "old2", "old3", "new"]
+        assert not (tmp_path / "messages.json").exists()
+        assert (tmp_path / "messages.json.migrated").exists()
+    
+    def test_unreadable_legacy_file_is_left_alone(self, tmp_path):
+        (tmp_path / "messages.json").write_text("[{broken")
+        
+        storage = HistoryLog(tmp_path)
+        
+        assert storage.get_messages() == []
+        assert (tmp_path / "messages.json").read_text() == "[{broken"
+    
+    def test_clear_repo_keeps_other_repos(self, tmp_path):
+        storage = HistoryLog(tmp_path)
+        storage.save_message("a", "/repo-a", {})
+        storage.save_message("b", "/repo-b", {})
+        
+        storage.clear_messages("/repo-a")
+        
+        assert [m["message"] for m in storage.get_messages()] == ["b"]
+        storage.clear_messages()
+        assert storage.get_messages() == []
+    
+    def test_grep_and_file_filters(self, tmp_path):
+        storage = HistoryLog(tmp_path)
+        storage.save_message("Fix Auth bug", "/repo", {"src/auth.py": "diff"})
+        storage.save_message("Update docs", "/repo", {"docs/index.md": "diff"})
+        
+        assert [m["message"] for m in storage.get_messages(grep="auth")] == ["Fix Auth bug"]
+        assert [m["message"] for m in storage.get_messages(file="docs")] == ["Update docs"]
+        assert [m["message"] for m in storage.get_messages(file="src/auth.py")] == ["Fix Auth bug"]
+        assert storage.get_messages(file="src/auth") == []
+    
+    def test_diffs_live_in_blob_store(self, tmp_path):
+        storage = HistoryLog(tmp_path)
+        diff = "@@ -1 +1,2 @@\n-old\n+new\n+more\n"
+        storage.save_message("one", "/repo", {"a.py": diff})
+        storage.save_message("two", "/repo", {"b.py": diff})
+        
+        first, second = storage.get_messages()
+        
+        assert first["files"] == [{"path": "a.py", "blob": first["files"][0]["blob"], "added": 2, "removed": 1}]
+        assert first["files"][0]["blob"] == second["files"][0]["blob"]
+        assert len(list(storage.blobs.keys())) == 1
+        assert storage.load_file_changes(second) == {"b.py": diff}
+    
+    def test_compaction_moves_inline_diffs_and_drops_unused_blobs(self, tmp_path):
+        with open(tmp_path / "history.jsonl", "w") as f:
+            f.write(json.dumps({"timestamp": "2024-01-01T00:00:00", "repo_path": "/repo",
+                                "message": "old", "file_changes": {"old.py": "+x\n"}}) + "\n")
+        storage = HistoryLog(tmp_path, max_entries=2)
+        assert storage.load_file_changes(storage.get_messages()[0]) == {"old.py": "+x\n"}
+        
+        storage.compact()
+        entry = read_log(storage.history_file)[0]
+        assert "file_changes" not in entry
+        assert storage.load_file_changes(entry) == {"old.py": "+x\n"}
+        
+        storage.save_message("new1", "/repo", {"n1.py": "+1\n"})
+        storage.save_message("new2", "/repo", {"n2.py": "+2\n"})
+        storage.compact()
+        
+        assert [m["message"] for m in storage.get_messages()] == ["new1", "new2"]
+        assert len(list(storage.blobs.keys())) == 2
+        storage.clear_messages()
+        assert list(storage.blobs.keys()) == []
+
+    
+    def test_pages_and_time_bounds(self, tmp_path):
+        storage = HistoryLog(tmp_path)
+        with open(storage.history_file, "w") as f:
+            for day in range(1, 21):
+                f.write(json.dumps({"timestamp": f"2024-01-{day:02d}T10:00:00", "repo_path": "/repo",
+                                    "message": f"day{day}", "files": []}) + "\n")
+        
+        assert [m["message"] for m in storage.get_messages(limit=3, offset=2)] == ["day16", "day17", "day18"]
+        assert [m["message"] for m in storage.get_messages(limit=50, since="2024-01-18")] == ["day18", "day19", "day20"]
+        assert [m["message"] for m in storage.get_messages(limit=2, until="2024-01-05")] == ["day3", "day4"]
+        assert [m["message"] for m in storage.get_messages(limit=2, offset=100)] == []
+    
+    def test_reverse_read_across_blocks(self, tmp_path):
+        storage = HistoryLog(tmp_path)
+        for i in range(30):
+            storage.save_message(f"message {i} " + "x" * (i * 7), "/repo", {})
+        with open(storage.history_file, "a") as f:
+            f.write('{"torn')
+        
+        entries = list(storage._iter_reverse(block_size=64))
+        
+        assert [m["message"].split(" x")[0].strip() for m in entries] == [f"message {i}" for i in reversed(range(30))]
+    
+    def test_iteration_stops_at_since(self, tmp_path):
+        storage = HistoryLog(tmp_path)
+        for message in ("oldest", "old", "new"):
+            storage.save_message(message, "/repo", {})
+        since = read_log(storage.history_file)[2]["timestamp"]
+        
+        with patch.object(HistoryLog, "_parse_line", side_effect=HistoryLog._parse_line) as parse:
+            assert [m["message"] for m in storage.iter_messages(since=since)] == ["new"]
+        # The trailing newline, "new" and "old"; "oldest" is never parsed
+        assert parse.call_count == 3
+
+
+def save_many(storage_dir, worker, count, max_entries):
+    storage = HistoryLog(storage_dir, max_entries=max_entries)
+    for i in range(count):
+        storage.save_message(f"{worker}:{i}", "/repo", {f"w{worker}.py": f"+{i}\n"})
+
+
+def save_sharded(storage_dir, worker, count):
+    storage = MessageStorage(storage_dir, max_entries=0)
+    for i in range(count):
+        storage.save_message(f"{worker}:{i}", f"/repos/r{i % 3}", {})
+
+
+class TestConcurrentWrites:
+    """Test that concurrent savers neither lose nor corrupt entries."""
+    
+    def run_workers(self, storage_dir, workers, count, max_entries):
+        ctx = multiprocessing.get_context("fork")
+        procs = [ctx.Process(target=save_many, args=(storage_dir, w, count, max_entries)) for w in range(workers)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join(60)
+            assert p.exitcode == 0
+    
+    def test_no_entries_lost(self, tmp_path):
+        self.run_workers(tmp_path, workers=8, count=40, max_entries=0)
+        
+        storage = HistoryLog(tmp_path, max_entries=0)
+        messages = [m["message"] for m in read_log(storage.history_file)]
+        
+        assert sorted(messages) == sorted(f"{w}:{i}" for w in range(8) for i in range(40))
+        assert storage._read_meta()["entries"] == 320
+        assert storage.lock_stats()["acquisitions"] >= 320
+    
+    def test_compaction_under_contention_keeps_newest(self, tmp_path):
+        self.run_workers(tmp_path, workers=8, count=40, max_entries=50)
+        
+        storage = HistoryLog(tmp_path, max_entries=50)
+        messages = [m["message"] for m in read_log(storage.history_file)]
+        
+        # Saves are serialized: compaction at 101 entries down to 50, then
+        # every 51 saves, leaves 50 + (320 - 101) % 51 entries
+        assert len(messages) == storage._read_meta()["entries"] == 65
+        assert len(set(messages)) == 65
+        for w in range(8):
+            # Each worker's surviving entries are its newest ones
+            kept = sorted(int(m.split(":")[1]) for m in messages if m.startswith(f"{w}:"))
+            assert kept == list(range(40 - len(kept), 40))
+        # Only blobs of surviving entries remain
+        assert len(list(storage.blobs.keys())) == len({m.split(":")[1] for m in messages})
+    
+    def test_sharded_saves_keep_every_entry_and_index(self, tmp_path):
+        ctx = multiprocessing.get_context("fork")
+        procs = [ctx.Process(target=save_sharded, args=(tmp_path, w, 30)) for w in range(6)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join(60)
+            assert p.exitcode == 0
+        
+        storage = MessageStorage(tmp_path, max_entries=0)
+        
+        assert sorted(m["message"] for m in storage.get_messages(limit=1000)) == sorted(
+            f"{w}:{i}" for w in range(6) for i in range(30)
+        )
+        assert sorted(info["repo_path"] for info in storage._read_index().values()) == [
+            "/repos/r0", "/repos/r1", "/repos/r2"
+        ]
+    
+    def test_waiting_for_the_lock_is_measured(self, tmp_path):
+        storage = HistoryLog(tmp_path)
+        fd = os.open(storage.lock_file, os.O_RDWR | os.O_CREAT)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        saver = threading.Thread(target=storage.save_message, args=("waited", "/repo", {}))
+        saver.start()
+        time.sleep(0.1)
+        assert storage.get_messages() == []
+        os.close(fd)
+        saver.join(5)
+        
+        assert [m["message"] for m in storage.get_messages()] == ["waited"]
+        stats = storage.lock_stats()
+        assert stats["contended"] == 1
+        assert stats["max_wait_ms"] >= 90
+    
+    def test_unreadable_lines_are_kept_aside_on_rewrite(self, tmp_path):
+        storage = HistoryLog(tmp_path)
+        storage.save_message("good", "/repo", {})
+        with open(storage.history_file, "a") as f:
+            f.write("not json\n")
+        storage.save_message("also good", "/repo", {})
+        
+        storage.compact()
+        
+        assert [m["message"] for m in storage.get_messages()] == ["good", "also good"]
+        assert storage.corrupt_file.read_text() == "not json\n"
+
+
+class TestShardedHistory:
+    """Test per-repository shards and the index behind show -r."""
+    
+    def make_repo(self, root, name):
+        repo = root / name
+        (repo / ".git").mkdir(parents=True)
+        (repo / "src").mkdir()
+        return repo
+    
+    def test_repos_get_separate_shards(self, tmp_path):
+        a = self.make_repo(tmp_path, "a")
+        b = self.make_repo(tmp_path, "b")
+        storage = MessageStorage(tmp_path / "home")
+        
+        storage.save_message("in a", str(a), {"x.py": "+x\n"})
+        storage.save_message("in b", str(b), {"y.py": "+y\n"})
+        
+        assert storage.shard(str(a)).history_file != storage.shard(str(b)).history_file
+        assert [m["message"] for m in read_log(storage.shard(str(a)).history_file)] == ["in a"]
+        assert [m["message"] for m in storage.get_messages(str(b))] == ["in b"]
+        assert storage.load_file_changes(storage.get_messages(str(a))[0]) == {"x.py": "+x\n"}
+    
+    def test_subdirectory_and_symlink_share_the_repo_shard(self, tmp_path):
+        repo = self.make_repo(tmp_path, "repo")
+        link = tmp_path / "link"
+        link.symlink_to(repo)
+        storage = MessageStorage(tmp_path / "home")
+        
+        storage.save_message("from src", str(repo / "src"), {})
+        storage.save_message("via link", str(link), {})
+        
+        assert canonical_repo_root(str(link / "src")) == os.path.realpath(repo)
+        messages = storage.get_messages(str(repo))
+        assert [m["message"] for m in messages] == ["from src", "via link"]
+        assert {m["repo_path"] for m in messages} == {os.path.realpath(repo)}
+    
+    def test_all_repos_merges_newest_across_shards(self, tmp_path):
+        storage = MessageStorage(tmp_path / "home")
+        for i in range(6):
+            storage.save_message(f"m{i}", str(tmp_path / f"repo{i % 3}"), {})
+        
+        assert [m["message"] for m in storage.get_messages(limit=4)] == ["m2", "m3", "m4", "m5"]
+        assert [m["message"] for m in storage.get_messages(limit=2, grep="m1")] == ["m1"]
+    
+    def test_all_repos_skips_shards_older_than_the_page(self, tmp_path):
+        storage = MessageStorage(tmp_path / "home")
+        storage.save_message("old", str(tmp_path / "quiet"), {})
+        for i in range(3):
+            storage.save_message(f"new{i}", str(tmp_path / "busy"), {})
+        
+        with patch.object(HistoryLog, "iter_messages", autospec=True, side_effect=HistoryLog.iter_messages) as get:
+            assert [m["message"] for m in storage.get_messages(limit=2)] == ["new1", "new2"]
+        assert get.call_count == 1
+    
+    def test_all_repos_offset_continues_across_shards(self, tmp_path):
+        storage = MessageStorage(tmp_path / "home")
+        for i in range(9):
+            storage.save_message(f"m{i}", str(tmp_path / f"repo{i % 3}"), {})
+        
+        pages = [[m["message"] for m in storage.get_messages(limit=4, offset=offset)] for offset in (0, 4, 8)]
+        
+        assert pages == [["m5", "m6", "m7", "m8"], ["m1", "m2", "m3", "m4"], ["m0"]]
+        assert [m["message"] for m in storage.iter_messages(grep="m4")] == ["m4"]
+    
+    def test_index_is_rebuilt_when_missing(self, tmp_path):
+        storage = MessageStorage(tmp_path / "home")
+        storage.save_message("a", str(tmp_path / "a"), {})
+        storage.save_message("b", str(tmp_path / "b"), {})
+        storage.index_file.unlink()
+        
+        assert [m["message"] for m in storage.get_messages()] == ["a", "b"]
+        assert len(json.loads(storage.index_file.read_text())) == 2
+    
+    def test_clear_one_repo(self, tmp_path):
+        storage = MessageStorage(tmp_path / "home")
+        storage.save_message("a", str(tmp_path / "a"), {"a.py": "+a\n"})
+        storage.save_message("b", str(tmp_path / "b"), {})
+        
+        storage.clear_messages(str(tmp_path / "a"))
+        
+        assert [m["message"] for m in storage.get_messages()] == ["b"]
+        assert list(storage.shard(str(tmp_path / "a")).blobs.keys()) == []
+        storage.clear_messages()
+        assert storage.get_messages() == []
+    
+    def test_splits_global_log_into_shards(self, tmp_path):
+        home = tmp_path / "home"
+        old = HistoryLog(home, max_entries=0)
+        old.save_message("one", str(tmp_path / "a"), {"a.py": "+a\n"})
+        old.save_message("two", str(tmp_path / "b"), {"b.py": "+b\n"})
+        
+        storage = MessageStorage(home)
+        
+        assert not old.history_file.exists()
+        assert (home / "history.jsonl.migrated").exists()
+        assert list(old.blobs.keys()) == []
+        a, = storage.get_messages(str(tmp_path / "a"))
+        assert storage.load_file_changes(a) == {"a.py": "+a\n"}
+        assert [m["message"] for m in storage.get_messages()] == ["one", "two"]
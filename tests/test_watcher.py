@@ -0,0 +1,127 @@
+import os
+import sys
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+
+from gitme.git_diff import GitDiffAnalyzer
+from gitme.watcher import IN_Q_OVERFLOW, DiffWatcher, Inotify, WatcherUnavailable
+from tests.conftest import git, requires_git
+
+
+def inotify_available():
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        Inotify().close()
+        return True
+    except WatcherUnavailable:
+        return False
+
+
+pytestmark = [
+    requires_git,
+    pytest.mark.skipif(not inotify_available(), reason="inotify is not available"),
+]
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch, init_repo):
+    root = init_repo(tmp_path / "repo")
+    (root / ".gitignore").write_text("build/\n*.log\n")
+    (root / "app.py").write_text("print('hi')\n")
+    (root / "build").mkdir()
+    git(root, "add", "-A")
+    git(root, "commit", "-q", "-m", "initial")
+    monkeypatch.chdir(root)
+    return root
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture
+def watcher(repo):
+    watcher = DiffWatcher(GitDiffAnalyzer(cwd=str(repo)), str(repo), debounce=0.2, max_delay=2.0).start()
+    assert wait_for(lambda: watcher.recomputes == 1)
+    yield watcher
+    watcher.stop()
+
+
+class TestDiffWatcher:
+    def test_initial_snapshot(self, watcher):
+        assert watcher.snapshot("staged") == {}
+        assert watcher.snapshot("all") == {}
+        assert watcher.snapshot("untracked") == []
+    
+    def test_burst_of_writes_recomputes_once(self, repo, watcher):
+        for i in range(1000):
+            (repo / "app.py").write_text(f"print({i})\n")
+        
+        assert wait_for(lambda: watcher.recomputes == 2 and watcher.snapshot("all") is not None)
+        time.sleep(0.5)
+        assert watcher.recomputes == 2
+        assert "print(999)" in watcher.snapshot("all")["app.py"]
+        assert watcher.snapshot("staged") == {}
+    
+    def test_ignored_paths_do_not_recompute(self, repo, watcher):
+        for i in range(20):
+            (repo / "build" / f"out{i}.o").write_text("x")
+            (repo / f"run{i}.log").write_text("x")
+        
+        assert wait_for(lambda: watcher.ignored_events >= 40)
+        time.sleep(0.4)
+        assert watcher.recomputes == 1
+        assert watcher.snapshot("untracked") == []
+    
+    def test_new_directory_is_watched(self, repo, watcher):
+        (repo / "pkg").mkdir()
+        assert wait_for(lambda: watcher.recomputes == 2)
+        (repo / "pkg" / "mod.py").write_text("x = 1\n")
+        
+        assert wait_for(lambda: watcher.snapshot("untracked") == ["pkg/mod.py"])
+    
+    def test_gitignore_change_applies(self, repo, watcher):
+        (repo / ".gitignore").write_text("build/\n")
+        assert wait_for(lambda: watcher.recomputes == 2)
+        (repo / "trace.log").write_text("x")
+        
+        assert wait_for(lambda: watcher.snapshot("untracked") == ["trace.log"])
+    
+    def test_staging_refreshes_staged_view(self, repo, watcher):
+        (repo / "app.py").write_text("print('bye')\n")
+        git(repo, "add", "app.py")
+        
+        assert wait_for(lambda: "app.py" in (watcher.snapshot("staged") or {}))
+    
+    def test_wait_until_fresh_applies_queued_events(self, repo):
+        # No watcher thread: the events stay queued until wait_until_fresh
+        with patch("gitme.watcher.threading.Thread"):
+            watcher = DiffWatcher(GitDiffAnalyzer(cwd=str(repo)), str(repo)).start()
+        watcher._recompute()
+        assert watcher.wait_until_fresh(1)
+        (repo / "app.py").write_text("print('bye')\n")
+        git(repo, "add", "app.py")
+        
+        assert not watcher.wait_until_fresh(0.1)
+        assert watcher.snapshot("staged") is None
+        watcher.stop()
+    
+    def test_snapshot_is_none_while_stale(self, repo):
+        analyzer = MagicMock()
+        analyzer.get_file_changes.return_value = {}
+        analyzer.get_untracked_files.return_value = []
+        watcher = DiffWatcher(analyzer, str(repo))
+        watcher._recompute()
+        assert watcher.snapshot("all") == {}
+        
+        assert watcher._handle(-1, IN_Q_OVERFLOW, "")
+        watcher._generation += 1
+        assert watcher.snapshot("all") is None
+        watcher.stop()